@@ -1,59 +1,70 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from news_agent import NewsAgent
-from config import SENTIMENT_LABELS
+from ui_components import (setup_page, session_articles, count_sentiments, show_statistics,
+                           show_articles, start_fetch_job, poll_fetch_job, show_fetch_job_status,
+                           show_newsapi_quota, show_profile_panel, rerun_while_job_active, load_digest,
+                           entity_filter, show_entity_sentiment)
+from config import MODEL_WARMUP, INSIGHTS_SERVICE_URL, DIGEST_REFRESH
+from model_warmup import start_warmup
+from digest_refresher import start_digest_refresher
+from telemetry import start_metrics_server
 import time
 
-# Page configuration
-st.set_page_config(
-    page_title="News & Insights Agent",
-    page_icon="📰",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Page configuration and shared styling
+setup_page()
 
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .news-card {
-        border: 1px solid #ddd;
-        border-radius: 10px;
-        padding: 15px;
-        margin: 10px 0;
-        background-color: #f9f9f9;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .sentiment-positive {
-        color: #28a745;
-        font-weight: bold;
-    }
-    .sentiment-negative {
-        color: #dc3545;
-        font-weight: bold;
-    }
-    .sentiment-neutral {
-        color: #6c757d;
-        font-weight: bold;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 15px;
-        border-radius: 8px;
-        text-align: center;
-        border-left: 4px solid #007bff;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Load and exercise the models in the background as soon as the process starts
+# (not needed when a separate insights service does the inference)
+warmup = start_warmup() if MODEL_WARMUP and not INSIGHTS_SERVICE_URL else None
+
+# Keep ready-made digests of every category's headlines, if opted in (the insights
+# service, when used, does its own processing)
+digests = (start_digest_refresher('huggingface', NewsAgent)
+           if DIGEST_REFRESH and not INSIGHTS_SERVICE_URL else None)
+
+# Prometheus metrics on METRICS_PORT, if configured (once per process)
+start_metrics_server()
+
+def _format_profile(name, profile):
+    """Label a decoding profile, with its latency/ROUGE tradeoff once evaluate_profiles.py has measured it"""
+    evaluation = profile.get('evaluation')
+    if not evaluation:
+        return name.title()
+    return f"{name.title()} (~{evaluation['latency_ms_p50']:.0f} ms, ROUGE-L {evaluation['rougeL']:.2f})"
+
+def show_warmup_status(warmup):
+    """Show model warm-up progress and poll until the models are ready"""
+    st.title("📰 News & Insights Agent")
+    st.info("⏳ Warming up AI models. This only happens once after a restart...")
+    st.progress(warmup.progress())
+    
+    for entry in warmup.status().values():
+        duration = f" ({entry['duration_seconds']}s)" if 'duration_seconds' in entry else ""
+        st.caption(f"{entry['task']} · {entry['model']}: {entry['status']}{duration}")
+    
+    time.sleep(2)
+    st.rerun()
 
 def main():
+    # Wait for background warm-up instead of loading models inside a request
+    if warmup and not warmup.is_ready():
+        show_warmup_status(warmup)
+        return
+    
     # Initialize session state
     if 'news_agent' not in st.session_state:
-        st.session_state.news_agent = NewsAgent()
+        if INSIGHTS_SERVICE_URL:
+            from insights_client import InsightsClient
+            st.session_state.news_agent = InsightsClient()
+        else:
+            st.session_state.news_agent = NewsAgent()
+    
+    # Sessions hold article IDs; the articles live in the shared article pool
+    if 'article_ids' not in st.session_state:
+        st.session_state.article_ids = []
     
-    if 'processed_articles' not in st.session_state:
-        st.session_state.processed_articles = []
+    # Pick up results (partial while running) of this session's background fetch job
+    job_active = poll_fetch_job()
     
     # Header
     st.title("📰 News & Insights Agent")
@@ -77,14 +88,54 @@ def main():
         # Number of articles
         max_articles = st.slider("Number of Articles", 5, 50, 20)
         
+        # Summarization decoding profile
+        decoding_profiles = st.session_state.news_agent.get_decoding_profiles()
+        profile_names = list(decoding_profiles.keys())
+        selected_profile = None
+        if profile_names:
+            selected_profile = st.selectbox(
+                "Summary Quality",
+                options=profile_names,
+                index=profile_names.index(st.session_state.news_agent.get_default_decoding_profile()),
+                format_func=lambda x: _format_profile(x, decoding_profiles[x]),
+                help="Faster profiles use greedy decoding and shorter summaries"
+            )
+        
+        # Category headlines come from the background digest (summarized with the default
+        # profile); keyword searches and other profiles are processed on demand
+        use_digest = (not search_keyword and
+                      selected_profile in (None, st.session_state.news_agent.get_default_decoding_profile()))
+        
+        # Open on the selected category's digest
+        if use_digest and not st.session_state.article_ids and not job_active:
+            load_digest(digests, selected_category, max_articles)
+        
         # Fetch news button
-        if st.button("🔍 Fetch News", type="primary"):
-            with st.spinner("Fetching and processing news..."):
-                st.session_state.processed_articles = st.session_state.news_agent.get_news_insights(
-                    category=selected_category,
-                    keyword=search_keyword if search_keyword else None,
-                    max_articles=max_articles
-                )
+        if st.button("🔍 Fetch News", type="primary", disabled=job_active) and not (
+                use_digest and load_digest(digests, selected_category, max_articles)):
+            start_fetch_job(
+                st.session_state.news_agent, 'huggingface',
+                category=selected_category,
+                keyword=search_keyword if search_keyword else None,
+                max_articles=max_articles,
+                decoding_profile=selected_profile
+            )
+            job_active = True
+        
+        show_fetch_job_status()
+        
+        # Requests left in the NewsAPI daily budget (the service reports its own in /health)
+        if not INSIGHTS_SERVICE_URL:
+            show_newsapi_quota()
+        
+        # Shared inference server stats
+        inference_stats = st.session_state.news_agent.get_inference_stats()
+        if inference_stats:
+            with st.expander("⚙️ Inference Server"):
+                st.json(inference_stats)
+        
+        # Step breakdown of the last run when profiling is on
+        show_profile_panel()
         
         # Filters
         st.header("🎛️ Filters")
@@ -93,80 +144,26 @@ def main():
         sentiment_options = ["All", "POSITIVE", "NEGATIVE", "NEUTRAL"]
         selected_sentiment = st.selectbox("Filter by Sentiment", sentiment_options)
         
+        # Entity filter (companies, people and places, from the entity index)
+        selected_entity = entity_filter()
+        
         # Apply filters
-        filtered_articles = st.session_state.processed_articles.copy()
-        if selected_sentiment != "All":
-            filtered_articles = st.session_state.news_agent.filter_articles_by_sentiment(
-                filtered_articles, selected_sentiment
-            )
+        articles = session_articles()
+        if selected_sentiment != "All" or selected_entity:
+            filtered_articles = session_articles(
+                selected_sentiment if selected_sentiment != "All" else None, selected_entity)
+        else:
+            filtered_articles = articles
     
     # Main content area
-    if st.session_state.processed_articles:
+    if articles:
         # Statistics
-        st.header("📊 News Statistics")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Articles", len(st.session_state.processed_articles))
+        sentiment_stats = count_sentiments(articles)
+        show_statistics(len(articles), sentiment_stats)
+        show_entity_sentiment()
         
-        with col2:
-            positive_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'POSITIVE')
-            st.metric("Positive", positive_count)
-        
-        with col3:
-            negative_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'NEGATIVE')
-            st.metric("Negative", negative_count)
-        
-        with col4:
-            neutral_count = sum(1 for article in st.session_state.processed_articles 
-                              if article.get('sentiment') == 'NEUTRAL')
-            st.metric("Neutral", neutral_count)
-        
-        # Sentiment distribution chart
-        if len(st.session_state.processed_articles) > 0:
-            sentiment_stats = st.session_state.news_agent.get_sentiment_stats(st.session_state.processed_articles)
-            
-            fig = px.pie(
-                values=list(sentiment_stats.values()),
-                names=list(sentiment_stats.keys()),
-                title="Sentiment Distribution",
-                color_discrete_map={
-                    'POSITIVE': '#28a745',
-                    'NEGATIVE': '#dc3545',
-                    'NEUTRAL': '#6c757d'
-                }
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # News articles
-        st.header(f"📰 News Articles ({len(filtered_articles)} articles)")
-        
-        if filtered_articles:
-            for i, article in enumerate(filtered_articles):
-                with st.container():
-                    st.markdown(f"""
-                    <div class="news-card">
-                        <h3>{article.get('title', 'No title')}</h3>
-                        <p><strong>Source:</strong> {article.get('source', {}).get('name', 'Unknown')} | 
-                        <strong>Published:</strong> {article.get('publishedAt', 'Unknown date')[:10]}</p>
-                        <p><strong>Summary:</strong> {article.get('summary', 'No summary available')}</p>
-                        <p><strong>Sentiment:</strong> 
-                        <span class="sentiment-{article.get('sentiment', 'neutral').lower()}">
-                            {SENTIMENT_LABELS.get(article.get('sentiment', 'NEUTRAL'), '😐')} 
-                            {article.get('sentiment', 'NEUTRAL')} 
-                            ({article.get('sentiment_confidence', 0):.2f})
-                        </span></p>
-                        <p><strong>Original Description:</strong> {article.get('description', 'No description')[:200]}...</p>
-                        <p><a href="{article.get('url', '#')}" target="_blank">Read Full Article →</a></p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown("---")
-        else:
-            st.warning("No articles match the selected filters.")
+        # News articles (paginated)
+        show_articles(filtered_articles)
     
     else:
         # Welcome message
@@ -204,6 +201,9 @@ def main():
             - Headlines only (no full articles)
             - Perfect for personal use and testing
             """)
+    
+    # Keep polling the background job until it finishes
+    rerun_while_job_active(job_active)
 
 if __name__ == "__main__":
     main()
@@ -1,63 +1,43 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from news_agent_gemini import NewsAgentGemini
-from config import SENTIMENT_LABELS
-import time
+from ui_components import (setup_page, session_articles, count_sentiments, show_statistics,
+                           show_articles, start_fetch_job, poll_fetch_job, show_fetch_job_status,
+                           show_newsapi_quota, show_profile_panel, rerun_while_job_active, load_digest,
+                           entity_filter, show_entity_sentiment)
+from config import INSIGHTS_SERVICE_URL, GEMINI_STREAMING, GEMINI_DIGEST_REFRESH
+from digest_refresher import start_digest_refresher
+from telemetry import start_metrics_server
 
-# Page configuration
-st.set_page_config(
-    page_title="News & Insights Agent",
-    page_icon="📰",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Page configuration and shared styling
+setup_page()
 
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .news-card {
-        border: 1px solid #ddd;
-        border-radius: 10px;
-        padding: 15px;
-        margin: 10px 0;
-        background-color: #f9f9f9;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .sentiment-positive {
-        color: #28a745;
-        font-weight: bold;
-    }
-    .sentiment-negative {
-        color: #dc3545;
-        font-weight: bold;
-    }
-    .sentiment-neutral {
-        color: #6c757d;
-        font-weight: bold;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 15px;
-        border-radius: 8px;
-        text-align: center;
-        border-left: 4px solid #007bff;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Keep ready-made digests of every category's headlines, if opted in (the insights
+# service, when used, does its own processing)
+digests = (start_digest_refresher('gemini', NewsAgentGemini)
+           if GEMINI_DIGEST_REFRESH and not INSIGHTS_SERVICE_URL else None)
+
+# Prometheus metrics on METRICS_PORT, if configured (once per process)
+start_metrics_server()
 
 def main():
     # Initialize session state
     if 'news_agent' not in st.session_state:
         try:
-            st.session_state.news_agent = NewsAgentGemini()
+            if INSIGHTS_SERVICE_URL:
+                from insights_client import InsightsClient
+                st.session_state.news_agent = InsightsClient()
+            else:
+                st.session_state.news_agent = NewsAgentGemini()
         except Exception as e:
             st.error(f"Failed to initialize News Agent: {e}")
             st.session_state.news_agent = None
     
-    if 'processed_articles' not in st.session_state:
-        st.session_state.processed_articles = []
+    # Sessions hold article IDs; the articles live in the shared article pool
+    if 'article_ids' not in st.session_state:
+        st.session_state.article_ids = []
+    
+    # Pick up results (partial while running) of this session's background fetch job
+    job_active = poll_fetch_job()
     
     # Header
     st.title("📰 News & Insights Agent")
@@ -89,18 +69,39 @@ def main():
         # Rate limit warning
         st.info("⚠️ **Rate Limit Notice**: Gemini free tier allows 15 requests per minute. Processing 5 articles = 10 requests (5 summaries + 5 sentiment analyses).")
         
+        # Category headlines come from the background digest; keyword searches are
+        # processed on demand
+        if not search_keyword and not st.session_state.article_ids and not job_active:
+            # Open on the selected category's digest
+            load_digest(digests, selected_category, max_articles)
+        
         # Fetch news button
-        if st.button("🔍 Fetch News", type="primary"):
-            with st.spinner("Fetching and processing news with Gemini AI..."):
-                try:
-                    st.session_state.processed_articles = st.session_state.news_agent.get_news_insights(
-                        category=selected_category,
-                        keyword=search_keyword if search_keyword else None,
-                        max_articles=max_articles
-                    )
-                    st.success(f"✅ Successfully processed {len(st.session_state.processed_articles)} articles!")
-                except Exception as e:
-                    st.error(f"Error fetching news: {e}")
+        if st.button("🔍 Fetch News", type="primary", disabled=job_active) and not (
+                not search_keyword and load_digest(digests, selected_category, max_articles)):
+            start_fetch_job(
+                st.session_state.news_agent, 'gemini',
+                # The insights service returns whole results, so only stream in-process
+                stream_summaries=GEMINI_STREAMING and not INSIGHTS_SERVICE_URL,
+                category=selected_category,
+                keyword=search_keyword if search_keyword else None,
+                max_articles=max_articles
+            )
+            job_active = True
+        
+        show_fetch_job_status()
+        
+        # Requests left in the NewsAPI daily budget (the service reports its own in /health)
+        if not INSIGHTS_SERVICE_URL:
+            show_newsapi_quota()
+        
+        # Gemini summary latency (first token and completion) and token spend
+        inference_stats = st.session_state.news_agent.get_inference_stats()
+        if inference_stats:
+            with st.expander("⚙️ Gemini Usage"):
+                st.json(inference_stats)
+        
+        # Step breakdown of the last run when profiling is on
+        show_profile_panel()
         
         # Filters
         st.header("🎛️ Filters")
@@ -109,84 +110,26 @@ def main():
         sentiment_options = ["All", "POSITIVE", "NEGATIVE", "NEUTRAL"]
         selected_sentiment = st.selectbox("Filter by Sentiment", sentiment_options)
         
+        # Entity filter (companies, people and places, from the entity index)
+        selected_entity = entity_filter()
+        
         # Apply filters
-        filtered_articles = st.session_state.processed_articles.copy()
-        if selected_sentiment != "All":
-            filtered_articles = st.session_state.news_agent.filter_articles_by_sentiment(
-                filtered_articles, selected_sentiment
-            )
+        articles = session_articles()
+        if selected_sentiment != "All" or selected_entity:
+            filtered_articles = session_articles(
+                selected_sentiment if selected_sentiment != "All" else None, selected_entity)
+        else:
+            filtered_articles = articles
     
     # Main content area
-    if st.session_state.processed_articles:
+    if articles:
         # Statistics
-        st.header("📊 News Statistics")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Articles", len(st.session_state.processed_articles))
-        
-        with col2:
-            positive_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'POSITIVE')
-            st.metric("Positive", positive_count)
-        
-        with col3:
-            negative_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'NEGATIVE')
-            st.metric("Negative", negative_count)
+        sentiment_stats = count_sentiments(articles)
+        show_statistics(len(articles), sentiment_stats)
+        show_entity_sentiment()
         
-        with col4:
-            neutral_count = sum(1 for article in st.session_state.processed_articles 
-                              if article.get('sentiment') == 'NEUTRAL')
-            st.metric("Neutral", neutral_count)
-        
-        # Sentiment distribution chart
-        if len(st.session_state.processed_articles) > 0:
-            sentiment_stats = st.session_state.news_agent.get_sentiment_stats(st.session_state.processed_articles)
-            
-            fig = px.pie(
-                values=list(sentiment_stats.values()),
-                names=list(sentiment_stats.keys()),
-                title="Sentiment Distribution",
-                color_discrete_map={
-                    'POSITIVE': '#28a745',
-                    'NEGATIVE': '#dc3545',
-                    'NEUTRAL': '#6c757d'
-                }
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # News articles
-        st.header(f"📰 News Articles ({len(filtered_articles)} articles)")
-        
-        if filtered_articles:
-            for i, article in enumerate(filtered_articles):
-                with st.container():
-                    st.markdown(f"""
-                    <div class="news-card">
-                        <h3>{article.get('title', 'No title')}</h3>
-                        <p><strong>Source:</strong> {article.get('source', {}).get('name', 'Unknown')} | 
-                        <strong>Published:</strong> {article.get('publishedAt', 'Unknown date')[:10]}</p>
-                        <p><strong>Summary:</strong> {article.get('summary', 'No summary available')}</p>
-                        <div style="background-color: #f8f9fa; padding: 10px; border-radius: 5px; margin: 10px 0;">
-                            <strong>📝 AI Summary:</strong><br>
-                            {article.get('summary', 'No summary available')}
-                        </div>
-                        <p><strong>Sentiment:</strong> 
-                        <span class="sentiment-{article.get('sentiment', 'neutral').lower()}">
-                            {SENTIMENT_LABELS.get(article.get('sentiment', 'NEUTRAL'), '😐')} 
-                            {article.get('sentiment', 'NEUTRAL')} 
-                            ({article.get('sentiment_confidence', 0):.2f})
-                        </span></p>
-                        <p><strong>Original Description:</strong> {article.get('description', 'No description')[:200]}...</p>
-                        <p><a href="{article.get('url', '#')}" target="_blank">Read Full Article →</a></p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown("---")
-        else:
-            st.warning("No articles match the selected filters.")
+        # News articles (paginated)
+        show_articles(filtered_articles)
     
     else:
         # Welcome message
@@ -232,6 +175,9 @@ def main():
             - NewsAPI: 100 requests per day
             - Gemini: 15 requests per minute, 1,500 requests per day
             """)
+    
+    # Keep polling the background job until it finishes
+    rerun_while_job_active(job_active)
 
 if __name__ == "__main__":
     main()
@@ -1,51 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from news_fetcher import NewsFetcher
-from config import SENTIMENT_LABELS
-import time
+from ui_components import (setup_page, session_articles, count_sentiments, show_statistics,
+                           show_articles)
+from article_pool import get_article_pool
 
-# Page configuration
-st.set_page_config(
-    page_title="News & Insights Agent",
-    page_icon="📰",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .news-card {
-        border: 1px solid #ddd;
-        border-radius: 10px;
-        padding: 15px;
-        margin: 10px 0;
-        background-color: #f9f9f9;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .sentiment-positive {
-        color: #28a745;
-        font-weight: bold;
-    }
-    .sentiment-negative {
-        color: #dc3545;
-        font-weight: bold;
-    }
-    .sentiment-neutral {
-        color: #6c757d;
-        font-weight: bold;
-    }
-    .metric-card {
-        background-color: #f8f9fa;
-        padding: 15px;
-        border-radius: 8px;
-        text-align: center;
-        border-left: 4px solid #007bff;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Page configuration and shared styling
+setup_page()
 
 def simple_sentiment_analysis(text):
     """Simple keyword-based sentiment analysis"""
@@ -74,8 +34,9 @@ def main():
     if 'news_fetcher' not in st.session_state:
         st.session_state.news_fetcher = NewsFetcher()
     
-    if 'processed_articles' not in st.session_state:
-        st.session_state.processed_articles = []
+    # Sessions hold article IDs; the articles live in the shared article pool
+    if 'article_ids' not in st.session_state:
+        st.session_state.article_ids = []
     
     # Header
     st.title("📰 News & Insights Agent")
@@ -120,12 +81,10 @@ def main():
                         summary = simple_summarize(article.get('description', ''), 150)
                         
                         # Add processed data
-                        article['summary'] = summary
-                        article['sentiment'] = sentiment
-                        article['sentiment_confidence'] = confidence
-                        processed_articles.append(article)
+                        processed_articles.append(article.processed(summary, sentiment, confidence))
                 
-                st.session_state.processed_articles = processed_articles
+                st.session_state.article_ids = get_article_pool().add_many(processed_articles,
+                                                                           (('backend', 'simple'),))
                 st.success(f"✅ Fetched and processed {len(processed_articles)} articles!")
         
         # Filters
@@ -136,82 +95,20 @@ def main():
         selected_sentiment = st.selectbox("Filter by Sentiment", sentiment_options)
         
         # Apply filters
-        filtered_articles = st.session_state.processed_articles.copy()
+        articles = session_articles()
         if selected_sentiment != "All":
-            filtered_articles = [article for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == selected_sentiment]
+            filtered_articles = session_articles(selected_sentiment)
+        else:
+            filtered_articles = articles
     
     # Main content area
-    if st.session_state.processed_articles:
+    if articles:
         # Statistics
-        st.header("📊 News Statistics")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Articles", len(st.session_state.processed_articles))
-        
-        with col2:
-            positive_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'POSITIVE')
-            st.metric("Positive", positive_count)
-        
-        with col3:
-            negative_count = sum(1 for article in st.session_state.processed_articles 
-                               if article.get('sentiment') == 'NEGATIVE')
-            st.metric("Negative", negative_count)
+        sentiment_stats = count_sentiments(articles)
+        show_statistics(len(articles), sentiment_stats)
         
-        with col4:
-            neutral_count = sum(1 for article in st.session_state.processed_articles 
-                              if article.get('sentiment') == 'NEUTRAL')
-            st.metric("Neutral", neutral_count)
-        
-        # Sentiment distribution chart
-        if len(st.session_state.processed_articles) > 0:
-            sentiment_stats = {
-                'POSITIVE': positive_count,
-                'NEGATIVE': negative_count,
-                'NEUTRAL': neutral_count
-            }
-            
-            fig = px.pie(
-                values=list(sentiment_stats.values()),
-                names=list(sentiment_stats.keys()),
-                title="Sentiment Distribution",
-                color_discrete_map={
-                    'POSITIVE': '#28a745',
-                    'NEGATIVE': '#dc3545',
-                    'NEUTRAL': '#6c757d'
-                }
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # News articles
-        st.header(f"📰 News Articles ({len(filtered_articles)} articles)")
-        
-        if filtered_articles:
-            for i, article in enumerate(filtered_articles):
-                with st.container():
-                    st.markdown(f"""
-                    <div class="news-card">
-                        <h3>{article.get('title', 'No title')}</h3>
-                        <p><strong>Source:</strong> {article.get('source', {}).get('name', 'Unknown')} | 
-                        <strong>Published:</strong> {article.get('publishedAt', 'Unknown date')[:10]}</p>
-                        <p><strong>Summary:</strong> {article.get('summary', 'No summary available')}</p>
-                        <p><strong>Sentiment:</strong> 
-                        <span class="sentiment-{article.get('sentiment', 'neutral').lower()}">
-                            {SENTIMENT_LABELS.get(article.get('sentiment', 'NEUTRAL'), '😐')} 
-                            {article.get('sentiment', 'NEUTRAL')} 
-                            ({article.get('sentiment_confidence', 0):.2f})
-                        </span></p>
-                        <p><strong>Original Description:</strong> {article.get('description', 'No description')[:200]}...</p>
-                        <p><a href="{article.get('url', '#')}" target="_blank">Read Full Article →</a></p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown("---")
-        else:
-            st.warning("No articles match the selected filters.")
+        # News articles (paginated)
+        show_articles(filtered_articles)
     
     else:
         # Welcome message
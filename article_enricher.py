@@ -0,0 +1,298 @@
+"""
+Full article bodies for NewsAPI articles
+
+NewsAPI's free tier cuts `content` to about 200 characters. With enrichment on,
+the article pages are downloaded concurrently (ENRICH_WORKERS at a time over a
+pooled HTTP session) while each site gets at most ENRICH_PER_DOMAIN_CONCURRENCY
+requests at once, ENRICH_DOMAIN_INTERVAL_MS apart. The main text is extracted
+from the page's paragraphs and cached by URL, and it replaces the truncated
+`content`, so long-content processing sees the real article.
+
+Enrichment waits at most ENRICH_DEADLINE_SECONDS; pages still loading then keep
+their NewsAPI content, and finish in the background into the cache.
+
+selectolax is used for HTML parsing when installed, the stdlib parser otherwise.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from articles import Article, as_article
+from config import (ENRICH_WORKERS, ENRICH_PER_DOMAIN_CONCURRENCY, ENRICH_DOMAIN_INTERVAL_MS,
+                    ENRICH_TIMEOUT_SECONDS, ENRICH_DEADLINE_SECONDS, ENRICH_MAX_BYTES,
+                    ENRICH_CACHE_SIZE, ENRICH_USER_AGENT)
+from telemetry import CACHE_REQUESTS, ENRICHED_PAGES, ENRICH_SECONDS, get_logger
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:
+    # selectolax is optional; the stdlib parser extracts the same paragraphs, just slower
+    FastHTMLParser = None
+
+logger = get_logger(__name__)
+
+# Page sections that never hold the article text
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form')
+# Paragraphs shorter than this are captions, bylines and buttons
+MIN_PARAGRAPH_WORDS = 6
+# Extracted text shorter than this is not an article body
+MIN_BODY_CHARS = 300
+# NewsAPI points removed articles here
+REMOVED_URL = 'https://removed.com'
+
+
+class _ParagraphParser(HTMLParser):
+    """Collects <p> text outside boilerplate sections, noting which paragraphs are inside <article>"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []
+        self._skip_depth = 0
+        self._article_depth = 0
+        self._paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BOILERPLATE_TAGS:
+            self._skip_depth += 1
+        elif tag == 'article':
+            self._article_depth += 1
+        elif tag == 'p' and not self._skip_depth:
+            self._flush()
+            self._paragraph = []
+
+    def handle_endtag(self, tag):
+        if tag in BOILERPLATE_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'article':
+            self._article_depth = max(0, self._article_depth - 1)
+        elif tag == 'p':
+            self._flush()
+
+    def handle_data(self, data):
+        if self._paragraph is not None and not self._skip_depth:
+            self._paragraph.append(data)
+
+    def _flush(self):
+        if self._paragraph is not None:
+            self.paragraphs.append((' '.join(''.join(self._paragraph).split()), self._article_depth > 0))
+            self._paragraph = None
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _paragraphs(html: str) -> List[str]:
+    if FastHTMLParser is not None:
+        tree = FastHTMLParser(html)
+        tree.strip_tags(list(BOILERPLATE_TAGS))
+        root = tree.css_first('article') or tree.body
+        if root is None:
+            return []
+        return [' '.join(node.text(separator=' ').split()) for node in root.css('p')]
+
+    parser = _ParagraphParser()
+    parser.feed(html)
+    parser.close()
+    # Prefer the <article> element's paragraphs when the page marks one up
+    in_article = [text for text, inside in parser.paragraphs if inside]
+    return in_article or [text for text, _ in parser.paragraphs]
+
+
+def extract_main_text(html: str) -> str:
+    """
+    The article text of an HTML page: its substantial paragraphs, in order
+
+    Returns:
+        The paragraphs joined with blank lines, or '' if the page has no article-sized text
+    """
+    paragraphs = [text for text in _paragraphs(html) if len(text.split()) >= MIN_PARAGRAPH_WORDS]
+    body = '\n\n'.join(paragraphs)
+    return body if len(body) >= MIN_BODY_CHARS else ''
+
+
+class _DomainLimiter:
+    """At most `concurrency` requests per domain at once, started at least `interval` apart"""
+
+    def __init__(self, concurrency: int, interval_seconds: float):
+        self.concurrency = concurrency
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def acquire(self, domain: str):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(domain, threading.BoundedSemaphore(self.concurrency))
+        semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start + self.interval_seconds
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, domain: str):
+        with self._lock:
+            semaphore = self._semaphores[domain]
+        semaphore.release()
+
+
+class ArticleEnricher:
+    """Replaces truncated NewsAPI content with the article text from its page"""
+
+    def __init__(self, workers: int = ENRICH_WORKERS,
+                 per_domain_concurrency: int = ENRICH_PER_DOMAIN_CONCURRENCY,
+                 domain_interval_ms: float = ENRICH_DOMAIN_INTERVAL_MS,
+                 timeout_seconds: float = ENRICH_TIMEOUT_SECONDS,
+                 deadline_seconds: float = ENRICH_DEADLINE_SECONDS,
+                 cache_size: int = ENRICH_CACHE_SIZE):
+        """
+        Args:
+            workers: Pages downloaded at once across all sites
+            per_domain_concurrency: Pages downloaded at once from one site
+            domain_interval_ms: Minimum gap between request starts to one site
+            timeout_seconds: Connect/read timeout per page
+            deadline_seconds: Longest enrich() waits for a batch of pages
+            cache_size: Extracted bodies kept, by URL
+        """
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.cache_size = cache_size
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich")
+        self._limiter = _DomainLimiter(per_domain_concurrency, domain_interval_ms / 1000)
+        # One keep-alive connection pool per host, sized for the worker count
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._session.headers['User-Agent'] = ENRICH_USER_AGENT
+
+        self._lock = threading.Lock()
+        self._bodies = OrderedDict()
+        self._in_flight = {}
+
+    def _cached(self, url: str) -> Optional[str]:
+        with self._lock:
+            body = self._bodies.get(url)
+            if body is not None:
+                self._bodies.move_to_end(url)
+            return body
+
+    def _store(self, url: str, body: str):
+        with self._lock:
+            self._bodies[url] = body
+            self._bodies.move_to_end(url)
+            while len(self._bodies) > self.cache_size:
+                self._bodies.popitem(last=False)
+
+    def _download(self, url: str) -> Optional[str]:
+        """Fetch and extract one page; None if it could not be downloaded"""
+        domain = urlparse(url).netloc.lower()
+        self._limiter.acquire(domain)
+        start = time.perf_counter()
+        try:
+            with self._session.get(url, timeout=self.timeout_seconds, stream=True) as response:
+                response.raise_for_status()
+                if 'html' not in response.headers.get('Content-Type', 'text/html'):
+                    ENRICHED_PAGES.inc(outcome='not_html')
+                    self._store(url, '')
+                    return ''
+                data = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) >= ENRICH_MAX_BYTES:
+                        break
+                html = bytes(data).decode(response.encoding or 'utf-8', errors='replace')
+        except requests.exceptions.RequestException as e:
+            ENRICHED_PAGES.inc(outcome='error')
+            logger.debug("Could not download article page", domain=domain, error=str(e))
+            return None
+        finally:
+            self._limiter.release(domain)
+            ENRICH_SECONDS.observe(time.perf_counter() - start)
+
+        body = extract_main_text(html)
+        ENRICHED_PAGES.inc(outcome='ok' if body else 'empty')
+        # Pages without article text are cached too, so they aren't downloaded again
+        self._store(url, body)
+        return body
+
+    def _submit(self, url: str):
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._download, url)
+            self._in_flight[url] = future
+        future.add_done_callback(lambda done: self._forget(url))
+        return future
+
+    def _forget(self, url: str):
+        with self._lock:
+            self._in_flight.pop(url, None)
+
+    def enrich(self, articles: List[Article]) -> List[Article]:
+        """
+        Replace each article's truncated content with the text of its page, where available
+
+        Args:
+            articles: Articles (or NewsAPI dictionaries) to enrich
+
+        Returns:
+            The articles in order; enriched ones are copies with the full body as `content`
+        """
+        articles = [as_article(article) for article in articles]
+        bodies = {}
+        futures = {}
+        for article in articles:
+            url = article.get('url')
+            if not url or not url.startswith(('http://', 'https://')) or url.startswith(REMOVED_URL):
+                continue
+            body = self._cached(url)
+            CACHE_REQUESTS.inc(cache='article_bodies', result='hit' if body is not None else 'miss')
+            if body is not None:
+                bodies[url] = body
+            elif url not in futures:
+                futures[url] = self._submit(url)
+
+        if futures:
+            done, pending = wait(futures.values(), timeout=self.deadline_seconds)
+            for url, future in futures.items():
+                if future in done and future.exception() is None and future.result() is not None:
+                    bodies[url] = future.result()
+            if pending:
+                ENRICHED_PAGES.inc(len(pending), outcome='deadline')
+                logger.info("Article pages still loading at the deadline", pending=len(pending),
+                            deadline_s=self.deadline_seconds)
+
+        enriched = [article.with_content(bodies[article.url])
+                    if len(bodies.get(article.url) or '') > len(article.get('content', '')) else article
+                    for article in articles]
+        logger.info("Enriched articles", count=len(articles),
+                    enriched=sum(1 for new, old in zip(enriched, articles) if new is not old))
+        return enriched
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'cached_bodies': len(self._bodies), 'in_flight': len(self._in_flight)}
+
+
+_enricher = None
+_enricher_lock = threading.Lock()
+
+
+def get_article_enricher() -> ArticleEnricher:
+    """Get the process-wide article enricher"""
+    global _enricher
+    with _enricher_lock:
+        if _enricher is None:
+            _enricher = ArticleEnricher()
+        return _enricher
@@ -0,0 +1,156 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import ARTICLE_POOL_MAX_MB, ARTICLE_POOL_MAX_ARTICLES
+from articles import ProcessedArticle
+
+# Fields the UI, filters and stats never read; cleared in pooled records
+DROPPED_FIELDS = ('content', 'url_to_image', 'author', 'source_id')
+# The cards show at most this much of the description
+DESCRIPTION_CHARS = 200
+# Low-cardinality values shared between records instead of stored once per article
+INTERNED_FIELDS = ('sentiment', 'summary_model', 'sentiment_model', 'source_name')
+
+
+def article_id(article: Dict) -> str:
+    """Stable ID for an article: its URL, or a hash of title and publish date"""
+    if article.get('url'):
+        return article['url']
+    key = f"{article.get('title', '')}|{article.get('publishedAt', '')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def pool_key(article: Dict, settings: Tuple = ()) -> str:
+    """
+    Pool ID for a processed article: its article ID, the models that processed it and the settings
+
+    The same URL summarized with another model, decoding profile or long-content mode
+    gets its own record, so one session's results never replace another's.
+
+    Args:
+        article: Processed article
+        settings: (name, value) pairs of the processing options (e.g. backend, decoding_profile)
+    """
+    parts = [article_id(article), article.get('summary_model') or '', article.get('sentiment_model') or '']
+    parts.extend(f"{name}={value}" for name, value in settings)
+    return '|'.join(parts)
+
+
+def compact_article(article: Dict) -> ProcessedArticle:
+    """Copy of a processed article with only the fields the app displays"""
+    record = ProcessedArticle.from_dict(article)
+    for attr in DROPPED_FIELDS:
+        setattr(record, attr, None)
+    if record.description:
+        record.description = record.description[:DESCRIPTION_CHARS]
+    return record
+
+
+def _record_size(record: ProcessedArticle) -> int:
+    """Approximate memory used by one compact record in bytes (shared interned values excluded)"""
+    size = sys.getsizeof(record)
+    for attr in record.attributes():
+        value = getattr(record, attr)
+        if value is not None and attr not in INTERNED_FIELDS:
+            size += sys.getsizeof(value)
+    return size
+
+
+class ArticlePool:
+    """Process-wide LRU pool of compact processed articles, bounded by memory and count"""
+
+    def __init__(self, max_mb: float = ARTICLE_POOL_MAX_MB,
+                 max_articles: int = ARTICLE_POOL_MAX_ARTICLES):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_articles = max_articles
+
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self.evictions = 0
+
+    def add(self, article: Dict, settings: Tuple = ()) -> str:
+        """
+        Store a processed article (replacing an older version with the same ID)
+
+        Args:
+            article: Processed article (or its dictionary)
+            settings: (name, value) pairs of the options it was processed with (see pool_key)
+
+        Returns:
+            The article's pool ID
+        """
+        key = pool_key(article, settings)
+        record = compact_article(article)
+        size = _record_size(record)
+
+        with self._lock:
+            if key in self._records:
+                self._bytes -= self._sizes[key]
+            self._records[key] = record
+            self._records.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            self._evict()
+        return key
+
+    def add_many(self, articles: Iterable[Dict], settings: Tuple = ()) -> List[str]:
+        """Store several articles processed with the same settings and return their IDs in order"""
+        return [self.add(article, settings) for article in articles]
+
+    def _evict(self):
+        # Least recently used first, but never the record just added
+        while len(self._records) > 1 and (self._bytes > self.max_bytes or len(self._records) > self.max_articles):
+            key, _ = self._records.popitem(last=False)
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[ProcessedArticle]:
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+            return record
+
+    def get_many(self, keys: Iterable[str]) -> List[ProcessedArticle]:
+        """Records for the given IDs, in order, skipping any that were evicted"""
+        with self._lock:
+            records = []
+            for key in keys:
+                record = self._records.get(key)
+                if record is not None:
+                    self._records.move_to_end(key)
+                    records.append(record)
+            return records
+
+    def filter_ids(self, keys: Iterable[str], sentiment: str = None) -> List[str]:
+        """IDs whose article has the given sentiment (all present IDs if no sentiment)"""
+        with self._lock:
+            return [key for key in keys
+                    if key in self._records
+                    and (not sentiment or self._records[key].get('sentiment') == sentiment)]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'articles': len(self._records),
+                'megabytes': round(self._bytes / (1024 * 1024), 2),
+                'max_megabytes': round(self.max_bytes / (1024 * 1024), 2),
+                'evictions': self.evictions
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_article_pool() -> ArticlePool:
+    """Get the process-wide article pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ArticlePool()
+        return _pool
@@ -0,0 +1,223 @@
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from orjson import loads
+except ImportError:
+    # orjson is optional; the stdlib parser gives the same result, just slower
+    from json import loads
+
+# (attribute, NewsAPI key) pairs; `source` is flattened into source_id/source_name
+ARTICLE_FIELDS = (
+    ('author', 'author'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('url', 'url'),
+    ('url_to_image', 'urlToImage'),
+    ('published_at', 'publishedAt'),
+    ('content', 'content'),
+)
+PROCESSED_FIELDS = (
+    ('summary', 'summary'),
+    ('sentiment', 'sentiment'),
+    ('sentiment_confidence', 'sentiment_confidence'),
+    ('summary_model', 'summary_model'),
+    ('sentiment_model', 'sentiment_model'),
+)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Share one copy of low-cardinality strings (source names, labels, model IDs)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Article:
+    """
+    A NewsAPI article
+
+    Slotted, so an article costs a fixed handful of pointers instead of a dict.
+    Read access by NewsAPI key (`article['publishedAt']`, `article.get('source')`)
+    is kept so code written against the raw JSON dicts works unchanged.
+    """
+
+    __slots__ = ('source_id', 'source_name') + tuple(attr for attr, _ in ARTICLE_FIELDS)
+    _fields = ARTICLE_FIELDS
+    _attributes = {key: attr for attr, key in ARTICLE_FIELDS}
+
+    def __init__(self, title: str = None, description: str = None, url: str = None,
+                 published_at: str = None, content: str = None, author: str = None,
+                 url_to_image: str = None, source_id: str = None, source_name: str = None):
+        self.title = title
+        self.description = description
+        self.url = url
+        self.published_at = published_at
+        self.content = content
+        self.author = author
+        self.url_to_image = url_to_image
+        self.source_id = source_id
+        self.source_name = _intern(source_name)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Article':
+        """Build from a NewsAPI-shaped dictionary (unknown keys are dropped)"""
+        article = cls.__new__(cls)
+        source = data.get('source') or {}
+        article.source_id = source.get('id')
+        article.source_name = _intern(source.get('name'))
+        for attr, key in cls._fields:
+            setattr(article, attr, data.get(key))
+        return article
+
+    def to_dict(self) -> Dict:
+        """NewsAPI-shaped dictionary, for JSON output"""
+        data = {'source': {'id': self.source_id, 'name': self.source_name}}
+        for attr, key in self._fields:
+            data[key] = getattr(self, attr)
+        return data
+
+    def with_content(self, content: str) -> 'Article':
+        """This article with a different body (e.g. the full page text); other fields are shared"""
+        result = type(self).__new__(type(self))
+        for attr in self.attributes():
+            setattr(result, attr, getattr(self, attr))
+        result.content = content
+        return result
+
+    def __getitem__(self, key: str):
+        if key == 'source':
+            return {'id': self.source_id, 'name': self.source_name}
+        try:
+            return getattr(self, self._attributes[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        """Value for a NewsAPI key, or default when it is missing or null"""
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for attr in self.attributes())
+
+    # Equality compares every (mutable) field, so articles are deliberately unhashable;
+    # key sets and dicts by article_pool.article_id instead
+    __hash__ = None
+
+    @classmethod
+    def attributes(cls) -> Tuple[str, ...]:
+        """All slot names, base class first"""
+        return tuple(attr for klass in reversed(cls.__mro__) for attr in getattr(klass, '__slots__', ()))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(title={self.title!r}, url={self.url!r})"
+
+    def processed(self, summary: str, sentiment: str, sentiment_confidence: float,
+                  summary_model: str = None, sentiment_model: str = None) -> 'ProcessedArticle':
+        """
+        This article with insights attached
+
+        The new object shares the original field values; nothing is copied.
+        """
+        result = ProcessedArticle.__new__(ProcessedArticle)
+        for attr in Article.__slots__:
+            setattr(result, attr, getattr(self, attr))
+        result.summary = summary
+        result.sentiment = _intern(sentiment)
+        result.sentiment_confidence = sentiment_confidence
+        result.summary_model = _intern(summary_model)
+        result.sentiment_model = _intern(sentiment_model)
+        return result
+
+
+class ProcessedArticle(Article):
+    """An article with summary, sentiment and the models that produced them"""
+
+    __slots__ = tuple(attr for attr, _ in PROCESSED_FIELDS)
+    _fields = ARTICLE_FIELDS + PROCESSED_FIELDS
+    _attributes = {key: attr for attr, key in ARTICLE_FIELDS + PROCESSED_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ProcessedArticle':
+        article = super().from_dict(data)
+        for attr in ('sentiment', 'summary_model', 'sentiment_model'):
+            setattr(article, attr, _intern(getattr(article, attr)))
+        return article
+
+
+def as_article(article) -> Article:
+    """Accept either an Article or a NewsAPI-shaped dictionary"""
+    return article if isinstance(article, Article) else Article.from_dict(article)
+
+
+def analysis_text(article: Article, long_content: bool = False) -> str:
+    """
+    The text to summarize and classify for an article
+
+    Args:
+        article: Article (or NewsAPI dictionary) with title, description, content
+        long_content: Include the article body from `content`
+
+    Returns:
+        Title and description, followed by the body in long-content mode
+    """
+    full_text = f"{article.get('title', '')} {article.get('description', '')}"
+    if long_content and article.get('content'):
+        # NewsAPI marks truncated bodies with a trailing "[+1234 chars]"
+        content = re.sub(r'\s*\[\+\d+ chars\]\s*$', '', article['content'])
+        full_text = f"{full_text} {content}"
+    return full_text
+
+
+def parse_newsapi_response(body: bytes) -> Tuple[str, List[Article], Optional[str]]:
+    """
+    Decode a NewsAPI response body straight into Article objects
+
+    Args:
+        body: Raw response bytes
+
+    Returns:
+        (status, articles, error message)
+    """
+    data = loads(body)
+    articles = [Article.from_dict(item) for item in data.get('articles') or []]
+    return data.get('status'), articles, data.get('message')
+
+
+def json_default(obj):
+    """`default` hook for json.dumps: articles serialize to NewsAPI-shaped dicts"""
+    if isinstance(obj, Article):
+        return obj.to_dict()
+    return str(obj)
+
+
+def to_columns(articles: Iterable[Article], fields: Iterable[str] = None) -> Dict[str, List]:
+    """
+    Columnar view of articles: one list per attribute
+
+    The columns reference the articles' existing values, so no strings are copied
+    and no per-article dictionaries are built.
+
+    Args:
+        articles: Articles (all ProcessedArticle to include insight columns)
+        fields: Attribute names to include (default: every attribute of the first article)
+
+    Returns:
+        Dictionary of attribute name to list of values
+    """
+    articles = list(articles)
+    if fields is None:
+        fields = type(articles[0]).attributes() if articles else ()
+    return {field: [getattr(article, field, None) for article in articles] for field in fields}
+
+
+def to_dataframe(articles: Iterable[Article], fields: Iterable[str] = None):
+    """pandas DataFrame built from to_columns"""
+    import pandas as pd
+
+    return pd.DataFrame(to_columns(articles, fields), copy=False)
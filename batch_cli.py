@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Headless batch processing for News & Insights Agent
+
+Reads articles from NewsAPI or from JSONL files, adds summaries and sentiment in
+batches, and streams the results to JSONL or Parquet. Progress is checkpointed after
+every batch so an interrupted run resumes where it stopped.
+
+Examples:
+    # Re-analyze a month of exported articles with 4 threads
+    python batch_cli.py --input articles/*.jsonl --output insights.jsonl --concurrency 4
+
+    # Fetch 5 pages of keyword results from NewsAPI and process them with Gemini
+    python batch_cli.py --keyword "climate" --from 2024-05-01 --to 2024-05-31 --pages 5 \\
+        --backend gemini --output climate.parquet
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List
+from article_pool import article_id
+from articles import Article, json_default, loads, to_dataframe
+from telemetry import correlation_scope, in_current_context
+
+# Parquet dataset part files written by ParquetWriter
+PART_FILE = re.compile(r'part-(\d{5})\.parquet$')
+
+
+def read_jsonl(paths: List[str]) -> Iterator[Article]:
+    """Stream articles from JSONL files (one NewsAPI article object per line)"""
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield Article.from_dict(loads(line))
+                except ValueError as e:
+                    print(f"Skipping {path}:{line_number}: {e}")
+
+
+def read_newsapi(categories: List[str], keyword: str, pages: int, page_size: int,
+                 from_date: str, to_date: str) -> Iterator[Article]:
+    """Stream articles from NewsAPI, one results page at a time"""
+    from news_fetcher import NewsFetcher
+
+    fetcher = NewsFetcher()
+    for category in categories:
+        for page in range(1, pages + 1):
+            articles = fetcher.fetch_news(category=category, keyword=keyword, page_size=page_size,
+                                          page=page, from_date=from_date, to_date=to_date)
+            yield from articles
+            if len(articles) < page_size:
+                break
+        if keyword:
+            # Keyword search ignores the category, so one pass is enough
+            break
+
+
+def batched(articles: Iterable[Article], size: int) -> Iterator[List[Article]]:
+    batch = []
+    for article in articles:
+        batch.append(article)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """Persistent record of processed article IDs and how much output was committed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        self.output_offset = 0
+        self.parts = 0
+
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.done = set(state.get('done', []))
+            self.output_offset = state.get('output_offset', 0)
+            self.parts = state.get('parts', 0)
+
+    def save(self):
+        # Write atomically so a crash never leaves a half-written checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'done': sorted(self.done), 'output_offset': self.output_offset,
+                       'parts': self.parts}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class JsonlWriter:
+    """Appends results to a JSONL file, rolling back anything written after the last checkpoint"""
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+        self.file = open(path, 'a+b')
+        self.file.truncate(checkpoint.output_offset)
+        self.file.seek(checkpoint.output_offset)
+
+    def write_batch(self, records: List[Article]):
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False, default=json_default).encode('utf-8') + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.checkpoint.output_offset = self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes each batch as a numbered part file inside a Parquet dataset directory"""
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self.path = path
+        self.checkpoint = checkpoint
+        os.makedirs(path, exist_ok=True)
+
+        # Remove parts written after the last checkpoint (other files are left alone)
+        for name in os.listdir(path):
+            match = PART_FILE.match(name)
+            if match and int(match.group(1)) >= checkpoint.parts:
+                os.remove(os.path.join(path, name))
+
+    def write_batch(self, records: List[Article]):
+        part_path = os.path.join(self.path, f"part-{self.checkpoint.parts:05d}.parquet")
+        to_dataframe(records).to_parquet(part_path, index=False)
+        self.checkpoint.parts += 1
+
+    def close(self):
+        pass
+
+
+def has_output(path: str) -> bool:
+    """Whether path holds results: a non-empty file, or a directory with anything in it"""
+    if os.path.isdir(path):
+        return bool(os.listdir(path))
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def create_agent(backend: str):
+    if backend == 'gemini':
+        from news_agent_gemini import NewsAgentGemini
+        return NewsAgentGemini()
+
+    from news_agent import NewsAgent
+    return NewsAgent()
+
+
+def process_batch(agent, backend: str, batch: List[Article], concurrency: int, options: Dict) -> List[Article]:
+    """Process one batch, splitting it across threads when concurrency > 1"""
+    if backend == 'gemini':
+        options = {key: value for key, value in options.items() if key != 'decoding_profile'}
+
+    if concurrency <= 1 or len(batch) <= 1:
+        return agent.process_articles(batch, **options)
+
+    chunks = [batch[i::concurrency] for i in range(concurrency)]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Worker threads log under the run's correlation ID
+        results = executor.map(in_current_context(lambda chunk: agent.process_articles(chunk, **options)), chunks)
+    return [article for chunk_result in results for article in chunk_result]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-process news articles with summaries and sentiment")
+
+    source = parser.add_argument_group('input')
+    source.add_argument('--input', nargs='+', help="JSONL files of NewsAPI articles (otherwise fetch from NewsAPI)")
+    source.add_argument('--categories', nargs='+', default=['general'], help="NewsAPI categories to fetch")
+    source.add_argument('--keyword', help="NewsAPI keyword search")
+    source.add_argument('--from', dest='from_date', help="Oldest publish date for keyword search (ISO 8601)")
+    source.add_argument('--to', dest='to_date', help="Newest publish date for keyword search (ISO 8601)")
+    source.add_argument('--pages', type=int, default=1, help="NewsAPI result pages per category")
+    source.add_argument('--page-size', type=int, default=100, help="NewsAPI articles per page (max 100)")
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--output', required=True, help="Output path (.jsonl or .parquet)")
+    output.add_argument('--format', choices=['jsonl', 'parquet'], help="Output format (default: from extension)")
+    output.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    output.add_argument('--restart', action='store_true',
+                        help="Start over, deleting any existing checkpoint and output")
+
+    processing = parser.add_argument_group('processing')
+    processing.add_argument('--backend', choices=['huggingface', 'gemini'], default='huggingface')
+    processing.add_argument('--batch-size', type=int, default=64, help="Articles per batch/checkpoint")
+    processing.add_argument('--concurrency', type=int, default=1, help="Threads processing each batch")
+    processing.add_argument('--decoding-profile', help="Summarization decoding profile (huggingface)")
+    processing.add_argument('--long-content', action=argparse.BooleanOptionalAction, default=None,
+                            help="Summarize full article content (default: LONG_CONTENT_MODE)")
+
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+
+    if args.restart:
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if os.path.isdir(args.output):
+            shutil.rmtree(args.output)
+        elif os.path.exists(args.output):
+            os.remove(args.output)
+    elif not os.path.exists(checkpoint_path) and has_output(args.output):
+        # Nothing to resume from, so writing would replace the existing results
+        parser.error(f"{args.output} already exists and has no checkpoint to resume from; "
+                     f"pass --restart to overwrite it")
+
+    checkpoint = Checkpoint(checkpoint_path)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} articles already processed")
+
+    writer = (ParquetWriter if output_format == 'parquet' else JsonlWriter)(args.output, checkpoint)
+
+    if args.input:
+        articles = read_jsonl(args.input)
+    else:
+        articles = read_newsapi(args.categories, args.keyword, args.pages, args.page_size,
+                                args.from_date, args.to_date)
+
+    # Skip articles finished in a previous run (and duplicates within this one)
+    def pending(stream):
+        seen = set(checkpoint.done)
+        for article in stream:
+            key = article_id(article)
+            if key not in seen:
+                seen.add(key)
+                yield article
+
+    agent = create_agent(args.backend)
+    options = {'decoding_profile': args.decoding_profile, 'long_content': args.long_content}
+
+    # One correlation ID for every log line of this run
+    with correlation_scope() as run_id:
+        print(f"Run {run_id}")
+        processed = 0
+        try:
+            for batch_number, batch in enumerate(batched(pending(articles), args.batch_size), 1):
+                results = process_batch(agent, args.backend, batch, args.concurrency, options)
+                writer.write_batch(results)
+
+                checkpoint.done.update(article_id(article) for article in batch)
+                checkpoint.save()
+
+                processed += len(results)
+                print(f"Batch {batch_number}: {len(results)}/{len(batch)} processed ({processed} this run)")
+        except KeyboardInterrupt:
+            print("Interrupted; rerun the same command to resume from the last checkpoint")
+            return 130
+        finally:
+            writer.close()
+
+    print(f"Done: {processed} articles written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the fetch -> clean -> infer pipeline
+
+Measures throughput and latency percentiles for NewsAPI response parsing,
+NewsFetcher.fetch_news (against the NewsAPI stand-in replaying the payload), text
+cleaning, summarize_text, analyze_sentiment and end-to-end get_news_insights.
+No API keys or network access are needed: the payload is a recorded NewsAPI
+response or one synthesized from the evaluation set, and the models are
+lightweight stand-ins (or the configured small models with --models small).
+
+Results can be saved as a JSON baseline; later runs are compared against it and
+exit with status 1 when a benchmark is slower than the regression threshold.
+
+Usage:
+    python benchmark.py --save-baseline            # record a baseline (e.g. on main)
+    python benchmark.py                            # compare against it
+    python benchmark.py --payload top_headlines.json --models small
+    python benchmark.py --record-payload top_headlines.json   # save a live response (needs NEWS_API_KEY)
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from config import (BENCHMARK_BASELINE, BENCHMARK_REGRESSION_THRESHOLD, NEWS_API_BASE_URL,
+                    NEWS_API_KEY, SUMMARIZATION_MODEL_SMALL, SENTIMENT_MODEL_SMALL)
+from evaluate_profiles import percentile
+from standin_servers import start_newsapi_standin, synthetic_payload
+from telemetry import configure_logging
+
+STUB_SUMMARIZATION_MODEL = 'stub/extractive-summarizer'
+STUB_SENTIMENT_MODEL = 'stub/lexicon-sentiment'
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with character offsets, standing in for a fast HF tokenizer"""
+
+    model_max_length = 1024
+
+    def __call__(self, text: str, add_special_tokens: bool = True, return_offsets_mapping: bool = False):
+        offsets = [match.span() for match in re.finditer(r'\S+', text)]
+        return {'input_ids': list(range(len(offsets))), 'offset_mapping': offsets}
+
+
+class StubSummarizer:
+    """Summarization pipeline stand-in: the leading max_length words of each input"""
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, inputs, max_length: int = 60, **kwargs) -> List[Dict]:
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        return [{'summary_text': ' '.join(text.split()[:max_length])} for text in texts]
+
+
+class StubSentiment:
+    """Sentiment pipeline stand-in scoring inputs against a small word list"""
+
+    POSITIVE = {'approves', 'gains', 'growth', 'record', 'success', 'improves', 'wins', 'rise', 'new'}
+    NEGATIVE = {'loss', 'falls', 'crisis', 'fails', 'concerns', 'cuts', 'delay', 'down', 'warns'}
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def _scores(self, text: str) -> List[Dict]:
+        words = set(text.lower().split())
+        positive = len(words & self.POSITIVE) + 1
+        negative = len(words & self.NEGATIVE) + 1
+        neutral = 1.5
+        total = positive + negative + neutral
+        return sorted([{'label': 'positive', 'score': positive / total},
+                       {'label': 'negative', 'score': negative / total},
+                       {'label': 'neutral', 'score': neutral / total}],
+                      key=lambda score: score['score'], reverse=True)
+
+    def __call__(self, inputs, top_k: int = 1, **kwargs):
+        if isinstance(inputs, str):
+            return self._scores(inputs)[:1]
+        return [self._scores(text) if top_k is None else self._scores(text)[0] for text in inputs]
+
+
+def create_processor(models: str):
+    """TextProcessor with stand-in models, or the configured small models"""
+    from text_processor import TextProcessor
+
+    if models == 'small':
+        return TextProcessor(summarization_model=SUMMARIZATION_MODEL_SMALL,
+                             sentiment_model=SENTIMENT_MODEL_SMALL,
+                             auto_model_selection=False, use_batching=False)
+
+    return TextProcessor(
+        summarization_model=STUB_SUMMARIZATION_MODEL,
+        sentiment_model=STUB_SENTIMENT_MODEL,
+        auto_model_selection=False,
+        use_batching=False,
+        pipelines={
+            ('summarization', STUB_SUMMARIZATION_MODEL): StubSummarizer(),
+            ('sentiment-analysis', STUB_SENTIMENT_MODEL): StubSentiment()
+        }
+    )
+
+
+def measure(function: Callable, inputs: List, repeats: int) -> Dict:
+    """Call function on every input `repeats` times; report throughput and latency percentiles"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for value in inputs:
+            call_start = time.perf_counter()
+            function(value)
+            latencies.append((time.perf_counter() - call_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'runs': len(latencies),
+        'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms_p50': round(percentile(latencies, 50), 3),
+        'latency_ms_p95': round(percentile(latencies, 95), 3),
+        'latency_ms_p99': round(percentile(latencies, 99), 3),
+        'latency_ms_mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0
+    }
+
+
+def run_benchmarks(payload: bytes, models: str, repeats: int, e2e_runs: int) -> Dict[str, Dict]:
+    from articles import parse_newsapi_response
+    from news_agent import NewsAgent
+    from news_fetcher import NewsFetcher
+
+    _, articles, _ = parse_newsapi_response(payload)
+    server = start_newsapi_standin(payload=payload)
+    fetcher = NewsFetcher(base_url=server.url)
+    processor = create_processor(models)
+    agent = NewsAgent(inference_workers=0, text_processor=processor, news_fetcher=fetcher)
+    texts = [processor.article_text(article) for article in articles]
+
+    # Load (or build) the models before timing anything
+    processor.summarize_text(texts[0])
+    processor.analyze_sentiment(texts[0])
+
+    benchmarks = {
+        'parse_response': lambda: measure(parse_newsapi_response, [payload], repeats * 10),
+        'fetch_news': lambda: measure(lambda _: fetcher.fetch_news(page_size=len(articles)), [None], repeats * 5),
+        'clean_text': lambda: measure(processor._clean_text, texts, repeats * 10),
+        'summarize_text': lambda: measure(processor.summarize_text, texts, repeats),
+        'analyze_sentiment': lambda: measure(processor.analyze_sentiment, texts, repeats),
+        'end_to_end': lambda: measure(lambda _: agent.get_news_insights(max_articles=len(articles)),
+                                      [None], e2e_runs)
+    }
+
+    results = {}
+    try:
+        for name, benchmark in benchmarks.items():
+            print(f"Running {name}...")
+            results[name] = benchmark()
+            print(f"  {results[name]}")
+    finally:
+        server.shutdown()
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Describe every benchmark slower than its baseline by more than the threshold"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('latency_ms_p50', 'latency_ms_p95'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                change = current[metric] / previous[metric] - 1
+                regressions.append(f"{name} {metric}: {previous[metric]} -> {current[metric]} (+{change:.0%})")
+        if current['throughput_per_s'] < previous['throughput_per_s'] * (1 - threshold):
+            change = 1 - current['throughput_per_s'] / previous['throughput_per_s']
+            regressions.append(f"{name} throughput_per_s: {previous['throughput_per_s']} -> "
+                               f"{current['throughput_per_s']} (-{change:.0%})")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def record_payload(path: str, category: str, page_size: int):
+    """Save a live NewsAPI top-headlines response for offline runs"""
+    import requests
+
+    response = requests.get(f"{NEWS_API_BASE_URL}/top-headlines", timeout=10, params={
+        'category': category, 'country': 'us', 'pageSize': page_size, 'apiKey': NEWS_API_KEY
+    })
+    response.raise_for_status()
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    print(f"Recorded {len(response.json().get('articles', []))} articles to {path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the fetch -> clean -> infer pipeline")
+    parser.add_argument('--payload', help="Recorded NewsAPI response (default: synthesized from the eval set)")
+    parser.add_argument('--articles', type=int, default=20, help="Articles in the synthesized payload")
+    parser.add_argument('--models', choices=['stub', 'small'], default='stub',
+                        help="Stand-in models, or the configured small models (must be cached locally)")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed passes over the articles")
+    parser.add_argument('--e2e-runs', type=int, default=3, help="Timed end-to-end get_news_insights runs")
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Write these results as the new baseline")
+    parser.add_argument('--output', help="Also write these results to this file")
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_REGRESSION_THRESHOLD,
+                        help="Relative slowdown that counts as a regression")
+    parser.add_argument('--record-payload', metavar='PATH', help="Save a live NewsAPI response and exit")
+    parser.add_argument('--category', default='general', help="Category for --record-payload")
+    parser.add_argument('--log-level', default='WARNING', help="App log level (per-call logs are noisy)")
+    args = parser.parse_args()
+    configure_logging(level=args.log_level)
+
+    if args.record_payload:
+        record_payload(args.record_payload, args.category, args.articles)
+        return 0
+
+    if args.payload:
+        with open(args.payload, 'rb') as f:
+            payload = f.read()
+    else:
+        payload = synthetic_payload(args.articles)
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'models': args.models,
+        'payload': args.payload or f"synthetic:{args.articles}",
+        'results': run_benchmarks(payload, args.models, args.repeats, args.e2e_runs)
+    }
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get('models'), baseline.get('payload')) != (report['models'], report['payload']):
+        print(f"Baseline {args.baseline} used different models or payload; not comparing")
+        return 0
+
+    regressions = compare(report['results'], baseline.get('results', {}), args.threshold)
+    print(f"Compared with baseline from commit {baseline.get('commit')}:")
+    if regressions:
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        return 1
+    print(f"  No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,13 @@ load_dotenv()
 
 # News API Configuration
 NEWS_API_KEY = os.getenv('NEWS_API_KEY', 'your_news_api_key_here')
-NEWS_API_BASE_URL = 'https://newsapi.org/v2'
+# Point at a stand-in server (standin_servers.py) for offline load and failure testing
+NEWS_API_BASE_URL = os.getenv('NEWS_API_BASE_URL', 'https://newsapi.org/v2')
 
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+# Alternative REST endpoint for Gemini, e.g. http://127.0.0.1:8702 for the stand-in server
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', '')
 
 # Available categories
 CATEGORIES = {
@@ -26,3 +29,236 @@ SENTIMENT_LABELS = {
     'NEGATIVE': '😞', 
     'NEUTRAL': '😐'
 }
+
+
+# Summarization decoding profiles
+# Each profile is a set of generation kwargs passed to the BART summarizer.
+# `python evaluate_profiles.py` measures each profile's latency/ROUGE on the local
+# hardware and writes DECODING_PROFILE_RESULTS; no results are shipped.
+DECODING_PROFILES = {
+    'fast': {
+        'num_beams': 1,
+        'do_sample': False,
+        'max_length': 40,
+        'min_length': 8,
+        'no_repeat_ngram_size': 3
+    },
+    'balanced': {
+        'num_beams': 2,
+        'do_sample': False,
+        'max_length': 50,
+        'min_length': 10,
+        'early_stopping': True,
+        'no_repeat_ngram_size': 3
+    },
+    'quality': {
+        'num_beams': 4,
+        'do_sample': False,
+        'max_length': 80,
+        'min_length': 20,
+        'early_stopping': True,
+        'length_penalty': 2.0,
+        'no_repeat_ngram_size': 3
+    }
+}
+DEFAULT_DECODING_PROFILE = os.getenv('DECODING_PROFILE', 'balanced')
+DECODING_PROFILE_EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_data', 'summarization_eval.jsonl')
+DECODING_PROFILE_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_data', 'decoding_profiles_results.json')
+
+# Offline benchmark (benchmark.py): baseline results and the slowdown that counts as a regression
+BENCHMARK_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_data', 'benchmark_baseline.json')
+BENCHMARK_REGRESSION_THRESHOLD = 0.2
+
+# Hugging Face model configuration
+# Full-size models are used normally; the smaller distilled alternatives take
+# over automatically while the processor is under load.
+SUMMARIZATION_MODEL = os.getenv('SUMMARIZATION_MODEL', 'facebook/bart-large-cnn')
+SUMMARIZATION_MODEL_SMALL = os.getenv('SUMMARIZATION_MODEL_SMALL', 'sshleifer/distilbart-cnn-12-6')
+SENTIMENT_MODEL = os.getenv('SENTIMENT_MODEL', 'cardiffnlp/twitter-roberta-base-sentiment-latest')
+SENTIMENT_MODEL_SMALL = os.getenv('SENTIMENT_MODEL_SMALL', 'lxyuan/distilbert-base-multilingual-cased-sentiments-student')
+
+# Models whose sentiment labels and input limits TextProcessor has been checked
+# against; other model IDs still load, with a warning at startup.
+SUPPORTED_SUMMARIZATION_MODELS = {
+    'facebook/bart-large-cnn': 'BART large (CNN)',
+    'sshleifer/distilbart-cnn-12-6': 'DistilBART 12-6 (CNN)',
+    'sshleifer/distilbart-cnn-6-6': 'DistilBART 6-6 (CNN)'
+}
+SUPPORTED_SENTIMENT_MODELS = {
+    'cardiffnlp/twitter-roberta-base-sentiment-latest': 'RoBERTa base (3-class)',
+    'lxyuan/distilbert-base-multilingual-cased-sentiments-student': 'DistilBERT student (3-class)',
+    'distilbert-base-uncased-finetuned-sst-2-english': 'DistilBERT SST-2 (2-class)'
+}
+
+# Load-based model selection
+# Switch to the small models when either threshold is crossed, and back once
+# load falls below the recovery thresholds for at least the dwell time.
+AUTO_MODEL_SELECTION = os.getenv('AUTO_MODEL_SELECTION', 'true').lower() == 'true'
+LOAD_SWITCH_QUEUE_DEPTH = int(os.getenv('LOAD_SWITCH_QUEUE_DEPTH', '20'))
+LOAD_SWITCH_P95_MS = float(os.getenv('LOAD_SWITCH_P95_MS', '4000'))
+LOAD_RECOVER_QUEUE_DEPTH = int(os.getenv('LOAD_RECOVER_QUEUE_DEPTH', '5'))
+LOAD_RECOVER_P95_MS = float(os.getenv('LOAD_RECOVER_P95_MS', '1500'))
+LOAD_LATENCY_WINDOW = 50
+LOAD_MIN_DWELL_SECONDS = 30
+
+# Token-aware truncation and long-content processing
+# In long-content mode the article `content` is split into token windows that
+# are summarized in batches and reduced into one summary; sentiment scores are
+# averaged across windows instead of overflowing the model's input limit.
+LONG_CONTENT_MODE = os.getenv('LONG_CONTENT_MODE', 'false').lower() == 'true'
+SUMMARY_WINDOW_TOKENS = int(os.getenv('SUMMARY_WINDOW_TOKENS', '1000'))
+SENTIMENT_WINDOW_TOKENS = 510
+WINDOW_OVERLAP_TOKENS = 32
+# Reduce rounds before map-reduce gives up and truncates (summaries stop shrinking
+# when SUMMARY_WINDOW_TOKENS is not well above the profile's max_length)
+SUMMARY_MAX_REDUCE_ROUNDS = 3
+INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', '4'))
+
+# Gemini has no local tokenizer; prompts are budgeted with an estimate and cut on word boundaries.
+# The default (about 2000 characters) keeps the original per-article input size and token spend.
+GEMINI_MAX_INPUT_TOKENS = int(os.getenv('GEMINI_MAX_INPUT_TOKENS', '500'))
+GEMINI_CHARS_PER_TOKEN = 4
+
+# Stream Gemini summaries so the UI can show them while they are generated
+GEMINI_STREAMING = os.getenv('GEMINI_STREAMING', 'true').lower() == 'true'
+
+# Pause between Gemini articles to stay under the free tier's 15 requests per minute
+GEMINI_REQUEST_INTERVAL_SECONDS = float(os.getenv('GEMINI_REQUEST_INTERVAL_SECONDS', '4'))
+
+# Gemini token accounting: calls are refused once a (UTC) day's tokens reach the budget (0 = no limit).
+# Every process pointed at the same ledger file counts against one budget.
+GEMINI_DAILY_TOKEN_BUDGET = int(os.getenv('GEMINI_DAILY_TOKEN_BUDGET', '0'))
+GEMINI_TOKEN_LEDGER = os.getenv('GEMINI_TOKEN_LEDGER', '.gemini_token_ledger.json')
+
+# Multiprocess inference worker pool (0 = run inference in-process)
+# Each worker runs torch with TORCH_THREADS_PER_WORKER intra-op threads
+# (0 = split the machine's cores evenly between workers). Workers are spawned:
+# forking the threaded Streamlit process (or one that has already run torch, as
+# the warm-up does) can deadlock the workers on inherited locks. A worker that
+# dies fails its article and is replaced; no article waits on the pool longer
+# than INFERENCE_TIMEOUT_SECONDS.
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+TORCH_THREADS_PER_WORKER = int(os.getenv('TORCH_THREADS_PER_WORKER', '0'))
+INFERENCE_POOL_START_METHOD = os.getenv('INFERENCE_POOL_START_METHOD', 'spawn')
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv('INFERENCE_TIMEOUT_SECONDS', '300'))
+
+# Dynamic micro-batching inference server shared by all sessions in the process
+MICRO_BATCHING = os.getenv('MICRO_BATCHING', 'false').lower() == 'true'
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '8'))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '10'))
+
+# Background model warm-up at process start
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'
+
+# HTTP insights service (see insights_service.py)
+# When INSIGHTS_SERVICE_URL is set the Streamlit apps call the service instead
+# of running their own agent.
+INSIGHTS_SERVICE_URL = os.getenv('INSIGHTS_SERVICE_URL', '')
+SERVICE_HOST = os.getenv('SERVICE_HOST', '0.0.0.0')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8600'))
+SERVICE_WORKERS = int(os.getenv('SERVICE_WORKERS', '4'))
+SERVICE_MAX_QUEUE = int(os.getenv('SERVICE_MAX_QUEUE', '32'))
+SERVICE_TIMEOUT_SECONDS = float(os.getenv('SERVICE_TIMEOUT_SECONDS', '120'))
+SERVICE_CACHE_TTL_SECONDS = int(os.getenv('SERVICE_CACHE_TTL_SECONDS', '600'))
+SERVICE_CACHE_SIZE = int(os.getenv('SERVICE_CACHE_SIZE', '256'))
+
+# Background jobs for Fetch News
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_RETENTION_SECONDS = 900
+
+# Article list rendering
+ARTICLES_PER_PAGE = int(os.getenv('ARTICLES_PER_PAGE', '10'))
+
+# Process-wide pool of processed articles shared by all sessions
+ARTICLE_POOL_MAX_MB = float(os.getenv('ARTICLE_POOL_MAX_MB', '64'))
+ARTICLE_POOL_MAX_ARTICLES = int(os.getenv('ARTICLE_POOL_MAX_ARTICLES', '20000'))
+
+# Telemetry: Prometheus metrics and structured logs (see telemetry.py)
+# METRICS_PORT starts a standalone /metrics server in the apps (0 = off); the
+# insights service always serves /metrics on its own port. Logs are plain text
+# unless LOG_FORMAT=json (for log collectors).
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+# Profiling mode (see profiling.py): span trees per run and per article, optionally
+# sampled with cProfile or pyinstrument ('none' = spans only). Profiles are kept in
+# memory for the debug panel and, when PROFILE_DIR is set, written there as
+# Chrome trace JSON plus the profiler dump (.prof / .html).
+PROFILING = os.getenv('PROFILING', 'false').lower() == 'true'
+PROFILER = os.getenv('PROFILER', 'none').lower()
+PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+PROFILE_HISTORY = 20
+
+# Resilience for NewsAPI and Gemini calls (see resilience.py)
+# Hedging: a call still running after its endpoint's recent p95 (at least
+# HEDGE_MIN_DELAY_MS, once HEDGE_MIN_SAMPLES calls have been timed) gets a duplicate,
+# and the first answer wins. Duplicates are capped at HEDGE_MAX_RATIO of calls. Hedging
+# is off by default for both: a NewsAPI duplicate spends a request of the 100/day
+# budget, and a Gemini one counts against the free tier's 15 requests per minute
+# and the token budget.
+NEWSAPI_HEDGING = os.getenv('NEWSAPI_HEDGING', 'false').lower() == 'true'
+GEMINI_HEDGING = os.getenv('GEMINI_HEDGING', 'false').lower() == 'true'
+HEDGE_MAX_RATIO = float(os.getenv('HEDGE_MAX_RATIO', '0.05'))
+HEDGE_MIN_DELAY_MS = float(os.getenv('HEDGE_MIN_DELAY_MS', '200'))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = 32
+# Circuit breakers: after CIRCUIT_FAILURE_THRESHOLD consecutive upstream failures
+# (connection errors, timeouts, 5xx, 429) an endpoint fails fast for
+# CIRCUIT_RESET_SECONDS, serving the last good NewsAPI response or simple Gemini-free
+# processing; then one trial call decides whether the circuit closes again.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+NEWSAPI_FALLBACK_CACHE_SIZE = 64
+
+# NewsAPI daily request budget (see newsapi_quota.py; 0 = no limit). Cached responses
+# are served until they are older than the category's freshness need; stale ones
+# (up to NEWSAPI_MAX_STALE_SECONDS) are refreshed only while the budget allows,
+# keeping NEWSAPI_QUOTA_RESERVE requests for fetches with nothing cached. The ledger
+# file is shared by every process using the key, updated under a file lock.
+NEWSAPI_DAILY_REQUEST_BUDGET = int(os.getenv('NEWSAPI_DAILY_REQUEST_BUDGET', '100'))
+NEWSAPI_QUOTA_LEDGER = os.getenv('NEWSAPI_QUOTA_LEDGER', '.newsapi_quota_ledger.json')
+NEWSAPI_QUOTA_RESERVE = int(os.getenv('NEWSAPI_QUOTA_RESERVE', '10'))
+NEWSAPI_FRESHNESS_SECONDS = {
+    'general': 900,
+    'business': 900,
+    'sports': 900,
+    'technology': 1800,
+    'health': 3600
+}
+NEWSAPI_KEYWORD_FRESHNESS_SECONDS = int(os.getenv('NEWSAPI_KEYWORD_FRESHNESS_SECONDS', '1800'))
+NEWSAPI_MAX_STALE_SECONDS = int(os.getenv('NEWSAPI_MAX_STALE_SECONDS', '86400'))
+
+# Background per-category digests (see digest_refresher.py): the apps show a
+# category's top headlines instantly and process only keyword searches on demand.
+# Each round fetches every category and processes only headlines new since the
+# last round. Both apps only keep digests when asked to (DIGEST_REFRESH=true for the
+# Hugging Face app, GEMINI_DIGEST_REFRESH=true for the Gemini app): every round
+# spends NewsAPI requests (and, in the Gemini app, free-tier Gemini calls) whether
+# or not anyone is using the app.
+DIGEST_REFRESH = os.getenv('DIGEST_REFRESH', 'false').lower() == 'true'
+GEMINI_DIGEST_REFRESH = os.getenv('GEMINI_DIGEST_REFRESH', 'false').lower() == 'true'
+DIGEST_REFRESH_INTERVAL_SECONDS = int(os.getenv('DIGEST_REFRESH_INTERVAL_SECONDS', '1800'))
+DIGEST_ARTICLES = int(os.getenv('DIGEST_ARTICLES', '20'))
+
+# Full article bodies (see article_enricher.py): download each article's page and
+# use its main text instead of NewsAPI's truncated `content`. Enriched articles are
+# summarized in long-content mode. Downloads are concurrent but polite to each site.
+ARTICLE_ENRICHMENT = os.getenv('ARTICLE_ENRICHMENT', 'false').lower() == 'true'
+ENRICH_WORKERS = int(os.getenv('ENRICH_WORKERS', '16'))
+ENRICH_PER_DOMAIN_CONCURRENCY = int(os.getenv('ENRICH_PER_DOMAIN_CONCURRENCY', '2'))
+ENRICH_DOMAIN_INTERVAL_MS = float(os.getenv('ENRICH_DOMAIN_INTERVAL_MS', '250'))
+ENRICH_TIMEOUT_SECONDS = float(os.getenv('ENRICH_TIMEOUT_SECONDS', '5'))
+ENRICH_DEADLINE_SECONDS = float(os.getenv('ENRICH_DEADLINE_SECONDS', '15'))
+ENRICH_MAX_BYTES = 2 * 1024 * 1024
+ENRICH_CACHE_SIZE = 2000
+ENRICH_USER_AGENT = os.getenv('ENRICH_USER_AGENT', 'NewsInsightsAgent/1.0')
+
+# Entity facets (see entity_index.py): companies, people and places found by a
+# gazetteer ('gazetteer') or a token-classification model ('ner'). ENTITY_GAZETTEER
+# is an optional JSON file of {"ORG"|"PERSON"|"PLACE": {name: [aliases]}} that
+# extends the built-in list.
+ENTITY_EXTRACTOR = os.getenv('ENTITY_EXTRACTOR', 'gazetteer').lower()
+ENTITY_GAZETTEER = os.getenv('ENTITY_GAZETTEER', '')
+NER_MODEL = os.getenv('NER_MODEL', 'dslim/bert-base-NER')
@@ -0,0 +1,179 @@
+"""
+Background refresher of per-category insight digests
+
+Every DIGEST_REFRESH_INTERVAL_SECONDS the refresher fetches the top
+DIGEST_ARTICLES headlines of each category in CATEGORIES, processes only the
+articles that were not in the category's previous digest (headlines still
+listed keep their summary and sentiment), and swaps in the new digest. The apps
+show a category's digest instantly and run fetch+inference on demand only for
+keyword searches.
+
+Fetches go through the NewsAPI daily request budget like any other, so a
+refresh may be answered from cache while the budget is tight.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from config import CATEGORIES, DIGEST_ARTICLES, DIGEST_REFRESH_INTERVAL_SECONDS
+from article_pool import article_id
+from telemetry import DIGEST_AGE_SECONDS, DIGEST_REFRESHES, correlation_scope, get_logger
+
+logger = get_logger(__name__)
+
+
+class Digest:
+    """Ready-made insights for one category"""
+
+    def __init__(self, category: str, articles: List[Dict], sentiment_stats: Dict[str, int],
+                 duration_seconds: float, new_articles: int):
+        self.category = category
+        self.articles = articles
+        self.sentiment_stats = sentiment_stats
+        self.refreshed_at = time.time()
+        self.duration_seconds = duration_seconds
+        self.new_articles = new_articles
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.refreshed_at
+
+    def to_dict(self) -> Dict:
+        return {
+            'category': self.category,
+            'articles': len(self.articles),
+            'new_articles': self.new_articles,
+            'sentiment_stats': self.sentiment_stats,
+            'refreshed_at': self.refreshed_at,
+            'age_seconds': round(self.age_seconds),
+            'duration_seconds': round(self.duration_seconds, 2)
+        }
+
+
+class DigestRefresher:
+    """Keeps a digest per category up to date from a background thread"""
+
+    def __init__(self, backend: str, agent_factory: Callable, categories: List[str] = None,
+                 interval_seconds: float = DIGEST_REFRESH_INTERVAL_SECONDS,
+                 max_articles: int = DIGEST_ARTICLES):
+        """
+        Args:
+            backend: Backend name (e.g. 'huggingface', 'gemini'), used in logs and metrics
+            agent_factory: Creates the agent (NewsAgent or NewsAgentGemini) the
+                refresher uses; called once, on the refresher's thread
+            categories: Categories to keep digests for (default: all of CATEGORIES)
+            interval_seconds: Pause between refresh rounds
+            max_articles: Headlines per digest
+        """
+        self.backend = backend
+        self.categories = list(categories or CATEGORIES)
+        self.interval_seconds = interval_seconds
+        self.max_articles = max_articles
+
+        self._agent_factory = agent_factory
+        self._agent = None
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _get_agent(self):
+        if self._agent is None:
+            self._agent = self._agent_factory()
+        return self._agent
+
+    def start(self):
+        """Start refreshing in the background (no-op if already started)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"digest-{self.backend}", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop after the current article"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for category in self.categories:
+                if self._stop.is_set():
+                    return
+                self.refresh(category)
+            self._stop.wait(self.interval_seconds)
+
+    def refresh(self, category: str) -> Optional[Digest]:
+        """
+        Fetch a category's headlines and rebuild its digest, processing only new articles
+
+        Returns:
+            The category's digest (the previous one if nothing could be fetched), or
+            None if there is none yet
+        """
+        start = time.perf_counter()
+        previous = self.get(category)
+        with correlation_scope():
+            try:
+                agent = self._get_agent()
+                articles = agent.news_fetcher.fetch_news(category=category, page_size=self.max_articles)
+                if not articles:
+                    # NewsAPI failing or the budget spent: keep serving what we have
+                    DIGEST_REFRESHES.inc(backend=self.backend, category=category, outcome='kept')
+                    logger.warning("No articles for digest; keeping the previous one", category=category)
+                    return previous
+
+                known = {article_id(article): article for article in previous.articles} if previous else {}
+                new = [article for article in articles if article_id(article) not in known]
+                processed = {}
+                if new:
+                    processed = {article_id(article): article
+                                 for article in agent.process_articles(new, cancel_event=self._stop)}
+                if self._stop.is_set():
+                    return previous
+
+                # Fetched order, with the summaries of headlines already in the last digest
+                digest_articles = [known.get(key) or processed.get(key)
+                                   for key in map(article_id, articles)]
+                digest_articles = [article for article in digest_articles if article is not None]
+                digest = Digest(category, digest_articles, agent.get_sentiment_stats(digest_articles),
+                                time.perf_counter() - start, len(new))
+            except Exception as e:
+                DIGEST_REFRESHES.inc(backend=self.backend, category=category, outcome='error')
+                logger.exception("Digest refresh failed", backend=self.backend, category=category,
+                                 error=str(e))
+                return previous
+
+        with self._lock:
+            self._digests[category] = digest
+        DIGEST_REFRESHES.inc(backend=self.backend, category=category, outcome='ok')
+        DIGEST_AGE_SECONDS.set_function(lambda: self._digests[category].age_seconds,
+                                        backend=self.backend, category=category)
+        logger.info("Refreshed digest", backend=self.backend, category=category,
+                    articles=len(digest.articles), new_articles=digest.new_articles,
+                    duration_ms=round(digest.duration_seconds * 1000, 1))
+        return digest
+
+    def get(self, category: str) -> Optional[Digest]:
+        """The category's latest digest, or None before its first refresh"""
+        with self._lock:
+            return self._digests.get(category)
+
+    def status(self) -> Dict[str, Dict]:
+        """Per-category digest size, age and last refresh duration"""
+        with self._lock:
+            digests = dict(self._digests)
+        return {category: digests[category].to_dict() if category in digests else None
+                for category in self.categories}
+
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+def start_digest_refresher(backend: str, agent_factory: Callable) -> DigestRefresher:
+    """Start the process-wide digest refresher for a backend once and return it"""
+    with _refreshers_lock:
+        if backend not in _refreshers:
+            _refreshers[backend] = DigestRefresher(backend, agent_factory)
+        refresher = _refreshers[backend]
+    refresher.start()
+    return refresher
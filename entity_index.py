@@ -0,0 +1,329 @@
+"""
+Named entities of processed articles, indexed for faceted filtering
+
+Companies, people and places are extracted in batches when articles are first
+seen: by matching a gazetteer (the default, no model needed) or with a small
+token-classification model (ENTITY_EXTRACTOR=ner). The index maps each entity
+to the IDs of the articles mentioning it, so filtering by entity and
+per-entity sentiment are set lookups over article IDs instead of rescans of
+article text on every rerun.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import (ENTITY_EXTRACTOR, ENTITY_GAZETTEER, NER_MODEL, INFERENCE_BATCH_SIZE,
+                    ARTICLE_POOL_MAX_ARTICLES)
+from article_pool import get_article_pool, pool_key
+from telemetry import BATCH_SIZE, INFERENCE_SECONDS, get_logger
+
+logger = get_logger(__name__)
+
+ENTITY_TYPES = {'ORG': 'Company / organization', 'PERSON': 'Person', 'PLACE': 'Place'}
+
+# Canonical name -> other names it appears as in headlines. Matching is case-sensitive,
+# so "Apple" the company is not confused with apples. Aliases that often mean
+# something else are left out: "US" and "WHO" in all-caps headlines, "America" in
+# "Bank of America", a bare "Fed" or "Harris", "Washington" the state or the city.
+DEFAULT_GAZETTEER = {
+    'ORG': {
+        'Apple': ['Apple Inc'],
+        'Microsoft': [],
+        'Google': ['Alphabet'],
+        'Amazon': ['Amazon.com'],
+        'Meta': ['Facebook', 'Instagram', 'WhatsApp'],
+        'Nvidia': ['NVIDIA'],
+        'Tesla': [],
+        'OpenAI': ['ChatGPT'],
+        'Intel': [],
+        'AMD': [],
+        'Samsung': [],
+        'Netflix': [],
+        'Boeing': [],
+        'Disney': [],
+        'Walmart': [],
+        'JPMorgan': ['JPMorgan Chase', 'JP Morgan'],
+        'Goldman Sachs': [],
+        'Pfizer': [],
+        'Moderna': [],
+        'Federal Reserve': ['the Fed'],
+        'European Central Bank': ['ECB'],
+        'World Health Organization': [],
+        'United Nations': ['UN', 'U.N.'],
+        'European Union': ['EU', 'E.U.'],
+        'NATO': [],
+        'NASA': [],
+        'FDA': ['Food and Drug Administration'],
+        'SEC': ['Securities and Exchange Commission'],
+        'Congress': [],
+        'Supreme Court': [],
+        'NFL': [],
+        'NBA': [],
+        'MLB': [],
+        'FIFA': [],
+        'Premier League': []
+    },
+    'PERSON': {
+        'Joe Biden': ['Biden'],
+        'Donald Trump': ['Trump'],
+        'Kamala Harris': [],
+        'Xi Jinping': ['Xi'],
+        'Vladimir Putin': ['Putin'],
+        'Volodymyr Zelensky': ['Zelensky', 'Zelenskyy'],
+        'Elon Musk': ['Musk'],
+        'Tim Cook': [],
+        'Sundar Pichai': ['Pichai'],
+        'Satya Nadella': ['Nadella'],
+        'Mark Zuckerberg': ['Zuckerberg'],
+        'Jensen Huang': [],
+        'Sam Altman': ['Altman'],
+        'Jeff Bezos': ['Bezos'],
+        'Warren Buffett': ['Buffett'],
+        'Jerome Powell': ['Powell'],
+        'Taylor Swift': []
+    },
+    'PLACE': {
+        'United States': ['U.S.', 'USA', 'United States of America'],
+        'China': ['Beijing'],
+        'Russia': ['Moscow', 'Kremlin'],
+        'Ukraine': ['Kyiv'],
+        'United Kingdom': ['U.K.', 'UK', 'Britain', 'London'],
+        'Germany': ['Berlin'],
+        'France': ['Paris'],
+        'Japan': ['Tokyo'],
+        'India': ['New Delhi'],
+        'Israel': [],
+        'Gaza': [],
+        'Iran': [],
+        'Taiwan': [],
+        'Canada': [],
+        'Mexico': [],
+        'Brazil': [],
+        'Australia': [],
+        'South Korea': ['Seoul'],
+        'New York': ['NYC', 'New York City'],
+        'California': [],
+        'Texas': [],
+        'Florida': [],
+        'Silicon Valley': [],
+        'Wall Street': []
+    }
+}
+
+
+def _load_gazetteer(path: str = ENTITY_GAZETTEER) -> Dict[str, Dict[str, List[str]]]:
+    """The built-in gazetteer, extended with the entries in the JSON file at path (same shape)"""
+    gazetteer = {entity_type: dict(entries) for entity_type, entries in DEFAULT_GAZETTEER.items()}
+    if path:
+        try:
+            with open(path) as f:
+                for entity_type, entries in json.load(f).items():
+                    gazetteer.setdefault(entity_type, {}).update(entries)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable entity gazetteer", path=path, error=str(e))
+    return gazetteer
+
+
+class GazetteerExtractor:
+    """Finds known entity names (and their aliases) with one compiled pattern"""
+
+    name = 'gazetteer'
+
+    def __init__(self, gazetteer: Dict[str, Dict[str, List[str]]] = None):
+        gazetteer = gazetteer if gazetteer is not None else _load_gazetteer()
+        self._aliases = {}
+        for entity_type, entries in gazetteer.items():
+            for name, aliases in entries.items():
+                # A name listed under several types keeps the first
+                for alias in [name] + list(aliases):
+                    self._aliases.setdefault(alias, (name, entity_type))
+        # Longest alias first, so "New York City" wins over "New York"
+        alternatives = '|'.join(re.escape(alias) for alias in sorted(self._aliases, key=len, reverse=True))
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)") if alternatives else None
+
+    def extract(self, texts: List[str]) -> List[List[Tuple[str, str]]]:
+        """(name, type) of the entities in each text, each entity once, in order of appearance"""
+        results = []
+        for text in texts:
+            entities = OrderedDict()
+            for match in self._pattern.finditer(text or '') if self._pattern else ():
+                name, entity_type = self._aliases[match.group()]
+                entities.setdefault(name, entity_type)
+            results.append(list(entities.items()))
+        return results
+
+
+class ModelExtractor:
+    """Token-classification (NER) model, run over the texts in batches"""
+
+    name = 'ner'
+
+    # CoNLL labels the default model emits; MISC entities are not indexed
+    LABELS = {'ORG': 'ORG', 'PER': 'PERSON', 'LOC': 'PLACE'}
+    MIN_SCORE = 0.8
+
+    def __init__(self, model_id: str = NER_MODEL, batch_size: int = INFERENCE_BATCH_SIZE):
+        self.model_id = model_id
+        self.batch_size = batch_size
+
+    def extract(self, texts: List[str]) -> List[List[Tuple[str, str]]]:
+        from text_processor import load_pipeline
+
+        ner = load_pipeline('ner', self.model_id)
+        BATCH_SIZE.observe(len(texts), batcher='entities')
+        with INFERENCE_SECONDS.time(task='ner', model=self.model_id):
+            outputs = ner(texts, batch_size=self.batch_size, aggregation_strategy='simple')
+        results = []
+        for spans in outputs:
+            entities = OrderedDict()
+            for entity in spans:
+                entity_type = self.LABELS.get(entity['entity_group'])
+                name = entity['word'].strip()
+                if entity_type and entity['score'] >= self.MIN_SCORE and len(name) > 1 and '##' not in name:
+                    entities.setdefault(name, entity_type)
+            results.append(list(entities.items()))
+        return results
+
+
+def _article_text(article: Dict) -> str:
+    return ' '.join(article.get(field) or '' for field in ('title', 'description', 'summary'))
+
+
+class EntityIndex:
+    """Inverted index of entity -> article IDs, with each article's sentiment for aggregates"""
+
+    def __init__(self, extractor=None, max_articles: int = ARTICLE_POOL_MAX_ARTICLES):
+        """
+        Args:
+            extractor: GazetteerExtractor or ModelExtractor (default: per ENTITY_EXTRACTOR)
+            max_articles: Articles kept in the index; the least recently indexed are dropped
+        """
+        self.extractor = extractor or (ModelExtractor() if ENTITY_EXTRACTOR == 'ner' else GazetteerExtractor())
+        self.max_articles = max_articles
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._types = {}
+        self._articles = OrderedDict()
+        self._sentiments = {}
+
+    def _add(self, key: str, entities: List[Tuple[str, str]], sentiment: Optional[str]):
+        if key in self._articles:
+            self._remove(key)
+        self._articles[key] = tuple(name for name, _ in entities)
+        self._sentiments[key] = sentiment
+        for name, entity_type in entities:
+            self._postings.setdefault(name, set()).add(key)
+            self._types.setdefault(name, entity_type)
+        while len(self._articles) > self.max_articles:
+            self._remove(next(iter(self._articles)))
+
+    def _remove(self, key: str):
+        for name in self._articles.pop(key, ()):
+            postings = self._postings.get(name)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self._postings[name]
+                    del self._types[name]
+        self._sentiments.pop(key, None)
+
+    def index(self, articles: Dict[str, Dict]):
+        """
+        Extract and index the entities of articles not indexed yet (or whose sentiment changed), in one batch
+
+        Args:
+            articles: Processed articles by article ID
+        """
+        with self._lock:
+            # Re-index articles re-processed with another sentiment, so aggregates are not stale
+            missing = [(key, article) for key, article in articles.items()
+                       if key not in self._articles or self._sentiments[key] != article.get('sentiment')]
+        if not missing:
+            return
+        extracted = self.extractor.extract([_article_text(article) for _, article in missing])
+        with self._lock:
+            for (key, article), entities in zip(missing, extracted):
+                self._add(key, entities, article.get('sentiment'))
+        logger.debug("Indexed entities", articles=len(missing), extractor=self.extractor.name)
+
+    def index_articles(self, articles: List[Dict]) -> List[str]:
+        """Index processed articles (as needed) and return their IDs in order"""
+        # Keyed like the pool, so another model's summary of the same URL is indexed separately
+        keys = [pool_key(article) for article in articles]
+        self.index(dict(zip(keys, articles)))
+        return keys
+
+    def ensure_indexed(self, article_ids: Iterable[str]):
+        """Index the article-pool records of any IDs not indexed yet"""
+        with self._lock:
+            missing = [key for key in article_ids if key not in self._articles]
+        if missing:
+            pool = get_article_pool()
+            self.index({key: record for key, record in zip(missing, map(pool.get, missing))
+                        if record is not None})
+
+    def filter_ids(self, article_ids: Iterable[str], entity: str) -> List[str]:
+        """The IDs, in order, of articles mentioning the entity"""
+        with self._lock:
+            postings = set(self._postings.get(entity, ()))
+        return [key for key in article_ids if key in postings]
+
+    def facets(self, article_ids: Iterable[str], entity_type: str = None) -> List[Tuple[str, str, int]]:
+        """
+        Entities mentioned in the given articles
+
+        Returns:
+            (entity, type, article count) tuples, most mentioned first
+        """
+        counts = {}
+        with self._lock:
+            for key in article_ids:
+                for name in self._articles.get(key, ()):
+                    counts[name] = counts.get(name, 0) + 1
+            types = {name: self._types[name] for name in counts}
+        return sorted(((name, types[name], count) for name, count in counts.items()
+                       if not entity_type or types[name] == entity_type),
+                      key=lambda facet: (-facet[2], facet[0]))
+
+    def sentiment_by_entity(self, article_ids: Iterable[str], min_articles: int = 1) -> List[Dict]:
+        """
+        Sentiment counts per entity across the given articles
+
+        Returns:
+            One row per entity (most mentioned first) with its type, article count,
+            POSITIVE/NEGATIVE/NEUTRAL counts and net sentiment (positive minus negative share)
+        """
+        rows = {}
+        with self._lock:
+            for key in article_ids:
+                sentiment = self._sentiments.get(key)
+                for name in self._articles.get(key, ()):
+                    row = rows.setdefault(name, {'entity': name, 'type': self._types[name], 'articles': 0,
+                                                 'POSITIVE': 0, 'NEGATIVE': 0, 'NEUTRAL': 0})
+                    row['articles'] += 1
+                    if sentiment in ('POSITIVE', 'NEGATIVE', 'NEUTRAL'):
+                        row[sentiment] += 1
+        for row in rows.values():
+            row['net_sentiment'] = round((row['POSITIVE'] - row['NEGATIVE']) / row['articles'], 2)
+        return sorted((row for row in rows.values() if row['articles'] >= min_articles),
+                      key=lambda row: (-row['articles'], row['entity']))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'articles': len(self._articles), 'entities': len(self._postings),
+                    'extractor': self.extractor.name}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_entity_index() -> EntityIndex:
+    """Get the process-wide entity index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EntityIndex()
+        return _index
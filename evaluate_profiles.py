@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Evaluate summarization decoding profiles against the bundled evaluation set
+
+Runs every profile in config.DECODING_PROFILES over eval_data/summarization_eval.jsonl,
+records latency percentiles and ROUGE-1/2/L F1 scores, and writes the results to
+eval_data/decoding_profiles_results.json so the app can show the tradeoff per profile.
+
+Usage:
+    python evaluate_profiles.py [--profiles fast balanced quality] [--repeats 3]
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from config import DECODING_PROFILES, DECODING_PROFILE_EVAL_SET, DECODING_PROFILE_RESULTS
+
+
+def load_eval_set(path: str) -> List[Dict]:
+    """Load evaluation examples from a JSONL file"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in ''.join(c.lower() if c.isalnum() else ' ' for c in text).split() if t]
+
+
+def _f1(overlap: int, candidate_total: int, reference_total: int) -> float:
+    if overlap == 0 or candidate_total == 0 or reference_total == 0:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate: str, reference: str, n: int) -> float:
+    """ROUGE-N F1 between a candidate and a reference summary"""
+    def ngrams(tokens):
+        return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+    cand, ref = ngrams(_tokens(candidate)), ngrams(_tokens(reference))
+    overlap = sum((cand & ref).values())
+    return _f1(overlap, sum(cand.values()), sum(ref.values()))
+
+
+def rouge_l(candidate: str, reference: str) -> float:
+    """ROUGE-L F1 (longest common subsequence) between candidate and reference"""
+    cand, ref = _tokens(candidate), _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+
+    previous = [0] * (len(ref) + 1)
+    for c in cand:
+        current = [0]
+        for j, r in enumerate(ref):
+            current.append(previous[j] + 1 if c == r else max(previous[j + 1], current[j]))
+        previous = current
+
+    return _f1(previous[-1], len(cand), len(ref))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def evaluate_profile(processor, profile: str, examples: List[Dict], repeats: int = 1) -> Dict:
+    """Run one decoding profile over the evaluation set and score it"""
+    latencies, r1, r2, rl = [], [], [], []
+
+    for example in examples:
+        text = f"{example.get('title', '')} {example.get('description', '')}"
+        for _ in range(repeats):
+            start = time.perf_counter()
+            summary = processor.summarize_text(text, decoding_profile=profile)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        r1.append(rouge_n(summary, example['reference'], 1))
+        r2.append(rouge_n(summary, example['reference'], 2))
+        rl.append(rouge_l(summary, example['reference']))
+
+    count = len(examples)
+    return {
+        'latency_ms_p50': round(percentile(latencies, 50), 1),
+        'latency_ms_p95': round(percentile(latencies, 95), 1),
+        'latency_ms_mean': round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        'rouge1': round(sum(r1) / count, 4) if count else 0.0,
+        'rouge2': round(sum(r2) / count, 4) if count else 0.0,
+        'rougeL': round(sum(rl) / count, 4) if count else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate summarization decoding profiles")
+    parser.add_argument('--profiles', nargs='+', default=list(DECODING_PROFILES.keys()),
+                        help="Profiles to evaluate (default: all)")
+    parser.add_argument('--eval-set', default=DECODING_PROFILE_EVAL_SET, help="JSONL evaluation set")
+    parser.add_argument('--output', default=DECODING_PROFILE_RESULTS, help="Where to write results")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per example")
+    args = parser.parse_args()
+
+    from text_processor import TextProcessor
+
+    examples = load_eval_set(args.eval_set)
+    processor = TextProcessor()
+
+    # Warm up so model loading does not skew the first profile's latency
+    processor.summarize_text(f"{examples[0]['title']} {examples[0]['description']}")
+
+    results = {}
+    for profile in args.profiles:
+        print(f"Evaluating profile '{profile}' on {len(examples)} examples...")
+        results[profile] = evaluate_profile(processor, profile, examples, args.repeats)
+        print(f"  {results[profile]}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'eval_set': args.eval_set,
+            'examples': len(examples),
+            'profiles': results
+        }, f, indent=2)
+
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
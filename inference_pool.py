@@ -0,0 +1,251 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from config import (INFERENCE_WORKERS, TORCH_THREADS_PER_WORKER, INFERENCE_POOL_START_METHOD,
+                    AUTO_MODEL_SELECTION)
+from model_selector import shared_selector
+from telemetry import QUEUE_DEPTH, get_logger
+
+logger = get_logger(__name__)
+
+# Processor loaded in the parent before forking; workers inherit it copy-on-write
+_preloaded_processor = None
+
+# How often the result collector checks that the workers are still alive
+WORKER_CHECK_INTERVAL_SECONDS = 1.0
+# Replacement workers started per configured worker before the pool gives up
+MAX_RESTARTS_PER_WORKER = 3
+
+
+def _worker_main(task_queue, result_queue, current_job, torch_threads: int):
+    """Worker process loop: take article jobs off the queue and process them"""
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        # Stand-in models (benchmark.py) run without torch
+        pass
+
+    processor = _preloaded_processor
+    if processor is None:
+        # Spawned workers load their own copy; safetensors checkpoints are memory-mapped
+        from text_processor import TextProcessor
+        processor = TextProcessor()
+
+    while True:
+        job = task_queue.get()
+        if job is None:
+            break
+
+        job_id, article, kwargs = job
+        # Shared memory, so the parent can tell which job was lost if this process dies
+        current_job.value = job_id
+        start = time.perf_counter()
+        try:
+            result, error = processor.process_article(article, **kwargs), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        result_queue.put((job_id, result, error, (time.perf_counter() - start) * 1000))
+        current_job.value = -1
+
+
+class InferencePool:
+    """Runs TextProcessor.process_article in N worker processes fed from a shared job queue"""
+
+    def __init__(self, workers: int = None, torch_threads: int = None,
+                 start_method: str = None, processor=None, model_selector=None):
+        """
+        Start the worker processes
+
+        Args:
+            workers: Number of worker processes (defaults to INFERENCE_WORKERS)
+            torch_threads: torch intra-op threads per worker (defaults to an even split of the cores)
+            start_method: multiprocessing start method (defaults to INFERENCE_POOL_START_METHOD).
+                'fork' shares the weights copy-on-write but is only safe before the
+                process has started threads or run torch
+            processor: Already-loaded TextProcessor to share with forked workers
+            model_selector: LoadBasedModelSelector to report worker processing latency to
+        """
+        global _preloaded_processor
+
+        self.workers = workers or INFERENCE_WORKERS or 1
+        self.torch_threads = torch_threads or TORCH_THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // self.workers)
+        self.start_method = start_method or INFERENCE_POOL_START_METHOD
+        self.model_selector = model_selector
+
+        if self.start_method == 'fork':
+            if threading.active_count() > 1:
+                logger.warning("Forking inference workers from a process with running threads; "
+                               "use 'spawn' or 'forkserver' if workers hang", threads=threading.active_count())
+            if processor is None:
+                from text_processor import TextProcessor
+                processor = TextProcessor()
+            _preloaded_processor = processor
+        self.processor = processor
+
+        self._context = multiprocessing.get_context(self.start_method)
+        self._task_queue = self._context.Queue()
+        self._result_queue = self._context.Queue()
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._restarts = 0
+        self._closed = False
+        self._broken = None
+
+        # (process, current job ID) per worker
+        self._processes = [self._start_worker() for _ in range(self.workers)]
+
+        # Resolves futures as results come back from the workers, and watches the workers
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+
+        QUEUE_DEPTH.set_function(lambda: self.queue_depth, queue='inference_pool')
+        logger.info("Inference pool started", workers=self.workers, torch_threads=self.torch_threads,
+                    start_method=self.start_method)
+
+    def _start_worker(self):
+        current_job = self._context.Value('q', -1, lock=False)
+        process = self._context.Process(target=_worker_main,
+                                        args=(self._task_queue, self._result_queue, current_job,
+                                              self.torch_threads),
+                                        daemon=True)
+        process.start()
+        return process, current_job
+
+    def _collect_results(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self._result_queue.get(timeout=WORKER_CHECK_INTERVAL_SECONDS)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+
+            if message:
+                job_id, result, error, latency_ms = message
+                if error:
+                    self._resolve(job_id, error=RuntimeError(error))
+                else:
+                    if self.model_selector:
+                        self.model_selector.record_latency(latency_ms)
+                    self._resolve(job_id, result=result)
+
+            if time.monotonic() - last_check >= WORKER_CHECK_INTERVAL_SECONDS:
+                self._check_workers()
+                last_check = time.monotonic()
+
+    def _resolve(self, job_id: int, result=None, error: Exception = None):
+        with self._futures_lock:
+            future = self._futures.pop(job_id, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _check_workers(self):
+        """Fail the job of any worker that died, and replace the worker"""
+        if self._closed:
+            return
+
+        alive = []
+        for process, current_job in self._processes:
+            if process.is_alive():
+                alive.append((process, current_job))
+                continue
+
+            job_id = current_job.value
+            logger.error("Inference worker died", pid=process.pid, exitcode=process.exitcode,
+                         job_id=job_id if job_id >= 0 else None)
+            if job_id >= 0:
+                self._resolve(job_id, error=RuntimeError(
+                    f"Inference worker {process.pid} exited with code {process.exitcode}"))
+            if self._restarts < self.workers * MAX_RESTARTS_PER_WORKER:
+                self._restarts += 1
+                alive.append(self._start_worker())
+        self._processes = alive
+
+        if not self._processes and self._broken is None:
+            # Workers keep dying (e.g. models fail to load); nothing will process the queue
+            self._broken = f"all {self.workers} inference workers died after {self._restarts} restarts"
+            logger.error("Inference pool is out of workers", restarts=self._restarts)
+            self._fail_pending(RuntimeError(self._broken))
+
+    def _fail_pending(self, error: Exception):
+        with self._futures_lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.set_exception(error)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submitted jobs that have not completed yet"""
+        with self._futures_lock:
+            return len(self._futures)
+
+    def submit(self, article: Dict, **kwargs) -> Future:
+        """
+        Queue one article for processing
+
+        Args:
+            article: Article dictionary
+            **kwargs: Keyword arguments for TextProcessor.process_article
+
+        Returns:
+            Future resolving to the processed article (or failing if its worker died)
+
+        Raises:
+            RuntimeError: If the pool is closed or has no workers left
+        """
+        if self._closed or self._broken:
+            raise RuntimeError(self._broken or "Inference pool is closed")
+
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._futures_lock:
+            self._futures[job_id] = future
+        self._task_queue.put((job_id, article, kwargs))
+        return future
+
+    def map_articles(self, articles: List[Dict], timeout: Optional[float] = None, **kwargs) -> List[Dict]:
+        """Process articles across the pool and return them in input order"""
+        futures = [self.submit(article, **kwargs) for article in articles]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def close(self):
+        """Stop the workers (terminating any that don't exit) and the result collector"""
+        self._closed = True
+        processes = [process for process, _ in self._processes]
+        for _ in processes:
+            self._task_queue.put(None)
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                logger.warning("Inference worker did not stop; terminating", pid=process.pid)
+                process.terminate()
+                process.join(timeout=5)
+        self._result_queue.put(None)
+        self._fail_pending(RuntimeError("Inference pool is closed"))
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool(workers: int = None) -> InferencePool:
+    """Get the process-wide inference pool, starting it with `workers` processes on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = InferencePool(workers=workers,
+                                         model_selector=shared_selector if AUTO_MODEL_SELECTION else None)
+        return _shared_pool
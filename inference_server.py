@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+from config import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS
+from telemetry import BATCH_SIZE, QUEUE_DEPTH
+
+class MicroBatcher:
+    """Collects requests from many callers into micro-batches and fans results back out"""
+
+    def __init__(self, name: str, run_batch: Callable[[Tuple, List], List],
+                 max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+                 max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+                 latency_window: int = 1000):
+        """
+        Args:
+            name: Name used in stats
+            run_batch: Called with (group key, list of inputs); returns one result per input
+            max_batch_size: Largest batch to run at once
+            max_wait_ms: How long the first request in a batch waits for company
+            latency_window: Number of recent request latencies kept for percentiles
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.Queue()
+        QUEUE_DEPTH.set_function(self._queue.qsize, queue=f"microbatch_{name}")
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._latencies = deque(maxlen=latency_window)
+        self._requests = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"microbatch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Tuple, item) -> Future:
+        """
+        Queue one input for batched execution
+
+        Args:
+            key: Inputs are only batched with others sharing the same key
+                (e.g. model and generation settings)
+            item: Model input
+
+        Returns:
+            Future resolving to this input's result
+        """
+        future = Future()
+        self._queue.put((key, item, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> List:
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Only requests with identical settings can share a model call
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[0], []).append(request)
+
+            for key, requests in groups.items():
+                try:
+                    results = self.run_batch(key, [request[1] for request in requests])
+                    for request, result in zip(requests, results):
+                        request[2].set_result(result)
+                except Exception as e:
+                    for request in requests:
+                        request[2].set_exception(e)
+
+                finished = time.perf_counter()
+                BATCH_SIZE.observe(len(requests), batcher=self.name)
+                with self._stats_lock:
+                    self._batch_sizes[len(requests)] += 1
+                    self._requests += len(requests)
+                    self._latencies.extend((finished - request[3]) * 1000 for request in requests)
+
+    def stats(self) -> Dict:
+        """Queue depth, batch-size histogram and latency percentiles"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            histogram = dict(sorted(self._batch_sizes.items()))
+            requests = self._requests
+
+        def pct(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 1)
+
+        return {
+            'queue_depth': self._queue.qsize(),
+            'requests': requests,
+            'batches': sum(histogram.values()),
+            'batch_size_histogram': histogram,
+            'latency_ms_p50': pct(50),
+            'latency_ms_p95': pct(95),
+            'latency_ms_p99': pct(99)
+        }
+
+
+class InferenceServer:
+    """Local inference service batching summarization and sentiment requests across sessions"""
+
+    def __init__(self, max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+                 max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS):
+        self.summarization = MicroBatcher('summarization', self._run_summarization,
+                                          max_batch_size, max_wait_ms)
+        self.sentiment = MicroBatcher('sentiment', self._run_sentiment,
+                                      max_batch_size, max_wait_ms)
+
+    def _run_summarization(self, key: Tuple, texts: List[str]) -> List[str]:
+        from text_processor import load_pipeline
+
+        model_id, generation = key
+        summarizer = load_pipeline("summarization", model_id)
+        results = summarizer(texts, batch_size=len(texts), **dict(generation))
+        return [result['summary_text'] for result in results]
+
+    def _run_sentiment(self, key: Tuple, texts: List[str]) -> List[Dict]:
+        from text_processor import load_pipeline
+
+        (model_id,) = key
+        analyzer = load_pipeline("sentiment-analysis", model_id)
+        return analyzer(texts, batch_size=len(texts))
+
+    def stats(self) -> Dict[str, Dict]:
+        """Stats for each batcher"""
+        return {
+            'summarization': self.summarization.stats(),
+            'sentiment': self.sentiment.stats()
+        }
+
+
+class InferenceClient:
+    """Client used by TextProcessor to send model calls through the shared inference server"""
+
+    def __init__(self, server: InferenceServer = None, timeout: Optional[float] = 120):
+        self.server = server or get_shared_server()
+        self.timeout = timeout
+
+    def summarize(self, text: str, model_id: str, generation_kwargs: Dict) -> str:
+        """Summarize one text in the next summarization micro-batch"""
+        key = (model_id, tuple(sorted(generation_kwargs.items())))
+        return self.server.summarization.submit(key, text).result(timeout=self.timeout)
+
+    def classify(self, text: str, model_id: str) -> Dict:
+        """Classify sentiment of one text in the next sentiment micro-batch"""
+        return self.server.sentiment.submit((model_id,), text).result(timeout=self.timeout)
+
+    def stats(self) -> Dict[str, Dict]:
+        return self.server.stats()
+
+
+_shared_server = None
+_shared_server_lock = threading.Lock()
+
+
+def get_shared_server() -> InferenceServer:
+    """Get the process-wide inference server, starting it on first use"""
+    global _shared_server
+    with _shared_server_lock:
+        if _shared_server is None:
+            _shared_server = InferenceServer()
+        return _shared_server
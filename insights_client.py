@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+import requests
+from typing import Callable, Dict, List
+from config import INSIGHTS_SERVICE_URL, SERVICE_TIMEOUT_SECONDS
+from articles import ProcessedArticle, json_default
+from telemetry import current_correlation_id
+
+# Categories and decoding profiles only change when the service restarts; the
+# Streamlit apps ask for them on every rerun, so keep them this long
+LOOKUP_CACHE_SECONDS = 300
+# /health (inference stats) is shown on every rerun but only needs to be roughly current
+HEALTH_CACHE_SECONDS = 5
+
+class InsightsClient:
+    """Thin client for insights_service.py with the same interface as NewsAgent"""
+
+    def __init__(self, base_url: str = None, timeout: float = SERVICE_TIMEOUT_SECONDS):
+        self.base_url = (base_url or INSIGHTS_SERVICE_URL).rstrip('/')
+        # Give the service time to answer (or time out) itself before giving up
+        self.timeout = timeout + 10
+        self.session = requests.Session()
+        self._lookups = {}
+        self._lookups_lock = threading.Lock()
+
+    def _get(self, path: str, cache_seconds: float = 0):
+        if cache_seconds:
+            with self._lookups_lock:
+                cached = self._lookups.get(path)
+            if cached and time.monotonic() - cached[0] < cache_seconds:
+                return cached[1]
+
+        response = self.session.get(f"{self.base_url}{path}", timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+
+        if cache_seconds:
+            with self._lookups_lock:
+                self._lookups[path] = (time.monotonic(), body)
+        return body
+
+    def _post(self, path: str, payload: Dict):
+        # Articles in the payload serialize to their NewsAPI-shaped dicts
+        headers = {'Content-Type': 'application/json'}
+        # The service logs the request under the caller's correlation ID
+        if current_correlation_id():
+            headers['X-Correlation-ID'] = current_correlation_id()
+        response = self.session.post(f"{self.base_url}{path}", data=json.dumps(payload, default=json_default),
+                                     headers=headers, timeout=self.timeout)
+        if response.status_code in (503, 504):
+            raise RuntimeError(response.json().get('error', 'Insights service busy'))
+        response.raise_for_status()
+        return response.json()
+
+    def get_news_insights(self, category: str = 'general', keyword: str = None,
+                          max_articles: int = 10, progress_callback: Callable = None,
+                          cancel_event=None, **options) -> List[ProcessedArticle]:
+        """
+        Get news articles with insights from the service
+
+        Args:
+            category: News category
+            keyword: Search keyword (optional)
+            max_articles: Maximum number of articles to process
+            progress_callback: Called as (article, index, total) once the response arrives
+            cancel_event: Accepted for interface compatibility; a sent request cannot be cancelled
+            **options: Backend options such as decoding_profile and long_content
+
+        Returns:
+            List of processed articles with insights
+        """
+        payload = {'category': category, 'keyword': keyword, 'max_articles': max_articles}
+        payload.update({name: value for name, value in options.items() if value is not None})
+        articles = [ProcessedArticle.from_dict(article)
+                    for article in self._post('/insights', payload)['articles']]
+
+        if progress_callback:
+            for i, article in enumerate(articles):
+                progress_callback(article, i, len(articles))
+        return articles
+
+    def get_available_categories(self) -> Dict[str, str]:
+        """Get available news categories"""
+        return self._get('/categories', LOOKUP_CACHE_SECONDS)
+
+    def get_decoding_profiles(self) -> Dict[str, Dict]:
+        """Get summarization decoding profiles (with latency/ROUGE once evaluated)"""
+        return self._get('/decoding-profiles', LOOKUP_CACHE_SECONDS)['profiles']
+
+    def get_default_decoding_profile(self) -> str:
+        """Get the service's default decoding profile"""
+        return self._get('/decoding-profiles', LOOKUP_CACHE_SECONDS)['default']
+
+    def get_inference_stats(self):
+        """Get the service's inference stats, if it has any"""
+        return self._get('/health', HEALTH_CACHE_SECONDS).get('inference')
+
+    def filter_articles_by_sentiment(self, articles: List[Dict],
+                                     sentiment_filter: str = None) -> List[Dict]:
+        """Filter articles by sentiment"""
+        if not sentiment_filter:
+            return articles
+        return self._post('/filter', {'articles': articles, 'sentiment': sentiment_filter})['articles']
+
+    def filter_articles_by_entity(self, articles: List[Dict], entity: str = None) -> List[Dict]:
+        """Filter articles to those mentioning a company, person or place"""
+        if not entity:
+            return articles
+        return self._post('/filter', {'articles': articles, 'entity': entity})['articles']
+
+    def get_entity_stats(self, articles: List[Dict]) -> List[Dict]:
+        """Get sentiment statistics per entity for articles"""
+        return self._post('/entities', {'articles': articles})['entities']
+
+    def get_sentiment_stats(self, articles: List[Dict]) -> Dict[str, int]:
+        """Get sentiment statistics for articles"""
+        return self._post('/stats', {'articles': articles})
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+HTTP insights service
+
+Serves news insights, filtering and stats over HTTP so one inference tier can back
+many Streamlit replicas. Identical requests share a cached result (or the in-flight
+computation), work runs on a bounded worker pool, and requests that would exceed the
+queue limit or the timeout get 503/504 instead of piling up. GET /metrics serves
+the process's Prometheus metrics, and each request's log lines carry its
+X-Correlation-ID header (or a new ID, echoed back in the response).
+
+Usage:
+    python insights_service.py --backend huggingface --port 8600
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from config import (SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_QUEUE,
+                    SERVICE_TIMEOUT_SECONDS, SERVICE_CACHE_TTL_SECONDS, SERVICE_CACHE_SIZE,
+                    MODEL_WARMUP)
+from articles import json_default
+from newsapi_quota import get_newsapi_quota
+from resilience import circuit_states
+from telemetry import (CACHE_REQUESTS, PROMETHEUS_CONTENT_TYPE, QUEUE_DEPTH, correlation_scope,
+                       get_logger, in_current_context, render_metrics)
+
+logger = get_logger(__name__)
+
+class InsightsCache:
+    """Bounded LRU cache of insight results with a TTL, which also shares in-flight computations"""
+
+    def __init__(self, ttl_seconds: int = SERVICE_CACHE_TTL_SECONDS, max_size: int = SERVICE_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_submit(self, key: Tuple, submit):
+        """
+        Return a cached result, the in-flight future for the same key, or a new future
+
+        Args:
+            key: Cache key for the request
+            submit: Callable returning a Future for the computation
+
+        Returns:
+            Either the cached result list or a Future resolving to it
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+                self._results.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache='insights', result='hit')
+                return cached[1]
+
+            if key in self._in_flight:
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache='insights', result='shared')
+                return self._in_flight[key]
+
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache='insights', result='miss')
+            future = submit()
+            self._in_flight[key] = future
+
+        def store(done):
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if done.exception() is None:
+                    self._store(key, done.result())
+
+        future.add_done_callback(store)
+        return future
+
+    def _store(self, key: Tuple, result):
+        """Cache a result, dropping expired entries and then the least recently used (lock held)"""
+        now = time.monotonic()
+        for stale_key in [k for k, (stored_at, _) in self._results.items() if now - stored_at >= self.ttl_seconds]:
+            del self._results[stale_key]
+
+        self._results[key] = (now, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+
+class InsightsService:
+    """Shared agent, cache and bounded worker pool behind the HTTP handlers"""
+
+    def __init__(self, backend: str = 'huggingface', workers: int = SERVICE_WORKERS,
+                 max_queue: int = SERVICE_MAX_QUEUE, timeout: float = SERVICE_TIMEOUT_SECONDS, agent=None):
+        self.backend = backend
+        self.timeout = timeout
+
+        if agent is not None:
+            # e.g. a NewsAgent with stand-in models (benchmark.py)
+            self.agent = agent
+        elif backend == 'gemini':
+            from news_agent_gemini import NewsAgentGemini
+            self.agent = NewsAgentGemini()
+        else:
+            if MODEL_WARMUP:
+                from model_warmup import start_warmup
+                start_warmup()
+            from news_agent import NewsAgent
+            self.agent = NewsAgent()
+
+        self.cache = InsightsCache()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="insights")
+        # Bounds running + queued computations; extra requests are rejected
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        QUEUE_DEPTH.set_function(lambda: self._pending, queue='insights_service')
+
+    def _submit(self, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise OverflowError("Insights queue is full")
+
+        with self._pending_lock:
+            self._pending += 1
+
+        def run():
+            try:
+                return self.agent.get_news_insights(**kwargs)
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
+                self._slots.release()
+
+        # Keep the request's correlation ID in the worker thread
+        return self.executor.submit(in_current_context(run))
+
+    def get_news_insights(self, category: str = 'general', keyword: str = None,
+                          max_articles: int = 10, **options):
+        kwargs = {'category': category, 'keyword': keyword or None, 'max_articles': int(max_articles)}
+        for name in ('decoding_profile', 'long_content'):
+            if options.get(name) is not None and (self.backend != 'gemini' or name != 'decoding_profile'):
+                kwargs[name] = options[name]
+
+        key = tuple(sorted(kwargs.items()))
+        result = self.cache.get_or_submit(key, lambda: self._submit(**kwargs))
+        if isinstance(result, list):
+            return result
+        # Timing out leaves the computation running so it still fills the cache
+        return result.result(timeout=self.timeout)
+
+    def get_decoding_profiles(self) -> Dict:
+        if self.backend == 'gemini':
+            return {'default': None, 'profiles': {}}
+        return {
+            'default': self.agent.get_default_decoding_profile(),
+            'profiles': self.agent.get_decoding_profiles()
+        }
+
+    def health(self) -> Dict:
+        inference = self.agent.get_inference_stats() if hasattr(self.agent, 'get_inference_stats') else None
+        return {
+            'status': 'ok',
+            'backend': self.backend,
+            'pending': self._pending,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'inference': inference,
+            'circuits': circuit_states(),
+            'newsapi_quota': get_newsapi_quota().status()
+        }
+
+
+class InsightsRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints: /health, /categories, /decoding-profiles, /insights, /filter, /stats, /entities; and /metrics"""
+
+    service: InsightsService = None
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.correlation_id:
+            self.send_header('X-Correlation-ID', self.correlation_id)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload):
+        self._send(status, json.dumps(payload, default=json_default).encode('utf-8'), 'application/json')
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    correlation_id = None
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send(200, render_metrics().encode('utf-8'), PROMETHEUS_CONTENT_TYPE)
+        elif self.path == '/health':
+            self._send_json(200, self.service.health())
+        elif self.path == '/categories':
+            self._send_json(200, self.service.agent.get_available_categories())
+        elif self.path == '/decoding-profiles':
+            self._send_json(200, self.service.get_decoding_profiles())
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        with correlation_scope(self.headers.get('X-Correlation-ID')) as correlation_id:
+            self.correlation_id = correlation_id
+            self._handle_post()
+
+    def _handle_post(self):
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid JSON: {e}"})
+            return
+
+        try:
+            if self.path == '/insights':
+                self._send_json(200, {'articles': self.service.get_news_insights(**payload)})
+            elif self.path == '/filter':
+                articles = self.service.agent.filter_articles_by_sentiment(
+                    payload.get('articles', []), payload.get('sentiment')
+                )
+                articles = self.service.agent.filter_articles_by_entity(articles, payload.get('entity'))
+                self._send_json(200, {'articles': articles})
+            elif self.path == '/entities':
+                self._send_json(200, {'entities': self.service.agent.get_entity_stats(payload.get('articles', []))})
+            elif self.path == '/stats':
+                self._send_json(200, self.service.agent.get_sentiment_stats(payload.get('articles', [])))
+            else:
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+        except OverflowError as e:
+            self._send_json(503, {'error': str(e)})
+        except FutureTimeoutError:
+            self._send_json(504, {'error': "Timed out waiting for insights; retry to get the cached result"})
+        except TypeError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception("Insights service error", path=self.path, error=str(e))
+            self._send_json(500, {'error': str(e)})
+
+
+def create_server(service: InsightsService, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> ThreadingHTTPServer:
+    """Create (but do not start) an HTTP server for the service"""
+    handler = type('BoundInsightsRequestHandler', (InsightsRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve news insights over HTTP")
+    parser.add_argument('--backend', choices=['huggingface', 'gemini'], default='huggingface')
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS)
+    parser.add_argument('--max-queue', type=int, default=SERVICE_MAX_QUEUE)
+    parser.add_argument('--timeout', type=float, default=SERVICE_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    service = InsightsService(args.backend, args.workers, args.max_queue, args.timeout)
+    server = create_server(service, args.host, args.port)
+    logger.info("Insights service listening", backend=args.backend, url=f"http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from config import JOB_WORKERS, JOB_RETENTION_SECONDS
+from article_pool import get_article_pool
+from telemetry import QUEUE_DEPTH, correlation_scope, get_logger
+
+logger = get_logger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class Job:
+    """
+    A background fetch/process run with progress, partial results and cancellation
+    
+    Results are stored in the shared article pool; the job only keeps their IDs.
+    """
+
+    def __init__(self, key: Tuple, settings: Tuple = ()):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        # Processing options the results are pooled under (see article_pool.pool_key)
+        self.settings = settings
+        self.status = 'queued'
+        self.total = 0
+        self.completed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+        self._lock = threading.Lock()
+        self._article_ids = []
+        # (title, text so far) of the summary currently streaming, if any
+        self.streaming_summary = None
+
+    def report_progress(self, article: Optional[Dict], index: int, total: int):
+        """Progress callback for the agents: one call per article handled"""
+        article_key = get_article_pool().add(article, self.settings) if article is not None else None
+        with self._lock:
+            self.total = total
+            self.completed = index + 1
+            self.streaming_summary = None
+            if article_key is not None:
+                self._article_ids.append(article_key)
+
+    def report_summary_chunk(self, article: Dict, text: str):
+        """Summary callback for streaming agents: the summary generated so far"""
+        self.streaming_summary = (article.get('title') or '', text)
+
+    def set_results(self, articles: List[Dict]):
+        """Replace the partial results with the final article list"""
+        article_ids = get_article_pool().add_many(articles, self.settings)
+        with self._lock:
+            self._article_ids = article_ids
+
+    @property
+    def article_ids(self) -> List[str]:
+        """IDs (in the article pool) of the articles processed so far"""
+        with self._lock:
+            return list(self._article_ids)
+
+    @property
+    def results(self) -> List[Dict]:
+        """Snapshot of the articles processed so far (final results once done)"""
+        return get_article_pool().get_many(self.article_ids)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def progress(self) -> float:
+        """Fraction of articles handled"""
+        if self.status == 'done':
+            return 1.0
+        return self.completed / self.total if self.total else 0.0
+
+    def cancel(self):
+        """Ask the job to stop after the current article"""
+        self.cancel_event.set()
+        if self.status == 'queued':
+            self.status = 'cancelled'
+
+
+class JobQueue:
+    """Runs fetch/process jobs in background threads, deduplicating identical active jobs"""
+
+    def __init__(self, workers: int = JOB_WORKERS, retention_seconds: int = JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        QUEUE_DEPTH.set_function(lambda: self.active_count, queue='jobs')
+
+    @property
+    def active_count(self) -> int:
+        """Number of jobs queued or running"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.active)
+
+    def submit(self, key: Tuple, work: Callable[[Job], List[Dict]], settings: Tuple = ()) -> Job:
+        """
+        Submit a job, or join an identical one that is still queued or running
+
+        Args:
+            key: Identifies equivalent jobs (e.g. backend, category, keyword, article count)
+            work: Called with the Job; should report progress through job.report_progress,
+                stop when job.cancel_event is set, and return the final article list
+            settings: (name, value) pairs of the processing options, stored with the results
+
+        Returns:
+            The new or existing Job
+        """
+        with self._lock:
+            self._evict_finished()
+            for job in self._jobs.values():
+                if job.key == key and job.active and not job.cancel_event.is_set():
+                    return job
+
+            job = Job(key, settings)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], List[Dict]]):
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            return
+
+        job.status = 'running'
+        try:
+            # The job ID doubles as the correlation ID of the run's log lines
+            with correlation_scope(job.id):
+                job.set_results(work(job))
+            job.status = 'cancelled' if job.cancel_event.is_set() else 'done'
+        except Exception as e:
+            logger.exception("Job failed", job_id=job.id, error=str(e))
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job by ID; returns False if the job is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def _evict_finished(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue shared by all sessions"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
@@ -0,0 +1,94 @@
+"""
+JSON ledger files shared between processes
+
+The apps, batch_cli.py, insights_service.py and the digest refresher each keep
+their own ledger objects, but the daily budgets are per API key, so they all
+count into the same file. Changes are made under an exclusive lock on a
+`<path>.lock` file: the latest contents are read, the change applied and the
+result written back atomically, so no process overwrites another's counts.
+Readers reload the file whenever another process has replaced it.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from telemetry import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: updates are still atomic, but concurrent processes can lose counts
+    fcntl = None
+
+logger = get_logger(__name__)
+
+
+class LedgerFile:
+    """A JSON file of per-day usage, read and written under a cross-process lock"""
+
+    def __init__(self, path: str, name: str):
+        """
+        Args:
+            path: JSON file
+            name: What the ledger holds, for log lines (e.g. "gemini_tokens")
+        """
+        self.path = path
+        self.name = name
+        self._version = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        # Every save replaces the file, so a new inode means another process wrote it
+        return stat.st_ino, stat.st_mtime_ns
+
+    def changed(self) -> bool:
+        """Whether the file was written since this process last read or wrote it"""
+        return self._stat() != self._version
+
+    def read(self) -> Optional[Dict]:
+        """The file's contents, or None if it is missing or unreadable"""
+        version = self._stat()
+        if version is None:
+            self._version = None
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable ledger", ledger=self.name, path=self.path, error=str(e))
+            return None
+        self._version = version
+        return data
+
+    @contextmanager
+    def locked(self):
+        """Hold the exclusive cross-process lock for a read-modify-write"""
+        if fcntl is None:
+            yield
+            return
+        try:
+            lock_file = open(f"{self.path}.lock", 'a')
+        except OSError as e:
+            logger.error("Could not lock ledger", ledger=self.name, path=self.path, error=str(e))
+            yield
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            lock_file.close()
+
+    def write(self, data: Dict):
+        """Replace the file atomically, so a crash never leaves a half-written ledger"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._version = self._stat()
+        except OSError as e:
+            logger.error("Could not save ledger", ledger=self.name, path=self.path, error=str(e))
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Concurrent-user load test
+
+Simulates dashboard sessions against the local stand-ins: each session fetches
+insights, filters them and computes sentiment stats, then pauses for a think
+time, over and over. The test steps through increasing numbers of concurrent
+sessions and reports, per step, p50/p95/p99 latency per operation, throughput,
+errors, and CPU/RSS sampled over time. The steps form a capacity curve; save it
+with --output and compare configurations with --compare.
+
+Usage:
+    python load_test.py --users 1 2 4 8 16 --duration 30
+    python load_test.py --backend huggingface --models small --batch-size 8 --output mb8.json
+    python load_test.py --backend huggingface --workers 4 --output w4.json
+    python load_test.py --compare mb8.json w4.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from config import CATEGORIES, SUMMARIZATION_MODEL_SMALL, SENTIMENT_MODEL_SMALL
+from evaluate_profiles import percentile
+from standin_servers import FaultProfile, start_gemini_standin, start_newsapi_standin
+from telemetry import configure_logging
+
+try:
+    import psutil
+except ImportError:
+    # psutil is optional; without it only this process (not pool workers) is measured
+    psutil = None
+
+OPERATIONS = ('insights', 'filter', 'stats')
+
+
+class ResourceSampler:
+    """Samples CPU utilization and RSS of this process (and its children, with psutil)"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = psutil.Process() if psutil else None
+
+    def _cpu_seconds(self) -> float:
+        if self._process:
+            processes = [self._process] + self._process.children(recursive=True)
+            total = 0.0
+            for process in processes:
+                try:
+                    times = process.cpu_times()
+                    total += times.user + times.system
+                except psutil.Error:
+                    pass
+            return total
+        times = os.times()
+        return times.user + times.system
+
+    def _rss_mb(self) -> float:
+        if self._process:
+            total = 0
+            for process in [self._process] + self._process.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        except (OSError, ValueError):
+            import resource
+            # Peak rather than current RSS; kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _run(self):
+        start = last_time = time.monotonic()
+        last_cpu = self._cpu_seconds()
+        while not self._stop.wait(self.interval):
+            now, cpu = time.monotonic(), self._cpu_seconds()
+            self.samples.append({
+                't': round(now - start, 1),
+                'cpu_percent': round(100 * (cpu - last_cpu) / (now - last_time), 1),
+                'rss_mb': round(self._rss_mb(), 1)
+            })
+            last_time, last_cpu = now, cpu
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> List[Dict]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class AgentFactory:
+    """Builds one agent per simulated session, sharing models, stand-ins and pools"""
+
+    def __init__(self, args):
+        self.args = args
+
+        def faults():
+            return FaultProfile(args.latency_ms, args.latency_jitter_ms, args.latency_distribution,
+                                args.error_rate, args.throttle_rate, seed=args.seed)
+
+        self.newsapi = start_newsapi_standin(faults=faults())
+        self.gemini = None
+        self.inference_server = None
+        self.inference_pool = None
+
+        if args.backend == 'gemini':
+            self.gemini = start_gemini_standin(faults=faults(), stream_chunk_delay_ms=args.stream_chunk_delay_ms)
+            return
+
+        from benchmark import STUB_SENTIMENT_MODEL, STUB_SUMMARIZATION_MODEL, StubSentiment, StubSummarizer
+        from text_processor import register_pipeline
+
+        if args.models == 'stub':
+            # Registered process-wide so the micro-batching server and pool workers find them too
+            register_pipeline('summarization', STUB_SUMMARIZATION_MODEL, StubSummarizer())
+            register_pipeline('sentiment-analysis', STUB_SENTIMENT_MODEL, StubSentiment())
+            self.models = (STUB_SUMMARIZATION_MODEL, STUB_SENTIMENT_MODEL)
+        else:
+            self.models = (SUMMARIZATION_MODEL_SMALL, SENTIMENT_MODEL_SMALL)
+
+        if args.batch_size:
+            from inference_server import InferenceServer
+            self.inference_server = InferenceServer(max_batch_size=args.batch_size)
+
+        if args.workers:
+            from inference_pool import InferencePool
+            # Forked, so workers inherit the registered stand-in models; no session threads run yet
+            self.inference_pool = InferencePool(workers=args.workers, start_method='fork',
+                                                processor=self._text_processor())
+
+    def _text_processor(self):
+        from text_processor import TextProcessor
+
+        processor = TextProcessor(summarization_model=self.models[0], sentiment_model=self.models[1],
+                                  auto_model_selection=self.args.auto_model_selection, use_batching=False)
+        if self.inference_server:
+            from inference_server import InferenceClient
+            processor.inference_client = InferenceClient(self.inference_server)
+        return processor
+
+    def create(self):
+        from news_fetcher import NewsFetcher
+
+        fetcher = NewsFetcher(base_url=self.newsapi.url)
+        if self.gemini:
+            from news_agent_gemini import NewsAgentGemini
+            from text_processor_gemini import TextProcessorGemini
+
+            agent = NewsAgentGemini(text_processor=TextProcessorGemini(api_endpoint=self.gemini.url),
+                                    news_fetcher=fetcher)
+            agent.request_interval = self.args.gemini_interval
+            return agent
+
+        from news_agent import NewsAgent
+
+        agent = NewsAgent(inference_workers=0, text_processor=self._text_processor(), news_fetcher=fetcher)
+        agent.inference_pool = self.inference_pool
+        return agent
+
+    def close(self):
+        self.newsapi.shutdown()
+        if self.gemini:
+            self.gemini.shutdown()
+        if self.inference_pool:
+            self.inference_pool.close()
+
+
+def session(agent, args, stop: threading.Event, results: Dict[str, List], errors: List, lock: threading.Lock):
+    """One simulated dashboard user: fetch, filter, stats, think, repeat"""
+    rng = random.Random()
+    categories = list(CATEGORIES)
+    while not stop.is_set():
+        timings = {}
+        try:
+            start = time.perf_counter()
+            articles = agent.get_news_insights(category=rng.choice(categories), max_articles=args.articles)
+            timings['insights'] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            agent.filter_articles_by_sentiment(articles, rng.choice(['POSITIVE', 'NEGATIVE', 'NEUTRAL']))
+            timings['filter'] = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            agent.get_sentiment_stats(articles)
+            timings['stats'] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        else:
+            with lock:
+                for operation, latency in timings.items():
+                    results[operation].append(latency)
+
+        if args.think_time:
+            stop.wait(rng.expovariate(1 / args.think_time))
+
+
+def run_step(factory: AgentFactory, users: int, args) -> Dict:
+    """Run `users` concurrent sessions for the configured duration"""
+    agents = [factory.create() for _ in range(users)]
+    results = {operation: [] for operation in OPERATIONS}
+    errors = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    sampler = ResourceSampler(args.sample_interval)
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(agent, args, stop, results, errors, lock), daemon=True)
+               for agent in agents]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.duration)
+    stop.set()
+    # Sessions finish the iteration in progress so its latency is counted
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    samples = sampler.stop()
+
+    latency = {}
+    for operation, values in results.items():
+        latency[operation] = {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 50), 1),
+            'p95_ms': round(percentile(values, 95), 1),
+            'p99_ms': round(percentile(values, 99), 1)
+        }
+
+    cpu = [sample['cpu_percent'] for sample in samples]
+    rss = [sample['rss_mb'] for sample in samples]
+    return {
+        'users': users,
+        'elapsed_s': round(elapsed, 1),
+        'throughput_per_s': round(len(results['insights']) / elapsed, 3),
+        'articles_per_s': round(len(results['insights']) * args.articles / elapsed, 2),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'latency': latency,
+        'cpu_percent_mean': round(sum(cpu) / len(cpu), 1) if cpu else None,
+        'cpu_percent_max': max(cpu) if cpu else None,
+        'rss_mb_max': max(rss) if rss else None,
+        'timeline': samples
+    }
+
+
+def sustained_users(steps: List[Dict], slo_p95_ms: float) -> int:
+    """Most concurrent users whose insights p95 met the SLO without errors"""
+    passing = [step['users'] for step in steps
+               if not step['errors'] and step['latency']['insights']['count']
+               and step['latency']['insights']['p95_ms'] <= slo_p95_ms]
+    return max(passing) if passing else 0
+
+
+def print_curve(report: Dict):
+    print(f"\n{report['label']}  (SLO: insights p95 <= {report['slo_p95_ms']:.0f} ms, "
+          f"sustained users: {report['sustained_users']})")
+    print(f"{'users':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'cpu %':>7} {'rss MB':>8}")
+    for step in report['steps']:
+        insights = step['latency']['insights']
+        print(f"{step['users']:>6} {step['throughput_per_s']:>8} {insights['p50_ms']:>9} {insights['p95_ms']:>9} "
+              f"{insights['p99_ms']:>9} {step['errors']:>7} {step['cpu_percent_mean'] or 0:>7} "
+              f"{step['rss_mb_max'] or 0:>8}")
+
+
+def compare_reports(paths: List[str]):
+    """Print saved capacity curves one after another with their configurations"""
+    for path in paths:
+        with open(path) as f:
+            report = json.load(f)
+        print_curve(report)
+        print(f"  config: {json.dumps(report['config'], sort_keys=True)}")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent-user load test against local stand-ins")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8], help="Concurrent sessions per step")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds per step")
+    parser.add_argument('--think-time', type=float, default=2.0, help="Mean pause between a user's actions (s)")
+    parser.add_argument('--articles', type=int, default=10, help="Articles per insights request")
+    parser.add_argument('--backend', choices=['huggingface', 'gemini'], default='huggingface')
+    parser.add_argument('--models', choices=['stub', 'small'], default='stub',
+                        help="Stand-in models, or the configured small models (huggingface)")
+    parser.add_argument('--batch-size', type=int, default=0, help="Micro-batch size (0 = no micro-batching)")
+    parser.add_argument('--workers', type=int, default=0, help="Inference pool processes (0 = in-process)")
+    parser.add_argument('--auto-model-selection', action='store_true', help="Enable load-based model switching")
+    parser.add_argument('--gemini-interval', type=float, default=0, help="Pause between Gemini articles (s)")
+    parser.add_argument('--latency-ms', type=float, default=50, help="Stand-in median latency")
+    parser.add_argument('--latency-jitter-ms', type=float, default=25)
+    parser.add_argument('--latency-distribution', choices=['fixed', 'uniform', 'normal', 'lognormal'],
+                        default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Stand-in 500 rate")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Stand-in 429 rate")
+    parser.add_argument('--stream-chunk-delay-ms', type=float, default=20)
+    parser.add_argument('--slo-p95-ms', type=float, default=5000, help="Insights p95 latency objective")
+    parser.add_argument('--sample-interval', type=float, default=1.0, help="CPU/RSS sampling interval (s)")
+    parser.add_argument('--seed', type=int, help="Seed for stand-in latency and faults")
+    parser.add_argument('--label', help="Name for this configuration (default: derived from options)")
+    parser.add_argument('--output', help="Write the capacity curve to this JSON file")
+    parser.add_argument('--compare', nargs='+', metavar='REPORT', help="Print saved capacity curves and exit")
+    parser.add_argument('--log-level', default='WARNING', help="App log level (per-request logs are noisy)")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    configure_logging(level=args.log_level)
+
+    if args.compare:
+        compare_reports(args.compare)
+        return 0
+
+    config = {name: getattr(args, name) for name in (
+        'backend', 'models', 'batch_size', 'workers', 'auto_model_selection', 'articles', 'think_time',
+        'duration', 'latency_ms', 'latency_jitter_ms', 'latency_distribution', 'error_rate', 'throttle_rate')}
+    label = args.label or (f"{args.backend}" + (f"/{args.models}" if args.backend == 'huggingface' else '')
+                           + (f" batch={args.batch_size}" if args.batch_size else '')
+                           + (f" workers={args.workers}" if args.workers else ''))
+
+    factory = AgentFactory(args)
+    steps = []
+    try:
+        for users in args.users:
+            print(f"Running {users} concurrent users for {args.duration:.0f}s...")
+            steps.append(run_step(factory, users, args))
+        # Failed API calls are absorbed by the agents' fallbacks; the stand-ins count them
+        standin_stats = {'newsapi': factory.newsapi.stats(),
+                         'gemini': factory.gemini.stats() if factory.gemini else None}
+    finally:
+        factory.close()
+
+    report = {
+        'label': label,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'host': {'cpus': os.cpu_count(), 'machine': platform.machine(), 'python': platform.python_version(),
+                 'psutil': psutil is not None},
+        'config': config,
+        'slo_p95_ms': args.slo_p95_ms,
+        'sustained_users': sustained_users(steps, args.slo_p95_ms),
+        'standin_requests': standin_stats,
+        'steps': steps
+    }
+    print_curve(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nCapacity curve written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
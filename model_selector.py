@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+from typing import List
+from config import (LOAD_SWITCH_QUEUE_DEPTH, LOAD_SWITCH_P95_MS, LOAD_RECOVER_QUEUE_DEPTH,
+                    LOAD_RECOVER_P95_MS, LOAD_LATENCY_WINDOW, LOAD_MIN_DWELL_SECONDS)
+from telemetry import QUEUE_DEPTH, get_logger
+
+logger = get_logger(__name__)
+
+class LoadBasedModelSelector:
+    """Decides whether the full-size or the small models should serve the next request"""
+
+    def __init__(self, switch_queue_depth: int = LOAD_SWITCH_QUEUE_DEPTH,
+                 switch_p95_ms: float = LOAD_SWITCH_P95_MS,
+                 recover_queue_depth: int = LOAD_RECOVER_QUEUE_DEPTH,
+                 recover_p95_ms: float = LOAD_RECOVER_P95_MS,
+                 window: int = LOAD_LATENCY_WINDOW,
+                 min_dwell_seconds: float = LOAD_MIN_DWELL_SECONDS):
+        self.switch_queue_depth = switch_queue_depth
+        self.switch_p95_ms = switch_p95_ms
+        self.recover_queue_depth = recover_queue_depth
+        self.recover_p95_ms = recover_p95_ms
+        self.min_dwell_seconds = min_dwell_seconds
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._queue_depth = 0
+        self._small = False
+        self._switched_at = 0.0
+
+    def queued(self, count: int = 1):
+        """Register work waiting for inference"""
+        with self._lock:
+            self._queue_depth += count
+
+    def dequeued(self, count: int = 1):
+        """Register that queued work has been picked up"""
+        with self._lock:
+            self._queue_depth = max(0, self._queue_depth - count)
+
+    def record_latency(self, latency_ms: float):
+        """Record the latency of one inference call (article-level)"""
+        with self._lock:
+            self._latencies.append(latency_ms)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue_depth
+
+    def p95_latency(self) -> float:
+        """p95 of the recent latency window in milliseconds"""
+        with self._lock:
+            return self._percentile(list(self._latencies), 95)
+
+    def use_small_model(self) -> bool:
+        """
+        Whether the small models should be used right now
+
+        Returns:
+            True while the processor is considered overloaded
+        """
+        with self._lock:
+            p95 = self._percentile(list(self._latencies), 95)
+            now = time.monotonic()
+
+            if not self._small:
+                if self._queue_depth >= self.switch_queue_depth or p95 >= self.switch_p95_ms:
+                    self._small = True
+                    self._switched_at = now
+                    # Latencies of the large model say nothing about the small one
+                    self._latencies.clear()
+                    logger.warning("High load: switching to small models",
+                                   queue_depth=self._queue_depth, p95_ms=round(p95))
+            elif now - self._switched_at >= self.min_dwell_seconds:
+                if self._queue_depth <= self.recover_queue_depth and p95 <= self.recover_p95_ms:
+                    self._small = False
+                    self._switched_at = now
+                    self._latencies.clear()
+                    logger.info("Load recovered: switching back to full models",
+                                queue_depth=self._queue_depth, p95_ms=round(p95))
+
+            return self._small
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(pct / 100 * len(ordered)))
+        return ordered[index]
+
+
+# Process-wide selector so load from every Streamlit session counts together
+shared_selector = LoadBasedModelSelector()
+QUEUE_DEPTH.set_function(lambda: shared_selector.queue_depth, queue='model_selector')
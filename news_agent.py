@@ -1,17 +1,56 @@
 from news_fetcher import NewsFetcher
 from text_processor import TextProcessor
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+import threading
 import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from config import INFERENCE_WORKERS, INFERENCE_TIMEOUT_SECONDS, PROFILING, ARTICLE_ENRICHMENT
+from entity_index import get_entity_index
+from profiling import profiled, span
+from telemetry import ARTICLES_PROCESSED, correlated, get_logger
+
+logger = get_logger(__name__)
 
 class NewsAgent:
     """Main agent that orchestrates news fetching, processing, and analysis"""
     
-    def __init__(self):
-        self.news_fetcher = NewsFetcher()
-        self.text_processor = TextProcessor()
+    def __init__(self, inference_workers: int = INFERENCE_WORKERS,
+                 text_processor: TextProcessor = None, news_fetcher: NewsFetcher = None,
+                 profiling: bool = PROFILING, enrich: bool = ARTICLE_ENRICHMENT):
+        self.news_fetcher = news_fetcher or NewsFetcher()
+        
+        # Download full article bodies before processing
+        self.enricher = None
+        if enrich:
+            from article_enricher import get_article_enricher
+            self.enricher = get_article_enricher()
+        
+        # Record a span tree (and optionally a cProfile/pyinstrument sample) per run
+        self.profiling = profiling
+        
+        # With workers configured, inference runs in a shared process pool
+        # that reuses the pool's preloaded processor for local settings
+        self.inference_pool = None
+        if inference_workers > 0:
+            from inference_pool import get_shared_pool
+            self.inference_pool = get_shared_pool(inference_workers)
+        
+        if text_processor:
+            self.text_processor = text_processor
+        elif self.inference_pool and self.inference_pool.processor:
+            self.text_processor = self.inference_pool.processor
+        elif self.inference_pool:
+            # Only picks models and profiles here; the workers hold the loaded models
+            self.text_processor = TextProcessor(preload=False)
+        else:
+            self.text_processor = TextProcessor()
     
+    @correlated
+    @profiled('get_news_insights')
     def get_news_insights(self, category: str = 'general', keyword: str = None, 
-                         max_articles: int = 10) -> List[Dict]:
+                         max_articles: int = 10, decoding_profile: str = None,
+                         long_content: bool = None, progress_callback: Callable = None,
+                         cancel_event: Optional[threading.Event] = None) -> List[Dict]:
         """
         Get news articles with insights (summaries and sentiment analysis)
         
@@ -19,56 +58,182 @@ class NewsAgent:
             category: News category
             keyword: Search keyword (optional)
             max_articles: Maximum number of articles to process
+            decoding_profile: Summarization decoding profile (fast, balanced, quality)
+            long_content: Summarize full article content with map-reduce (optional)
+            progress_callback: Called as (processed article or None, index, total) per article
+            cancel_event: Stop processing further articles once set
             
         Returns:
             List of processed articles with insights
         """
-        print(f"Fetching news for category: {category}")
-        if keyword:
-            print(f"Search keyword: {keyword}")
+        logger.info("Fetching news", category=category, keyword=keyword, max_articles=max_articles)
         
         # Fetch news articles
-        articles = self.news_fetcher.fetch_news(
-            category=category,
-            keyword=keyword,
-            page_size=max_articles
-        )
+        with span('fetch', category=category, keyword=keyword):
+            articles = self.news_fetcher.fetch_news(
+                category=category,
+                keyword=keyword,
+                page_size=max_articles
+            )
         
         if not articles:
-            print("No articles found")
+            logger.warning("No articles found", category=category, keyword=keyword)
             return []
         
-        print(f"Found {len(articles)} articles. Processing...")
+        logger.info("Processing articles", count=len(articles))
+        
+        return self.process_articles(articles, decoding_profile=decoding_profile,
+                                     long_content=long_content,
+                                     progress_callback=progress_callback,
+                                     cancel_event=cancel_event)
+    
+    @correlated
+    @profiled('process_articles')
+    def process_articles(self, articles: List[Dict], decoding_profile: str = None,
+                         long_content: bool = None, progress_callback: Callable = None,
+                         cancel_event: Optional[threading.Event] = None) -> List[Dict]:
+        """
+        Add summaries and sentiment to already-fetched articles
+        
+        Args:
+            articles: Raw NewsAPI article dictionaries
+            decoding_profile: Summarization decoding profile (fast, balanced, quality)
+            long_content: Summarize full article content with map-reduce (optional;
+                on by default for enriched articles)
+            progress_callback: Called as (processed article or None, index, total) per article
+            cancel_event: Stop processing further articles once set
+            
+        Returns:
+            List of processed articles (articles without title and description are skipped)
+        """
+        # Swap NewsAPI's truncated content for the text of the article pages
+        if self.enricher:
+            with span('enrich', articles=len(articles)):
+                articles = self.enricher.enrich(articles)
+            if long_content is None:
+                long_content = True
         
         # Process articles with AI insights
+        if self.inference_pool:
+            return self._process_in_pool(articles, progress_callback, cancel_event,
+                                         decoding_profile=decoding_profile,
+                                         long_content=long_content)
+        
         processed_articles = []
         
+        # Report the backlog so the processor can fall back to smaller models under load
+        selector = self.text_processor.model_selector
+        if selector:
+            selector.queued(len(articles))
+        
         for i, article in enumerate(articles):
+            if cancel_event and cancel_event.is_set():
+                logger.info("Processing cancelled", processed=i, total=len(articles))
+                if selector:
+                    selector.dequeued(len(articles) - i)
+                break
+            
+            if selector:
+                selector.dequeued()
+            processed_article = None
             try:
-                print(f"Processing article {i+1}/{len(articles)}")
+                logger.debug("Processing article", index=i + 1, total=len(articles))
                 
                 # Skip articles without content
                 if not article.get('title') and not article.get('description'):
+                    ARTICLES_PROCESSED.inc(backend='huggingface', outcome='skipped')
                     continue
                 
                 # Process article
-                processed_article = self.text_processor.process_article(article)
+                with span('article', index=i + 1, title=article.get('title')):
+                    processed_article = self.text_processor.process_article(
+                        article, decoding_profile=decoding_profile, long_content=long_content
+                    )
                 processed_articles.append(processed_article)
+                ARTICLES_PROCESSED.inc(backend='huggingface', outcome='ok')
                 
                 # Small delay to avoid overwhelming the models
-                time.sleep(0.1)
+                with span('wait'):
+                    time.sleep(0.1)
                 
             except Exception as e:
-                print(f"Error processing article {i+1}: {e}")
+                ARTICLES_PROCESSED.inc(backend='huggingface', outcome='error')
+                logger.exception("Error processing article", index=i + 1, error=str(e))
                 continue
+            finally:
+                if progress_callback:
+                    progress_callback(processed_article, i, len(articles))
+        
+        logger.info("Processed articles", count=len(processed_articles))
+        return processed_articles
+    
+    def _process_in_pool(self, articles: List[Dict], progress_callback: Callable = None,
+                         cancel_event: Optional[threading.Event] = None, **kwargs) -> List[Dict]:
+        """Dispatch articles to the inference worker pool and collect them in order"""
+        # Skip articles without content
+        articles = [article for article in articles
+                    if article.get('title') or article.get('description')]
+        
+        # Report the backlog and pick the models here, where the load is known; the
+        # workers use the models they are given
+        selector = self.text_processor.model_selector
+        if selector:
+            selector.queued(len(articles))
+        
+        processed_articles = []
+        collected = 0
+        try:
+            models = self.text_processor.select_models()
+            futures = [self.inference_pool.submit(article, models=models, **kwargs) for article in articles]
+            for i, future in enumerate(futures):
+                if cancel_event and cancel_event.is_set():
+                    # Jobs already in the pool still run; their results are discarded
+                    logger.info("Processing cancelled", processed=i, total=len(articles))
+                    break
+                
+                processed_article = None
+                try:
+                    # Worker processes don't report spans; this times the wait for the result
+                    with span('article', index=i + 1, title=articles[i].get('title'), pool=True):
+                        processed_article = future.result(timeout=INFERENCE_TIMEOUT_SECONDS)
+                    processed_articles.append(processed_article)
+                    ARTICLES_PROCESSED.inc(backend='huggingface', outcome='ok')
+                except FutureTimeoutError:
+                    ARTICLES_PROCESSED.inc(backend='huggingface', outcome='error')
+                    logger.error("Timed out waiting for the inference pool", index=i + 1,
+                                 timeout_s=INFERENCE_TIMEOUT_SECONDS)
+                except Exception as e:
+                    ARTICLES_PROCESSED.inc(backend='huggingface', outcome='error')
+                    logger.error("Error processing article", index=i + 1, error=str(e))
+                finally:
+                    collected += 1
+                    if selector:
+                        selector.dequeued()
+                    if progress_callback:
+                        progress_callback(processed_article, i, len(futures))
+        finally:
+            if selector:
+                selector.dequeued(len(articles) - collected)
         
-        print(f"Successfully processed {len(processed_articles)} articles")
+        logger.info("Processed articles", count=len(processed_articles))
         return processed_articles
     
     def get_available_categories(self) -> Dict[str, str]:
         """Get available news categories"""
         return self.news_fetcher.get_available_categories()
     
+    def get_decoding_profiles(self) -> Dict[str, Dict]:
+        """Get summarization decoding profiles (with latency/ROUGE once evaluated)"""
+        return self.text_processor.get_decoding_profiles()
+    
+    def get_default_decoding_profile(self) -> str:
+        """Get the deployment's default decoding profile"""
+        return self.text_processor.decoding_profile
+    
+    def get_inference_stats(self):
+        """Get micro-batching inference server stats, if batching is enabled"""
+        return self.text_processor.get_inference_stats()
+    
     def filter_articles_by_sentiment(self, articles: List[Dict], 
                                    sentiment_filter: str = None) -> List[Dict]:
         """
@@ -87,6 +252,38 @@ class NewsAgent:
         return [article for article in articles 
                 if article.get('sentiment') == sentiment_filter]
     
+    def filter_articles_by_entity(self, articles: List[Dict], entity: str = None) -> List[Dict]:
+        """
+        Filter articles to those mentioning a company, person or place
+        
+        Args:
+            articles: List of processed articles
+            entity: Entity name, as listed by get_entity_stats
+            
+        Returns:
+            Filtered list of articles
+        """
+        if not entity:
+            return articles
+        
+        index = get_entity_index()
+        article_ids = index.index_articles(articles)
+        matching = set(index.filter_ids(article_ids, entity))
+        return [article for article, key in zip(articles, article_ids) if key in matching]
+    
+    def get_entity_stats(self, articles: List[Dict]) -> List[Dict]:
+        """
+        Get sentiment statistics per entity for articles
+        
+        Args:
+            articles: List of processed articles
+            
+        Returns:
+            One row per entity with its type, article count and sentiment counts
+        """
+        index = get_entity_index()
+        return index.sentiment_by_entity(index.index_articles(articles))
+    
     def get_sentiment_stats(self, articles: List[Dict]) -> Dict[str, int]:
         """
         Get sentiment statistics for articles
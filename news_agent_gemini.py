@@ -1,21 +1,48 @@
 from news_fetcher import NewsFetcher
 from text_processor_gemini import TextProcessorGemini
-from typing import List, Dict
+from articles import Article, ProcessedArticle, as_article
+from typing import Callable, List, Dict, Optional
+import threading
 import time
+from config import GEMINI_REQUEST_INTERVAL_SECONDS, PROFILING, ARTICLE_ENRICHMENT
+from entity_index import get_entity_index
+from profiling import profiled, span
+from resilience import circuit_states
+from telemetry import ARTICLES_PROCESSED, RATE_LIMIT_WAIT_SECONDS, correlated, get_logger
+
+logger = get_logger(__name__)
 
 class NewsAgentGemini:
     """Main agent that orchestrates news fetching, processing, and analysis using Gemini API"""
     
-    def __init__(self):
-        self.news_fetcher = NewsFetcher()
+    def __init__(self, text_processor: TextProcessorGemini = None, news_fetcher: NewsFetcher = None,
+                 profiling: bool = PROFILING, enrich: bool = ARTICLE_ENRICHMENT):
+        self.news_fetcher = news_fetcher or NewsFetcher()
+        
+        # Download full article bodies before processing
+        self.enricher = None
+        if enrich:
+            from article_enricher import get_article_enricher
+            self.enricher = get_article_enricher()
+        
+        # Record a span tree (and optionally a cProfile/pyinstrument sample) per run
+        self.profiling = profiling
         try:
-            self.text_processor = TextProcessorGemini()
+            self.text_processor = text_processor or TextProcessorGemini()
         except ValueError as e:
-            print(f"Warning: {e}")
+            logger.warning("Gemini unavailable, using simple processing", error=str(e))
             self.text_processor = None
+        
+        # Pause between articles (stand-ins and paid tiers can use less)
+        self.request_interval = GEMINI_REQUEST_INTERVAL_SECONDS
     
+    @correlated
+    @profiled('get_news_insights')
     def get_news_insights(self, category: str = 'general', keyword: str = None, 
-                         max_articles: int = 10) -> List[Dict]:
+                         max_articles: int = 10, long_content: bool = None,
+                         progress_callback: Callable = None,
+                         cancel_event: Optional[threading.Event] = None,
+                         summary_callback: Callable = None) -> List[Dict]:
         """
         Get news articles with insights (summaries and sentiment analysis)
         
@@ -23,62 +50,131 @@ class NewsAgentGemini:
             category: News category
             keyword: Search keyword (optional)
             max_articles: Maximum number of articles to process
+            long_content: Include full article content in the prompts (optional)
+            progress_callback: Called as (processed article or None, index, total) per article
+            cancel_event: Stop processing further articles once set
+            summary_callback: Stream summaries, calling this as (article, summary so far)
             
         Returns:
             List of processed articles with insights
         """
-        print(f"Fetching news for category: {category}")
-        if keyword:
-            print(f"Search keyword: {keyword}")
+        logger.info("Fetching news", category=category, keyword=keyword, max_articles=max_articles)
         
         # Fetch news articles
-        articles = self.news_fetcher.fetch_news(
-            category=category,
-            keyword=keyword,
-            page_size=max_articles
-        )
+        with span('fetch', category=category, keyword=keyword):
+            articles = self.news_fetcher.fetch_news(
+                category=category,
+                keyword=keyword,
+                page_size=max_articles
+            )
         
         if not articles:
-            print("No articles found")
+            logger.warning("No articles found", category=category, keyword=keyword)
             return []
         
-        print(f"Found {len(articles)} articles. Processing...")
+        logger.info("Processing articles", count=len(articles))
+        
+        return self.process_articles(articles, long_content=long_content,
+                                     progress_callback=progress_callback,
+                                     cancel_event=cancel_event,
+                                     summary_callback=summary_callback)
+    
+    @correlated
+    @profiled('process_articles')
+    def process_articles(self, articles: List[Dict], long_content: bool = None,
+                         progress_callback: Callable = None,
+                         cancel_event: Optional[threading.Event] = None,
+                         summary_callback: Callable = None) -> List[Dict]:
+        """
+        Add summaries and sentiment to already-fetched articles
+        
+        Args:
+            articles: Raw NewsAPI article dictionaries
+            long_content: Include full article content in the prompts (optional;
+                on by default for enriched articles)
+            progress_callback: Called as (processed article or None, index, total) per article
+            cancel_event: Stop processing further articles once set
+            summary_callback: Stream summaries, calling this as (article, summary so far)
+            
+        Returns:
+            List of processed articles (articles without title and description are skipped)
+        """
+        # Swap NewsAPI's truncated content for the text of the article pages
+        if self.enricher:
+            with span('enrich', articles=len(articles)):
+                articles = self.enricher.enrich(articles)
+            if long_content is None:
+                long_content = True
         
         # Process articles with AI insights
         processed_articles = []
         
         for i, article in enumerate(articles):
+            if cancel_event and cancel_event.is_set():
+                logger.info("Processing cancelled", processed=i, total=len(articles))
+                break
+            
+            processed_article = None
+            use_gemini = False
             try:
-                print(f"Processing article {i+1}/{len(articles)}")
+                logger.debug("Processing article", index=i + 1, total=len(articles))
                 
                 # Skip articles without content
                 if not article.get('title') and not article.get('description'):
+                    ARTICLES_PROCESSED.inc(backend='gemini', outcome='skipped')
+                    if progress_callback:
+                        progress_callback(None, i, len(articles))
                     continue
                 
-                # Process article with Gemini if available, otherwise use simple processing
-                if self.text_processor:
-                    processed_article = self.text_processor.process_article(article)
-                else:
-                    # Fallback to simple processing
-                    processed_article = self._simple_process_article(article)
+                # Process article with Gemini if available, otherwise use simple processing;
+                # while Gemini's circuit is open, skip straight to simple processing
+                use_gemini = self.text_processor and not self.text_processor.circuit_open()
+                with span('article', index=i + 1, title=article.get('title'), gemini=bool(use_gemini)):
+                    if use_gemini:
+                        on_summary_chunk = None
+                        if summary_callback:
+                            on_summary_chunk = lambda text, article=article: summary_callback(article, text)
+                        processed_article = self.text_processor.process_article(
+                            article, long_content=long_content, on_summary_chunk=on_summary_chunk
+                        )
+                    else:
+                        # Fallback to simple processing
+                        processed_article = self._simple_process_article(article)
                 
                 processed_articles.append(processed_article)
-                
-                # Longer delay to avoid rate limiting (15 requests per minute limit)
-                time.sleep(4)
+                ARTICLES_PROCESSED.inc(backend='gemini', outcome='ok' if use_gemini else 'fallback')
                 
             except Exception as e:
-                print(f"Error processing article {i+1}: {e}")
+                ARTICLES_PROCESSED.inc(backend='gemini', outcome='error')
+                logger.exception("Error processing article", index=i + 1, error=str(e))
                 # Add article with simple processing as fallback
                 processed_article = self._simple_process_article(article)
                 processed_articles.append(processed_article)
+            
+            if progress_callback:
+                progress_callback(processed_article, i, len(articles))
+            
+            if not use_gemini:
+                # No Gemini call was made, so there is no rate limit to respect
                 continue
+            
+            # Longer delay to avoid rate limiting (15 requests per minute limit);
+            # waiting on the cancel event lets a cancel interrupt the delay
+            wait_start = time.perf_counter()
+            with span('wait', interval_s=self.request_interval):
+                if cancel_event:
+                    cancel_event.wait(self.request_interval)
+                elif self.request_interval:
+                    time.sleep(self.request_interval)
+            if self.request_interval:
+                RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - wait_start, api='gemini')
         
-        print(f"Successfully processed {len(processed_articles)} articles")
+        logger.info("Processed articles", count=len(processed_articles))
         return processed_articles
     
-    def _simple_process_article(self, article: Dict) -> Dict:
+    def _simple_process_article(self, article: Article) -> ProcessedArticle:
         """Simple fallback processing without AI"""
+        article = as_article(article)
         # Simple sentiment analysis based on keywords
         text = f"{article.get('title', '')} {article.get('description', '')}"
         positive_words = ['good', 'great', 'excellent', 'positive', 'success', 'win', 'profit', 'growth', 'up', 'rise']
@@ -99,16 +195,22 @@ class NewsAgentGemini:
         description = article.get('description', '')
         summary = description[:150] + "..." if len(description) > 150 else description
         
-        article['summary'] = summary
-        article['sentiment'] = sentiment
-        article['sentiment_confidence'] = 0.7
-        
-        return article
+        return article.processed(summary, sentiment, 0.7)
     
     def get_available_categories(self) -> Dict[str, str]:
         """Get available news categories"""
         return self.news_fetcher.get_available_categories()
     
+    def get_inference_stats(self):
+        """Get Gemini summary latency and today's token usage, if Gemini is configured"""
+        if not self.text_processor:
+            return None
+        return {
+            'summary_latency': self.text_processor.get_latency_stats(),
+            'token_usage': self.text_processor.get_token_usage(),
+            'circuits': circuit_states()
+        }
+    
     def filter_articles_by_sentiment(self, articles: List[Dict], 
                                    sentiment_filter: str = None) -> List[Dict]:
         """
@@ -127,6 +229,38 @@ class NewsAgentGemini:
         return [article for article in articles 
                 if article.get('sentiment') == sentiment_filter]
     
+    def filter_articles_by_entity(self, articles: List[Dict], entity: str = None) -> List[Dict]:
+        """
+        Filter articles to those mentioning a company, person or place
+        
+        Args:
+            articles: List of processed articles
+            entity: Entity name, as listed by get_entity_stats
+            
+        Returns:
+            Filtered list of articles
+        """
+        if not entity:
+            return articles
+        
+        index = get_entity_index()
+        article_ids = index.index_articles(articles)
+        matching = set(index.filter_ids(article_ids, entity))
+        return [article for article, key in zip(articles, article_ids) if key in matching]
+    
+    def get_entity_stats(self, articles: List[Dict]) -> List[Dict]:
+        """
+        Get sentiment statistics per entity for articles
+        
+        Args:
+            articles: List of processed articles
+            
+        Returns:
+            One row per entity with its type, article count and sentiment counts
+        """
+        index = get_entity_index()
+        return index.sentiment_by_entity(index.index_articles(articles))
+    
     def get_sentiment_stats(self, articles: List[Dict]) -> Dict[str, int]:
         """
         Get sentiment statistics for articles
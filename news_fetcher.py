@@ -1,17 +1,41 @@
+import threading
+import time
 import requests
-import json
-from typing import List, Dict, Optional
-from config import NEWS_API_KEY, NEWS_API_BASE_URL, CATEGORIES
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from articles import Article, parse_newsapi_response
+from config import (NEWS_API_KEY, NEWS_API_BASE_URL, CATEGORIES, NEWSAPI_HEDGING,
+                    NEWSAPI_FALLBACK_CACHE_SIZE)
+from newsapi_quota import EXHAUSTED, FRESH, STALE, NewsApiQuota, demand_key, get_newsapi_quota
+from profiling import span
+from resilience import CircuitOpenError, get_circuit_breaker, get_hedger, upstream_failure
+from telemetry import ARTICLES_FETCHED, CACHE_REQUESTS, FETCH_ERRORS, FETCH_SECONDS, get_logger
+
+logger = get_logger(__name__)
+
+# Last good articles per request (API key excluded) with the time they were fetched,
+# served while NewsAPI is failing and, under the daily budget, while fresh enough
+_response_cache = OrderedDict()
+_response_lock = threading.Lock()
+
 
 class NewsFetcher:
     """Fetches news articles from NewsAPI"""
     
-    def __init__(self):
+    def __init__(self, base_url: str = None, quota: NewsApiQuota = None):
+        """
+        Args:
+            base_url: NewsAPI-compatible server to use instead of NEWS_API_BASE_URL
+            quota: Daily request budget to fetch within (defaults to the process-wide
+                NewsAPI quota, unless base_url points elsewhere, e.g. at a stand-in)
+        """
         self.api_key = NEWS_API_KEY
-        self.base_url = NEWS_API_BASE_URL
+        self.base_url = (base_url or NEWS_API_BASE_URL).rstrip('/')
+        self.quota = quota or (get_newsapi_quota() if base_url is None else None)
         
     def fetch_news(self, category: str = 'general', keyword: str = None, 
-                   country: str = 'us', page_size: int = 20) -> List[Dict]:
+                   country: str = 'us', page_size: int = 20, page: int = 1,
+                   from_date: str = None, to_date: str = None) -> List[Article]:
         """
         Fetch news articles from NewsAPI
         
@@ -20,10 +44,15 @@ class NewsFetcher:
             keyword: Search keyword (optional)
             country: Country code (default: 'us')
             page_size: Number of articles to fetch (max 100)
+            page: Results page to fetch (default: 1)
+            from_date: Oldest publish date, ISO 8601 (keyword search only)
+            to_date: Newest publish date, ISO 8601 (keyword search only)
             
         Returns:
-            List of news articles
+            List of news articles, parsed straight from the response body
         """
+        endpoint = 'everything' if keyword else 'top-headlines'
+        start = time.perf_counter()
         try:
             if keyword:
                 # Search by keyword
@@ -32,9 +61,14 @@ class NewsFetcher:
                     'q': keyword,
                     'apiKey': self.api_key,
                     'pageSize': page_size,
+                    'page': page,
                     'language': 'en',
                     'sortBy': 'publishedAt'
                 }
+                if from_date:
+                    params['from'] = from_date
+                if to_date:
+                    params['to'] = to_date
             else:
                 # Search by category
                 url = f"{self.base_url}/top-headlines"
@@ -42,27 +76,109 @@ class NewsFetcher:
                     'category': category,
                     'apiKey': self.api_key,
                     'pageSize': page_size,
+                    'page': page,
                     'country': country
                 }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            cache_key = (self.base_url, endpoint,
+                         tuple(sorted((name, value) for name, value in params.items() if name != 'apiKey')))
+            
+            # Within the daily budget, answer from cache unless a request is worth its quota
+            budget_key = demand_key(category, keyword)
+            if self.quota:
+                self.quota.record_demand(budget_key)
+                fetched_at, cached = self._cached(cache_key)
+                decision = self.quota.decide(budget_key, time.time() - fetched_at if cached else None)
+                if decision in (FRESH, STALE):
+                    CACHE_REQUESTS.inc(cache='newsapi', result=decision)
+                    logger.info("Serving cached NewsAPI response", endpoint=endpoint, key=budget_key,
+                                decision=decision, age_s=round(time.time() - fetched_at))
+                    return list(cached)
+                if decision == EXHAUSTED:
+                    FETCH_ERRORS.inc(endpoint=endpoint, reason='quota')
+                    logger.warning("NewsAPI daily budget used up", endpoint=endpoint, key=budget_key)
+                    return []
+            
+            # Fail fast while the endpoint's circuit is open; hedge slow requests
+            breaker = get_circuit_breaker(f"newsapi:{self.base_url}/{endpoint}")
+            hedger = get_hedger(f"newsapi:{self.base_url}/{endpoint}", enabled=NEWSAPI_HEDGING)
+            with breaker.attempt(upstream_failure):
+                response = hedger.call(lambda: self._get(url, params, endpoint, budget_key))
             
-            data = response.json()
+            with span('parse', bytes=len(response.content)):
+                status, articles, message = parse_newsapi_response(response.content)
+            elapsed = time.perf_counter() - start
+            FETCH_SECONDS.observe(elapsed, endpoint=endpoint)
             
-            if data['status'] == 'ok':
-                return data['articles']
+            if status == 'ok':
+                ARTICLES_FETCHED.inc(len(articles), endpoint=endpoint)
+                logger.info("Fetched articles", endpoint=endpoint, category=category, keyword=keyword,
+                            count=len(articles), duration_ms=round(elapsed * 1000, 1))
+                self._remember(cache_key, articles)
+                return articles
             else:
-                print(f"API Error: {data.get('message', 'Unknown error')}")
+                FETCH_ERRORS.inc(endpoint=endpoint, reason='api_error')
+                logger.error("NewsAPI error", endpoint=endpoint, error=message or 'Unknown error')
                 return []
-                
+        
+        except CircuitOpenError:
+            FETCH_ERRORS.inc(endpoint=endpoint, reason='circuit_open')
+            logger.warning("NewsAPI circuit open, not calling", endpoint=endpoint)
+            return self._fallback(cache_key)
         except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            return []
+            FETCH_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            status_code = getattr(e.response, 'status_code', None)
+            if status_code == 429 and self.quota:
+                # NewsAPI answers 429 (rateLimited) once the plan's daily requests are spent
+                self.quota.mark_exhausted()
+            FETCH_ERRORS.inc(endpoint=endpoint, reason=f"http_{status_code}" if status_code else 'request')
+            logger.error("NewsAPI request error", endpoint=endpoint, status_code=status_code,
+                         error=self._redact(str(e)))
+            return self._fallback(cache_key) if upstream_failure(e) else []
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            FETCH_ERRORS.inc(endpoint=endpoint, reason='unexpected')
+            logger.exception("Unexpected NewsAPI error", endpoint=endpoint, error=self._redact(str(e)))
             return []
     
+    def _get(self, url: str, params: Dict, endpoint: str, budget_key: str) -> requests.Response:
+        """One NewsAPI request; HTTP errors raise so the circuit breaker sees them"""
+        if self.quota:
+            self.quota.record_request(budget_key)
+        with span('http_request', endpoint=endpoint) as request_span:
+            response = requests.get(url, params=params, timeout=10)
+            if request_span:
+                request_span.attributes['status_code'] = response.status_code
+        response.raise_for_status()
+        return response
+    
+    def _remember(self, cache_key: Tuple, articles: List[Article]):
+        with _response_lock:
+            _response_cache[cache_key] = (time.time(), articles)
+            _response_cache.move_to_end(cache_key)
+            while len(_response_cache) > NEWSAPI_FALLBACK_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+    
+    def _cached(self, cache_key: Tuple) -> Tuple[float, Optional[List[Article]]]:
+        """When the last good articles for the same request were fetched, and the articles"""
+        with _response_lock:
+            return _response_cache.get(cache_key, (0.0, None))
+    
+    def _fallback(self, cache_key: Tuple) -> List[Article]:
+        """The last good articles for the same request, or none"""
+        articles = self._cached(cache_key)[1]
+        CACHE_REQUESTS.inc(cache='newsapi_fallback', result='hit' if articles else 'miss')
+        if articles:
+            logger.warning("Serving last good NewsAPI response", endpoint=cache_key[1], count=len(articles))
+        return list(articles or [])
+    
+    def _redact(self, message: str) -> str:
+        """Keep the API key (part of request URLs in error messages) out of the logs"""
+        return message.replace(self.api_key, '<redacted>') if self.api_key else message
+    
+    def get_quota_status(self) -> Optional[Dict]:
+        """Today's NewsAPI request budget, remaining quota and projected exhaustion, if metered"""
+        return self.quota.status() if self.quota else None
+    
     def get_available_categories(self) -> Dict[str, str]:
         """Get available news categories"""
         return CATEGORIES
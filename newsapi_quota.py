@@ -0,0 +1,253 @@
+"""
+NewsAPI daily request budget
+
+The free tier allows NEWSAPI_DAILY_REQUEST_BUDGET (100) requests per day. The
+ledger counts every request that goes out, and the demand for each category and
+keyword (every fetch, including ones answered from cache), persisted to a JSON
+file so the count survives restarts. The budget is per API key, so every process
+using the same file (apps, batch_cli.py, insights service, digest refresher)
+counts into it under a file lock (see ledger_file.py).
+
+The scheduler decides per fetch whether to spend a request:
+
+- a cached response younger than the request's freshness need
+  (NEWSAPI_FRESHNESS_SECONDS per category, NEWSAPI_KEYWORD_FRESHNESS_SECONDS for
+  keyword searches) is served as is;
+- a request with no usable cached response is sent while any budget is left;
+- a stale response (up to NEWSAPI_MAX_STALE_SECONDS old) is refreshed only while
+  spending is on pace for the day, NEWSAPI_QUOTA_RESERVE requests are kept back
+  for requests with nothing cached, and the category or keyword is within its
+  share of the budget. Shares are proportional to today's demand times how
+  often the category needs refreshing. Otherwise the stale response is served.
+"""
+
+import copy
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from config import (NEWSAPI_DAILY_REQUEST_BUDGET, NEWSAPI_QUOTA_LEDGER, NEWSAPI_QUOTA_RESERVE,
+                    NEWSAPI_FRESHNESS_SECONDS, NEWSAPI_KEYWORD_FRESHNESS_SECONDS,
+                    NEWSAPI_MAX_STALE_SECONDS)
+from ledger_file import LedgerFile
+from telemetry import NEWSAPI_QUOTA_EXHAUSTION_SECONDS, NEWSAPI_QUOTA_REMAINING, get_logger
+
+logger = get_logger(__name__)
+
+# Days of usage kept in the ledger file
+HISTORY_DAYS = 30
+
+# Refreshes may run ahead of an even spread over the day by this fraction of the budget
+PACE_HEADROOM = 0.1
+
+# Scheduler decisions
+FRESH = 'fresh'
+FETCH = 'fetch'
+STALE = 'stale'
+EXHAUSTED = 'exhausted'
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def demand_key(category: str = None, keyword: str = None) -> str:
+    """Budget key of a fetch: its keyword search, or its category"""
+    return f"keyword:{keyword.strip().lower()}" if keyword else f"category:{category}"
+
+
+class NewsApiQuota:
+    """Per-day record of NewsAPI requests and demand, deciding when a request is worth its quota"""
+
+    def __init__(self, path: Optional[str] = NEWSAPI_QUOTA_LEDGER,
+                 daily_budget: int = NEWSAPI_DAILY_REQUEST_BUDGET,
+                 reserve: int = NEWSAPI_QUOTA_RESERVE,
+                 freshness_seconds: Dict[str, float] = None,
+                 keyword_freshness_seconds: float = NEWSAPI_KEYWORD_FRESHNESS_SECONDS,
+                 max_stale_seconds: float = NEWSAPI_MAX_STALE_SECONDS):
+        """
+        Args:
+            path: JSON file the ledger is kept in (None = memory only)
+            daily_budget: Requests allowed per UTC day (0 = no limit: every fetch is sent)
+            reserve: Requests kept for fetches with nothing cached
+            freshness_seconds: Age after which a category's cached response is stale
+            keyword_freshness_seconds: The same for keyword searches
+            max_stale_seconds: Age after which a cached response is not served at all
+        """
+        self.path = path
+        self.daily_budget = daily_budget
+        self.reserve = reserve
+        self.freshness_seconds = dict(NEWSAPI_FRESHNESS_SECONDS if freshness_seconds is None
+                                      else freshness_seconds)
+        self.keyword_freshness_seconds = keyword_freshness_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._lock = threading.Lock()
+        self._file = LedgerFile(path, 'newsapi_quota') if path else None
+        self._days = (self._file.read() if self._file else None) or {}
+
+    def _refresh(self, force: bool = False):
+        """Pick up other processes' requests from the file (lock held)"""
+        if self._file and (force or self._file.changed()):
+            days = self._file.read()
+            if days is not None:
+                self._days = days
+
+    @contextmanager
+    def _updating(self):
+        """Apply a change to the latest counts on disk and save it, under both locks"""
+        with self._lock, (self._file.locked() if self._file else nullcontext()):
+            self._refresh(force=True)
+            yield
+            self._save()
+
+    def _today(self) -> Dict:
+        """Copy of today's counts, including other processes' (takes the lock)"""
+        with self._lock:
+            self._refresh()
+            day = copy.deepcopy(self._days.get(_now().date().isoformat(), {}))
+        day.setdefault('keys', {})
+        return day
+
+    def _day(self, day: str) -> Dict:
+        return self._days.setdefault(day, {'requests': 0, 'exhausted': False, 'keys': {}})
+
+    def _key(self, day: Dict, key: str) -> Dict:
+        return day['keys'].setdefault(key, {'requests': 0, 'demand': 0})
+
+    def freshness(self, key: str) -> float:
+        """Seconds a cached response for the key is served without refreshing"""
+        if key.startswith('keyword:'):
+            return self.keyword_freshness_seconds
+        return self.freshness_seconds.get(key.split(':', 1)[1], self.keyword_freshness_seconds)
+
+    def record_demand(self, key: str):
+        """Count one fetch for the key, whether or not it costs a request"""
+        with self._updating():
+            self._key(self._day(_now().date().isoformat()), key)['demand'] += 1
+
+    def record_request(self, key: str):
+        """Count one request sent to NewsAPI (hedged duplicates and failures count too)"""
+        with self._updating():
+            day = self._day(_now().date().isoformat())
+            day['requests'] += 1
+            self._key(day, key)['requests'] += 1
+
+    def mark_exhausted(self):
+        """NewsAPI refused a request for quota: treat today's budget as spent"""
+        with self._updating():
+            day = self._day(_now().date().isoformat())
+            if not day['exhausted']:
+                logger.warning("NewsAPI reports the daily quota is used up", requests=day['requests'])
+            day['exhausted'] = True
+
+    def _save(self):
+        for day in sorted(self._days)[:-HISTORY_DAYS]:
+            del self._days[day]
+        if self._file:
+            self._file.write(self._days)
+
+    def _shares(self, day: Dict) -> Dict[str, int]:
+        """Each key's share of the refreshable budget: demand times refreshes needed per hour"""
+        weights = {key: entry['demand'] * 3600 / max(self.freshness(key), 60)
+                   for key, entry in day['keys'].items() if entry['demand']}
+        total = sum(weights.values())
+        budget = max(0, self.daily_budget - self.reserve)
+        return {key: max(1, math.ceil(budget * weight / total)) for key, weight in weights.items()}
+
+    def decide(self, key: str, age_seconds: Optional[float] = None) -> str:
+        """
+        Decide whether a fetch should spend a request
+
+        Args:
+            key: demand_key of the fetch
+            age_seconds: Age of the cached response for the same request (None = nothing cached)
+
+        Returns:
+            FRESH or STALE to serve the cached response, FETCH to send the request,
+            or EXHAUSTED when there is neither budget nor a servable response
+        """
+        if not self.daily_budget:
+            return FETCH
+        servable = age_seconds is not None and age_seconds <= self.max_stale_seconds
+        if servable and age_seconds < self.freshness(key):
+            return FRESH
+
+        now = _now()
+        day = self._today()
+        used = day.get('requests', 0)
+        remaining = 0 if day.get('exhausted') else self.daily_budget - used
+
+        if remaining <= 0:
+            return STALE if servable else EXHAUSTED
+        if not servable:
+            return FETCH
+
+        elapsed = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+        paced = (self.daily_budget - self.reserve) * (elapsed / 86400 + PACE_HEADROOM)
+        key_used = day['keys'].get(key, {}).get('requests', 0)
+        if remaining > self.reserve and used < paced and key_used < self._shares(day).get(key, 1):
+            return FETCH
+        return STALE
+
+    def status(self) -> Dict:
+        """
+        Today's budget, what is left and when it runs out at the current rate
+
+        Returns:
+            Budget, used, remaining, reset time, requests per hour, projected
+            exhaustion time (None if not before the reset) and per-key requests,
+            demand and share
+        """
+        now = _now()
+        day = self._today()
+        used = day.get('requests', 0)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        resets_at = midnight + timedelta(days=1)
+        rate = used / max((now - midnight).total_seconds(), 60)
+
+        remaining = None
+        projected = None
+        if self.daily_budget:
+            remaining = 0 if day.get('exhausted') else max(0, self.daily_budget - used)
+            if remaining == 0:
+                projected = now
+            elif rate > 0 and now + timedelta(seconds=remaining / rate) < resets_at:
+                projected = now + timedelta(seconds=remaining / rate)
+
+        shares = self._shares(day) if self.daily_budget else {}
+        return {
+            'day': midnight.date().isoformat(),
+            'budget': self.daily_budget or None,
+            'used': used,
+            'remaining': remaining,
+            'reserve': self.reserve if self.daily_budget else None,
+            'resets_at': resets_at.isoformat(timespec='seconds'),
+            'requests_per_hour': round(rate * 3600, 1),
+            'projected_exhaustion': projected.isoformat(timespec='seconds') if projected else None,
+            'keys': {key: dict(entry, share=shares.get(key)) for key, entry in sorted(day['keys'].items())}
+        }
+
+
+_quota = None
+_quota_lock = threading.Lock()
+
+
+def get_newsapi_quota() -> NewsApiQuota:
+    """Get the process-wide NewsAPI quota"""
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            _quota = NewsApiQuota()
+            if _quota.daily_budget:
+                NEWSAPI_QUOTA_REMAINING.set_function(lambda: _quota.status()['remaining'])
+                NEWSAPI_QUOTA_EXHAUSTION_SECONDS.set_function(_seconds_to_exhaustion)
+        return _quota
+
+
+def _seconds_to_exhaustion() -> float:
+    projected = _quota.status()['projected_exhaustion']
+    if projected is None:
+        return -1
+    return max(0.0, datetime.fromisoformat(projected).timestamp() - time.time())
@@ -0,0 +1,345 @@
+"""
+Opt-in profiling of insight runs
+
+With profiling on (PROFILING=true, or NewsAgent(profiling=True)), each
+get_news_insights/process_articles run records a span tree: fetch, then one
+span per article with its clean, summarize, sentiment and inference steps, and
+the pauses between articles. Optionally the run is also sampled with cProfile
+or pyinstrument (PROFILER). Finished profiles are kept in memory by
+correlation ID (the job ID for dashboard fetches), can be exported as Chrome
+trace JSON for Perfetto, chrome://tracing or speedscope, and are written to
+PROFILE_DIR when it is set.
+
+Spans cost one context-variable lookup when no profile is active, so the
+instrumentation stays in place in production.
+"""
+
+import contextvars
+import functools
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from config import PROFILER, PROFILE_DIR, PROFILE_HISTORY
+from telemetry import current_correlation_id, get_logger, new_correlation_id
+
+logger = get_logger(__name__)
+
+# Span that new spans attach to; None when no profile is being recorded
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# cProfile and pyinstrument can't sample two runs at once in one process
+_profiler_lock = threading.Lock()
+
+
+class Span:
+    """One timed step of a run, with attributes and child steps"""
+
+    __slots__ = ('name', 'attributes', 'start', 'end', 'children', 'thread_id')
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.thread_id = threading.get_ident()
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    @property
+    def self_ms(self) -> float:
+        """Time not covered by child spans"""
+        return max(0.0, self.duration_ms - sum(child.duration_ms for child in self.children))
+
+    def walk(self):
+        """This span and all its descendants, depth first"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin: float = None) -> Dict:
+        origin = self.start if origin is None else origin
+        return {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'children': [child.to_dict(origin) for child in self.children]
+        }
+
+
+class Profile:
+    """Span tree of one run, plus the sampling profiler's output if one was used"""
+
+    def __init__(self, name: str, correlation_id: str = None, **attributes):
+        self.id = correlation_id or new_correlation_id()
+        self.root = Span(name, **attributes)
+        self.created_at = time.time()
+        self.profiler = None
+        self.profiler_report = None
+        self.files = {}
+
+    @property
+    def finished(self) -> bool:
+        return self.root.end is not None
+
+    def breakdown(self) -> Dict[str, Dict]:
+        """
+        Time per step name across the run
+
+        Returns:
+            Mapping of span name to call count, total (inclusive) ms and self ms
+        """
+        steps = {}
+        for span in self.root.walk():
+            if span is self.root:
+                continue
+            step = steps.setdefault(span.name, {'count': 0, 'total_ms': 0.0, 'self_ms': 0.0})
+            step['count'] += 1
+            step['total_ms'] += span.duration_ms
+            step['self_ms'] += span.self_ms
+        return {name: {key: round(value, 1) if key != 'count' else value for key, value in step.items()}
+                for name, step in sorted(steps.items(), key=lambda item: -item[1]['total_ms'])}
+
+    def articles(self) -> List[Dict]:
+        """One row per article span: title, total ms and ms per child step"""
+        rows = []
+        for span in self.root.walk():
+            if span.name != 'article':
+                continue
+            row = {'index': span.attributes.get('index'), 'title': span.attributes.get('title'),
+                   'total_ms': round(span.duration_ms, 1)}
+            for child in span.walk():
+                if child is not span:
+                    row[child.name] = round(row.get(child.name, 0.0) + child.duration_ms, 1)
+            rows.append(row)
+        return rows
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'created_at': self.created_at,
+            'duration_ms': round(self.root.duration_ms, 1),
+            'breakdown': self.breakdown(),
+            'spans': self.root.to_dict(),
+            'profiler': self.profiler,
+            'profiler_report': self.profiler_report
+        }
+
+    def to_chrome_trace(self) -> Dict:
+        """Trace Event Format ("X" complete events) for Perfetto, chrome://tracing or speedscope"""
+        origin = self.root.start
+        pid = os.getpid()
+        events = [{
+            'name': span.name,
+            'cat': 'news_insights',
+            'ph': 'X',
+            'ts': round((span.start - origin) * 1e6, 1),
+            'dur': round(span.duration_ms * 1000, 1),
+            'pid': pid,
+            'tid': span.thread_id,
+            'args': {key: value for key, value in span.attributes.items() if value is not None}
+        } for span in self.root.walk()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'profile_id': self.id, 'name': self.root.name}}
+
+    def save(self, directory: str = PROFILE_DIR) -> Dict[str, str]:
+        """Write the Chrome trace to directory; returns the files written so far by kind"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.root.name}-{self.id}")
+        with open(f"{base}.trace.json", 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        self.files['trace'] = f"{base}.trace.json"
+        return self.files
+
+
+class ProfileStore:
+    """The most recent finished profiles, by ID"""
+
+    def __init__(self, max_profiles: int = PROFILE_HISTORY):
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            self._profiles.move_to_end(profile.id)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def latest(self) -> Optional[Profile]:
+        with self._lock:
+            return next(reversed(self._profiles.values()), None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    """Get the process-wide store of recent profiles"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore()
+        return _store
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record the block as a child of the current span
+
+    Yields:
+        The new Span (attributes can be added to it), or None when no profile is active
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, **attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+class _Sampler:
+    """Wraps cProfile or pyinstrument behind start/stop/report/dump"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            from pyinstrument import Profiler
+            self.profiler = Profiler()
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.kind == 'pyinstrument':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.kind == 'pyinstrument':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def report(self, limit: int = 30) -> str:
+        if self.kind == 'pyinstrument':
+            return self.profiler.output_text(unicode=True)
+        import pstats
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def dump(self, base: str) -> str:
+        if self.kind == 'pyinstrument':
+            path = f"{base}.html"
+            with open(path, 'w') as f:
+                f.write(self.profiler.output_html())
+        else:
+            # Open with snakeviz, or pstats / gprof2dot for flame graphs
+            path = f"{base}.prof"
+            self.profiler.dump_stats(path)
+        return path
+
+
+def _start_sampler(kind: str) -> Optional[_Sampler]:
+    if kind not in ('cprofile', 'pyinstrument'):
+        return None
+    if not _profiler_lock.acquire(blocking=False):
+        logger.info("Another run is being sampled; recording spans only", profiler=kind)
+        return None
+    try:
+        sampler = _Sampler(kind)
+        sampler.start()
+        return sampler
+    except Exception as e:
+        _profiler_lock.release()
+        logger.warning("Could not start profiler; recording spans only", profiler=kind, error=str(e))
+        return None
+
+
+@contextmanager
+def profile_run(name: str, profiler: str = PROFILER, **attributes):
+    """
+    Record a profile of the block, or just a span if a profile is already being recorded
+
+    Args:
+        name: Name of the run (the root span)
+        profiler: 'cprofile', 'pyinstrument' or 'none' for spans only
+        **attributes: Attributes of the root span, e.g. category and keyword
+
+    Yields:
+        The Profile being recorded (None when nested in another profile)
+    """
+    if _current_span.get() is not None:
+        with span(name, **attributes):
+            yield None
+        return
+
+    profile = Profile(name, current_correlation_id(), **attributes)
+    token = _current_span.set(profile.root)
+    sampler = _start_sampler(profiler)
+    try:
+        yield profile
+    finally:
+        profile.root.finish()
+        _current_span.reset(token)
+        if sampler:
+            sampler.stop()
+            _profiler_lock.release()
+            profile.profiler = sampler.kind
+            profile.profiler_report = sampler.report()
+
+        get_profile_store().add(profile)
+        if PROFILE_DIR:
+            try:
+                profile.save(PROFILE_DIR)
+                if sampler:
+                    profile.files[sampler.kind] = sampler.dump(
+                        os.path.join(PROFILE_DIR, f"{name}-{profile.id}"))
+            except OSError as e:
+                logger.warning("Could not write profile", directory=PROFILE_DIR, error=str(e))
+        logger.info("Recorded profile", profile_id=profile.id, name=name,
+                    duration_ms=round(profile.root.duration_ms, 1), files=profile.files or None)
+
+
+def profiled(name: str) -> Callable:
+    """
+    Method decorator: profile the call when the instance's `profiling` flag is set
+
+    Without the flag the call is still recorded as a span if an enclosing
+    profile is active.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            recorder = profile_run(name) if getattr(self, 'profiling', False) else span(name)
+            with recorder:
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
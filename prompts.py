@@ -0,0 +1,29 @@
+"""
+Gemini prompt templates
+
+Every prompt token is billed on every call, so templates are kept short: no
+indentation, each instruction stated once, and the article text last.
+"""
+
+import re
+
+SUMMARY_PROMPT = "Summarize this news article in 2-3 complete sentences.\n\n{article}"
+
+SENTIMENT_PROMPT = (
+    "Classify the sentiment of this news article. "
+    "POSITIVE: good news, progress, success. "
+    "NEGATIVE: problems, failures, crises, conflicts. "
+    "NEUTRAL: factual updates without a clear tone. "
+    "Answer with one word.\n\n{article}"
+)
+
+
+def compact(text: str) -> str:
+    """Strip indentation and trailing spaces and collapse runs of blank lines"""
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+
+
+def render(template: str, **values) -> str:
+    """Fill a template and compact the result"""
+    return compact(template.format(**values))
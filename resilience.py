@@ -0,0 +1,289 @@
+"""
+Hedged requests and circuit breakers for upstream APIs
+
+A Hedger duplicates a call that is still running after the endpoint's recent
+p95 latency and returns whichever attempt answers first, so one slow response
+doesn't stall the sequential article loop. Duplicates are paid for from a
+budget that grows by HEDGE_MAX_RATIO per call, capping the extra load.
+
+A CircuitBreaker counts consecutive upstream failures per endpoint. Once
+open it rejects calls immediately with CircuitOpenError, so callers fall back
+to cached articles or simple processing instead of waiting out a timeout for
+every article; after CIRCUIT_RESET_SECONDS a single trial call decides
+whether it closes again.
+
+Both are shared per endpoint across the process through get_hedger and
+get_circuit_breaker.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from config import (HEDGE_MAX_RATIO, HEDGE_MIN_DELAY_MS, HEDGE_MIN_SAMPLES, HEDGE_WORKERS,
+                    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+from telemetry import (CIRCUIT_REJECTIONS, CIRCUIT_STATE, HEDGED_REQUESTS, get_logger,
+                       in_current_context)
+
+logger = get_logger(__name__)
+
+# Most hedged calls a budget can save up, so a quiet period can't fund a burst of duplicates
+MAX_HEDGE_BUDGET = 10
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return _executor
+
+
+class Hedger:
+    """Sends a duplicate of calls slower than the endpoint's recent p95, within a budget"""
+
+    def __init__(self, name: str, enabled: bool = True, max_ratio: float = HEDGE_MAX_RATIO,
+                 min_delay_ms: float = HEDGE_MIN_DELAY_MS, min_samples: int = HEDGE_MIN_SAMPLES,
+                 window: int = 200):
+        """
+        Args:
+            name: Endpoint name, used in metrics
+            enabled: Run calls directly, without hedging, when False
+            max_ratio: Budget added per call; one hedge spends 1
+            min_delay_ms: Never hedge sooner than this
+            min_samples: Timed calls needed before the p95 is trusted
+            window: Number of recent call latencies kept
+        """
+        self.name = name
+        self.enabled = enabled
+        self.max_ratio = max_ratio
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._budget = 0.0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the first attempt before hedging, or None while too few calls are timed"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return max(p95, self.min_delay_ms / 1000)
+
+    def _spend_budget(self) -> bool:
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def _timed(self, function: Callable):
+        start = time.perf_counter()
+        result = function()
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def call(self, function: Callable):
+        """
+        Call function, hedging with a second call if the first is slow
+
+        Args:
+            function: The request; must be safe to run twice concurrently
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            The last attempt's exception if every attempt fails
+        """
+        if not self.enabled:
+            return function()
+
+        with self._lock:
+            self._budget = min(MAX_HEDGE_BUDGET, self._budget + self.max_ratio)
+
+        # Attempts run on the hedge pool, keeping the caller's correlation ID and spans
+        executor = _get_executor()
+        primary = executor.submit(in_current_context(self._timed), function)
+        delay = self.hedge_delay()
+        if delay is None or wait([primary], timeout=delay).done or not self._spend_budget():
+            return primary.result()
+
+        HEDGED_REQUESTS.inc(upstream=self.name, outcome='launched')
+        logger.info("Hedging slow call", upstream=self.name, after_ms=round(delay * 1000, 1))
+        hedge = executor.submit(in_current_context(self._timed), function)
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        HEDGED_REQUESTS.inc(upstream=self.name, outcome='won')
+                    # The slower attempt finishes in the background; its result is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures, probing again after a cool-down"""
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        CIRCUIT_STATE.set_function(lambda: {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state],
+                                   circuit=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the single trial call when half-open)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit closed", circuit=self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit opened", circuit=self.name, failures=self._failures,
+                                   reset_seconds=self.reset_seconds)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def attempt(self, is_failure: Callable[[Exception], bool] = None):
+        """
+        Guard a call made inside the block
+
+        Args:
+            is_failure: Whether an exception means the upstream is unhealthy
+                (default: every exception); other exceptions count as a success
+
+        Raises:
+            CircuitOpenError: Without running the block, while the circuit is open
+        """
+        if not self.allow():
+            CIRCUIT_REJECTIONS.inc(circuit=self.name)
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            yield
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Interrupted (e.g. a generator closed early): release a trial without judging the upstream
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        self.record_success()
+
+    def call(self, function: Callable, is_failure: Callable[[Exception], bool] = None):
+        """Run function through the breaker (see attempt)"""
+        with self.attempt(is_failure):
+            return function()
+
+
+def upstream_failure(error: Exception) -> bool:
+    """
+    Whether an exception says the upstream is unhealthy rather than the request being wrong
+
+    HTTP 5xx and 429 count (google.api_core's ServiceUnavailable and DeadlineExceeded
+    carry 503/504); other 4xx (bad key, bad parameters) do not. Without a status only
+    transport errors count: connection errors and timeouts, which are all OSErrors
+    (requests' ConnectionError and Timeout included). Anything else, such as the
+    ValueError of a safety-blocked or empty Gemini response, concerns that request
+    and must not open the circuit for everyone.
+    """
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None:
+        # google.api_core errors carry the HTTP status as `code`
+        code = getattr(error, 'code', None)
+        status = code if isinstance(code, int) else None
+    if status is not None:
+        return status >= 500 or status == 429
+
+    # google.api_core's RetryError wraps the last error of the retried call
+    cause = getattr(error, 'cause', None)
+    if isinstance(cause, BaseException):
+        return upstream_failure(cause)
+    return isinstance(error, OSError)
+
+
+_registry_lock = threading.Lock()
+_hedgers: Dict[str, Hedger] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_hedger(name: str, enabled: bool = True) -> Hedger:
+    """Get the process-wide hedger for an endpoint"""
+    with _registry_lock:
+        if name not in _hedgers:
+            _hedgers[name] = Hedger(name, enabled=enabled)
+        return _hedgers[name]
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for an endpoint"""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def circuit_states() -> Dict[str, str]:
+    """State of every circuit breaker in the process"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Local stand-in servers for NewsAPI and Gemini
+
+Serve NewsAPI's /top-headlines and /everything and Gemini's REST generateContent
+and streamGenerateContent endpoints from recorded responses (or synthesized ones
+when nothing is recorded), with configurable latency, error rate and 429
+throttling. Point the app at them with NEWS_API_BASE_URL and GEMINI_API_ENDPOINT
+to benchmark, load-test and exercise failure handling without quotas or network.
+
+With --record, requests are forwarded to the real APIs (using the caller's API
+keys) and the responses are saved for later replay.
+
+Usage:
+    python standin_servers.py --latency-ms 150 --error-rate 0.02 --rate-limit 60
+    NEWS_API_BASE_URL=http://127.0.0.1:8701 GEMINI_API_ENDPOINT=http://127.0.0.1:8702 \\
+        streamlit run app_gemini.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from config import DECODING_PROFILE_EVAL_SET
+from prompts import SENTIMENT_PROMPT
+
+DEFAULT_RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_data', 'recordings')
+NEWSAPI_UPSTREAM = 'https://newsapi.org/v2'
+GEMINI_UPSTREAM = 'https://generativelanguage.googleapis.com'
+
+POSITIVE_WORDS = {'approves', 'gains', 'growth', 'record', 'success', 'improves', 'wins', 'rise', 'new'}
+NEGATIVE_WORDS = {'loss', 'falls', 'crisis', 'fails', 'concerns', 'cuts', 'delay', 'down', 'warns'}
+
+
+class FaultProfile:
+    """Latency distribution, error rate and throttling applied to every request"""
+
+    def __init__(self, latency_ms: float = 0, latency_jitter_ms: float = 0,
+                 latency_distribution: str = 'fixed', error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, rate_limit_per_minute: int = 0, seed: int = None):
+        """
+        Args:
+            latency_ms: Typical (median) added latency per request
+            latency_jitter_ms: Spread: half-width for 'uniform', standard deviation for
+                'normal', and the ~84th percentile offset for 'lognormal'
+            latency_distribution: fixed, uniform, normal or lognormal
+            error_rate: Fraction of requests answered with a 500
+            throttle_rate: Fraction of requests answered with a 429 regardless of rate
+            rate_limit_per_minute: Requests per rolling minute before 429s (0 = unlimited)
+            seed: Random seed for reproducible runs
+        """
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit_per_minute = rate_limit_per_minute
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def sample_latency(self) -> float:
+        """Latency for one request in seconds"""
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                ms = self._random.uniform(self.latency_ms - self.latency_jitter_ms,
+                                          self.latency_ms + self.latency_jitter_ms)
+            elif self.latency_distribution == 'normal':
+                ms = self._random.gauss(self.latency_ms, self.latency_jitter_ms)
+            elif self.latency_distribution == 'lognormal' and self.latency_ms > 0:
+                sigma = math.log1p(self.latency_jitter_ms / self.latency_ms)
+                ms = self._random.lognormvariate(math.log(self.latency_ms), sigma)
+            else:
+                ms = self.latency_ms
+        return max(0.0, ms) / 1000
+
+    def fault(self) -> Optional[Tuple[int, float]]:
+        """
+        Decide whether this request fails
+
+        Returns:
+            None to serve normally, or (status, retry-after seconds) for a 429/500
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.rate_limit_per_minute:
+                while self._recent and now - self._recent[0] > 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit_per_minute:
+                    return 429, 60 - (now - self._recent[0])
+                self._recent.append(now)
+            if self._random.random() < self.throttle_rate:
+                return 429, 1.0
+            if self._random.random() < self.error_rate:
+                return 500, 0.0
+        return None
+
+
+class Recordings:
+    """Recorded response bodies on disk, one JSON file per request key"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, service: str, key: str) -> str:
+        return os.path.join(self.directory, service, f"{key}.json")
+
+    def load(self, service: str, key: str) -> Optional[bytes]:
+        path = self._path(service, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def save(self, service: str, key: str, body: bytes):
+        path = self._path(service, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+
+
+def synthetic_articles(count: int) -> List[Dict]:
+    """NewsAPI-shaped articles built from the evaluation set"""
+    with open(DECODING_PROFILE_EVAL_SET) as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+
+    articles = []
+    for i in range(count):
+        example = examples[i % len(examples)]
+        body = f"{example['description']} {example['reference']}"
+        articles.append({
+            'source': {'id': None, 'name': f"Source {i % 7}"},
+            'author': f"Reporter {i % 11}",
+            'title': f"{example['title']} ({i})",
+            'description': example['description'],
+            'url': f"https://example.com/news/{i}",
+            'urlToImage': f"https://example.com/images/{i}.jpg",
+            'publishedAt': f"2024-05-{1 + i % 28:02d}T12:00:00Z",
+            'content': f"{body[:200]}… [+{len(body) * 8} chars]"
+        })
+    return articles
+
+
+def synthetic_payload(count: int) -> bytes:
+    """A NewsAPI top-headlines response body with `count` synthetic articles"""
+    articles = synthetic_articles(count)
+    return json.dumps({'status': 'ok', 'totalResults': len(articles), 'articles': articles}).encode('utf-8')
+
+
+def synthetic_generation(prompt: str) -> str:
+    """Plausible model output for one of our prompts: a sentiment word or a lead summary"""
+    article = prompt.rsplit('\n\n', 1)[-1]
+    if prompt.startswith(SENTIMENT_PROMPT.split('{article}')[0]):
+        words = set(article.lower().split())
+        positive, negative = len(words & POSITIVE_WORDS), len(words & NEGATIVE_WORDS)
+        return 'POSITIVE' if positive > negative else 'NEGATIVE' if negative > positive else 'NEUTRAL'
+    sentences = re.split(r'(?<=[.!?])\s+', article.strip())
+    return ' '.join(sentences[:2])
+
+
+def gemini_response(text: str, prompt: str) -> Dict:
+    """generateContent response body for the given output text"""
+    prompt_tokens = len(prompt) // 4 + 1
+    output_tokens = len(text) // 4 + 1
+    return {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'},
+                        'finishReason': 'STOP', 'index': 0}],
+        'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': output_tokens,
+                          'totalTokenCount': prompt_tokens + output_tokens}
+    }
+
+
+class StandInServer(ThreadingHTTPServer):
+    """HTTP server carrying the stand-in's settings and request counts"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, faults: FaultProfile = None, recordings_dir: str = None,
+                 record: bool = False, payload: bytes = None, stream_chunk_delay_ms: float = 0):
+        super().__init__(address, handler)
+        self.faults = faults or FaultProfile()
+        self.recordings = Recordings(recordings_dir or DEFAULT_RECORDINGS_DIR)
+        self.record = record
+        self.payload = payload
+        self.stream_chunk_delay_ms = stream_chunk_delay_ms
+        self.status_counts = Counter()
+        self._counts_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, status: int):
+        with self._counts_lock:
+            self.status_counts[status] += 1
+
+    def stats(self) -> Dict:
+        with self._counts_lock:
+            return {'requests': sum(self.status_counts.values()),
+                    'status_counts': {str(status): count for status, count in self.status_counts.items()}}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Shared plumbing: injected faults, JSON responses and the stats endpoint"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, headers: Dict[str, str] = None):
+        self.server.count(status)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload, headers: Dict[str, str] = None):
+        self._send(status, json.dumps(payload).encode('utf-8'), headers)
+
+    def _inject_faults(self) -> bool:
+        """Sleep for the sampled latency; answer with an error and return True if one is due"""
+        time.sleep(self.server.faults.sample_latency())
+        fault = self.server.faults.fault()
+        if fault is None:
+            return False
+
+        status, retry_after = fault
+        headers = {'Retry-After': str(max(1, math.ceil(retry_after)))} if status == 429 else None
+        self._send_json(status, self.error_body(status), headers)
+        return True
+
+    def _stats_requested(self) -> bool:
+        if urlparse(self.path).path == '/__standin/stats':
+            self._send_json(200, self.server.stats())
+            return True
+        return False
+
+    def error_body(self, status: int) -> Dict:
+        """JSON body of an injected error; subclasses return their API's error format"""
+        return {'error': {'code': status, 'message': "Stand-in injected error."}}
+
+
+class NewsAPIHandler(StandInHandler):
+    """NewsAPI /top-headlines and /everything"""
+
+    def error_body(self, status: int) -> Dict:
+        if status == 429:
+            return {'status': 'error', 'code': 'rateLimited',
+                    'message': "You have made too many requests recently (stand-in)."}
+        return {'status': 'error', 'code': 'unexpectedError', 'message': "Stand-in injected error."}
+
+    def do_GET(self):
+        if self._stats_requested():
+            return
+
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint not in ('top-headlines', 'everything'):
+            self._send_json(404, {'status': 'error', 'code': 'notFound', 'message': f"Unknown path {url.path}"})
+            return
+
+        if self._inject_faults():
+            return
+
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        page_size = int(params.get('pageSize', 20))
+        subject = params.get('q') if endpoint == 'everything' else params.get('category', 'general')
+        key = f"{endpoint}_{re.sub(r'[^a-z0-9]+', '-', (subject or 'all').lower()).strip('-')}"
+
+        body = self.server.recordings.load('newsapi', key)
+        if body is None and self.server.record:
+            body = self._record(url, key)
+            if body is None:
+                return
+        if body is None:
+            body = self.server.payload or synthetic_payload(page_size)
+
+        data = json.loads(body)
+        if data.get('status') == 'ok':
+            data['articles'] = data.get('articles', [])[:page_size]
+        self._send_json(200, data)
+
+    def _record(self, url, key: str) -> Optional[bytes]:
+        import requests
+
+        response = requests.get(f"{NEWSAPI_UPSTREAM}/{key.split('_', 1)[0]}?{url.query}", timeout=15)
+        if response.status_code != 200:
+            self._send(response.status_code, response.content)
+            return None
+        self.server.recordings.save('newsapi', key, response.content)
+        return response.content
+
+
+class GeminiHandler(StandInHandler):
+    """Gemini REST models/*:generateContent and :streamGenerateContent"""
+
+    def error_body(self, status: int) -> Dict:
+        if status == 429:
+            return {'error': {'code': 429, 'message': "Resource has been exhausted (stand-in).",
+                              'status': 'RESOURCE_EXHAUSTED'}}
+        return {'error': {'code': 500, 'message': "Stand-in injected error.", 'status': 'INTERNAL'}}
+
+    def do_GET(self):
+        if not self._stats_requested():
+            self._send_json(404, self.error_body(404))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        method = url.path.rsplit(':', 1)[-1]
+        if method not in ('generateContent', 'streamGenerateContent'):
+            self._send_json(404, {'error': {'code': 404, 'message': f"Unknown path {url.path}",
+                                            'status': 'NOT_FOUND'}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = self.rfile.read(length)
+        if self._inject_faults():
+            return
+
+        request = json.loads(request_body or b'{}')
+        prompt = ''.join(part.get('text', '') for content in request.get('contents', [])
+                         for part in content.get('parts', []))
+        key = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:16]
+
+        body = self.server.recordings.load('gemini', key)
+        if body is None and self.server.record:
+            body = self._record(url, request_body, key)
+            if body is None:
+                return
+        response = json.loads(body) if body else gemini_response(synthetic_generation(prompt), prompt)
+
+        if method == 'generateContent':
+            self._send_json(200, response)
+        else:
+            self._stream(response)
+
+    def _stream(self, response: Dict):
+        """Send the response as a JSON array of partial responses, a few words each"""
+        parts = response['candidates'][0]['content']['parts']
+        text = ''.join(part.get('text', '') for part in parts)
+        words = re.findall(r'\S+\s*', text) or ['']
+        pieces = [''.join(words[i:i + 4]) for i in range(0, len(words), 4)]
+
+        self.server.count(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'[')
+        for i, piece in enumerate(pieces):
+            chunk = {'candidates': [{'content': {'parts': [{'text': piece}], 'role': 'model'}, 'index': 0}]}
+            if i == len(pieces) - 1:
+                chunk['candidates'][0]['finishReason'] = 'STOP'
+                chunk['usageMetadata'] = response.get('usageMetadata', {})
+            self.wfile.write((',\r\n' if i else '').encode('utf-8') + json.dumps(chunk).encode('utf-8'))
+            self.wfile.flush()
+            if i < len(pieces) - 1:
+                time.sleep(self.server.stream_chunk_delay_ms / 1000)
+        self.wfile.write(b']')
+        self.close_connection = True
+
+    def _record(self, url, request_body: bytes, key: str) -> Optional[bytes]:
+        import requests
+
+        # Always record the complete response; streams are replayed from it
+        path = url.path.replace(':streamGenerateContent', ':generateContent')
+        query = {name: values[0] for name, values in parse_qs(url.query).items() if name != 'alt'}
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() in ('x-goog-api-key', 'content-type')}
+        response = requests.post(f"{GEMINI_UPSTREAM}{path}?{urlencode(query)}", data=request_body,
+                                 headers=headers, timeout=60)
+        if response.status_code != 200:
+            self._send(response.status_code, response.content)
+            return None
+        self.server.recordings.save('gemini', key, response.content)
+        return response.content
+
+
+def start_server(handler, host: str = '127.0.0.1', port: int = 0, **options) -> StandInServer:
+    """
+    Start a stand-in server in a background thread
+
+    Args:
+        handler: NewsAPIHandler or GeminiHandler
+        host: Interface to bind
+        port: Port to bind (0 = any free port; see server.url)
+        **options: StandInServer options (faults, recordings_dir, record, payload, stream_chunk_delay_ms)
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = StandInServer((host, port), handler, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_newsapi_standin(**options) -> StandInServer:
+    return start_server(NewsAPIHandler, **options)
+
+
+def start_gemini_standin(**options) -> StandInServer:
+    return start_server(GeminiHandler, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in NewsAPI and Gemini servers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--newsapi-port', type=int, default=8701)
+    parser.add_argument('--gemini-port', type=int, default=8702)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Median added latency per request")
+    parser.add_argument('--latency-jitter-ms', type=float, default=0, help="Latency spread")
+    parser.add_argument('--latency-distribution', choices=['fixed', 'uniform', 'normal', 'lognormal'],
+                        default='fixed')
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument('--rate-limit', type=int, default=0, help="Requests per minute before 429 (0 = none)")
+    parser.add_argument('--stream-chunk-delay-ms', type=float, default=50, help="Delay between streamed chunks")
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS_DIR, help="Recorded responses directory")
+    parser.add_argument('--record', action='store_true', help="Forward unrecorded requests upstream and save them")
+    parser.add_argument('--seed', type=int, help="Random seed for latency and faults")
+    args = parser.parse_args()
+
+    def faults():
+        # Separate profiles so each API has its own rate limit window
+        return FaultProfile(args.latency_ms, args.latency_jitter_ms, args.latency_distribution,
+                            args.error_rate, args.throttle_rate, args.rate_limit, args.seed)
+
+    options = {'host': args.host, 'recordings_dir': args.recordings, 'record': args.record}
+    newsapi = start_newsapi_standin(port=args.newsapi_port, faults=faults(), **options)
+    gemini = start_gemini_standin(port=args.gemini_port, faults=faults(),
+                                  stream_chunk_delay_ms=args.stream_chunk_delay_ms, **options)
+
+    print(f"NewsAPI stand-in: NEWS_API_BASE_URL={newsapi.url}")
+    print(f"Gemini stand-in:  GEMINI_API_ENDPOINT={gemini.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        newsapi.shutdown()
+        gemini.shutdown()
+
+
+if __name__ == "__main__":
+    main()
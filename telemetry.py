@@ -0,0 +1,479 @@
+"""
+Metrics and structured logging
+
+Counters, gauges and histograms are kept in one process-wide registry and
+rendered in the Prometheus text format, served at /metrics by the insights
+service or by a standalone server on METRICS_PORT. Logs are plain text lines
+(or JSON with LOG_FORMAT=json) carrying the correlation ID of the run they
+belong to, so every line of one fetch/process run can be grepped together.
+
+Usage:
+    from telemetry import FETCH_SECONDS, get_logger
+
+    logger = get_logger(__name__)
+    with FETCH_SECONDS.time(endpoint='top-headlines'):
+        ...
+    logger.info("Fetched articles", count=20)
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import math
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from config import LOG_FORMAT, LOG_LEVEL, METRICS_HOST, METRICS_PORT
+
+# Latency buckets in seconds, from cache hits up to slow Gemini calls and model loads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Metric:
+    """A named metric with one series per combination of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple, float]]:
+        """(sample name, labels, value) for every series"""
+        with self._lock:
+            series = list(self._series.items())
+        for labels, value in series:
+            yield self.name, labels, value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count, e.g. requests or errors"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. a queue depth; may be read from a callback"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels):
+        """Read this series from function at scrape time (replaces any earlier function)"""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        return next((value for _, series, value in self.samples() if series == key), 0)
+
+    def samples(self):
+        yield from super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for labels, function in functions:
+            try:
+                yield self.name, labels, function()
+            except Exception:
+                # A failing callback must not break the whole scrape
+                continue
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets, plus their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series['count'] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, dict(values, buckets=list(values['buckets'])))
+                      for labels, values in self._series.items()]
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values['buckets']):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (('le', _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, values['sum']
+            yield f"{self.name}_count", labels, values['count']
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered together for a scrape"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, or return the one already registered under its name"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Optional[Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Metrics recorded across the app
+FETCH_SECONDS = histogram('news_fetch_seconds', "NewsAPI request latency", ['endpoint'])
+FETCH_ERRORS = counter('news_api_errors_total', "Failed NewsAPI requests", ['endpoint', 'reason'])
+ARTICLES_FETCHED = counter('news_articles_fetched_total', "Articles returned by NewsAPI", ['endpoint'])
+CACHE_REQUESTS = counter('cache_requests_total', "Cache lookups by result (hit, shared, miss)",
+                         ['cache', 'result'])
+INFERENCE_SECONDS = histogram('inference_seconds', "Model call latency", ['task', 'model'])
+INFERENCE_ERRORS = counter('inference_errors_total', "Failed model calls", ['task', 'model'])
+BATCH_SIZE = histogram('inference_batch_size', "Inputs per batched model call", ['batcher'],
+                       buckets=BATCH_SIZE_BUCKETS)
+QUEUE_DEPTH = gauge('queue_depth', "Work waiting to be processed", ['queue'])
+RATE_LIMIT_WAIT_SECONDS = histogram('rate_limiter_wait_seconds', "Time spent waiting on API rate limits",
+                                    ['api'])
+ARTICLES_PROCESSED = counter('articles_processed_total', "Articles processed by outcome",
+                             ['backend', 'outcome'])
+GEMINI_TOKENS = counter('gemini_tokens_total', "Gemini tokens by call type and direction",
+                        ['call', 'direction'])
+HEDGED_REQUESTS = counter('hedged_requests_total', "Duplicate requests sent for slow calls, and how many won",
+                          ['upstream', 'outcome'])
+CIRCUIT_STATE = gauge('circuit_state', "Circuit breaker state (0 closed, 1 half-open, 2 open)", ['circuit'])
+CIRCUIT_REJECTIONS = counter('circuit_rejections_total', "Calls failed fast by an open circuit", ['circuit'])
+NEWSAPI_QUOTA_REMAINING = gauge('newsapi_quota_remaining', "NewsAPI requests left in today's budget")
+NEWSAPI_QUOTA_EXHAUSTION_SECONDS = gauge(
+    'newsapi_quota_projected_exhaustion_seconds',
+    "Seconds until today's NewsAPI budget runs out at the current rate (-1 = not before the reset)")
+DIGEST_REFRESHES = counter('digest_refreshes_total', "Category digest refreshes by outcome (ok, kept, error)",
+                           ['backend', 'category', 'outcome'])
+ENRICHED_PAGES = counter('enriched_pages_total', "Article pages downloaded for full text, by outcome",
+                         ['outcome'])
+ENRICH_SECONDS = histogram('enrich_page_seconds', "Article page download latency")
+DIGEST_AGE_SECONDS = gauge('digest_age_seconds', "Time since a category digest was refreshed",
+                           ['backend', 'category'])
+
+
+def render_metrics() -> str:
+    """The process's metrics in the Prometheus text format"""
+    return REGISTRY.render()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the logs
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from a background thread, once per process
+
+    Args:
+        port: Port to listen on (0 = don't start a server)
+        host: Interface to bind
+
+    Returns:
+        The running server, or None when disabled or the port is taken
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None and port:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            except OSError as e:
+                get_logger(__name__).warning("Could not start metrics server", port=port, error=str(e))
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            get_logger(__name__).info("Serving metrics", url=f"http://{host}:{port}/metrics")
+        return _metrics_server
+
+
+# Correlation IDs tie together every log line of one run, across the threads it uses
+_correlation_id = contextvars.ContextVar('correlation_id', default=None)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_correlation_id() -> Optional[str]:
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation_scope(correlation_id: str = None):
+    """
+    Run the block under a correlation ID
+
+    Args:
+        correlation_id: ID to use; defaults to the enclosing scope's ID, or a new one
+
+    Yields:
+        The correlation ID in effect
+    """
+    correlation_id = correlation_id or current_correlation_id() or new_correlation_id()
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        _correlation_id.reset(token)
+
+
+def correlated(function: Callable) -> Callable:
+    """Decorator running each call in a correlation scope (a new ID unless one is already set)"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with correlation_scope():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def in_current_context(function: Callable) -> Callable:
+    """
+    Wrap function to run in the caller's context (and so its correlation ID)
+
+    Thread pools don't carry context variables over to their workers; wrap a
+    function before submitting it so its log lines keep the run's ID.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+
+    return run
+
+
+class _CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = current_correlation_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation ID and fields"""
+
+    def format(self, record) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'correlation_id': getattr(record, 'correlation_id', None)
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record) -> str:
+        fields = ' '.join(f"{name}={value}" for name, value in getattr(record, 'fields', {}).items())
+        line = f"{self.formatTime(record)} {record.levelname} [{getattr(record, 'correlation_id', None) or '-'}] " \
+               f"{record.getMessage()}{' ' + fields if fields else ''}"
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+# Root of the app's loggers; configured once, without touching other libraries' logging
+LOGGER_NAMESPACE = 'news_insights'
+_logging_lock = threading.Lock()
+_logging_configured = False
+
+
+def configure_logging(log_format: str = LOG_FORMAT, level: str = LOG_LEVEL, stream=None):
+    """
+    Send the app's logs to a stream (stderr by default) as text or JSON lines
+
+    Calling this again replaces the previous handler, e.g. to capture logs in a test.
+    """
+    global _logging_configured
+    with _logging_lock:
+        root = logging.getLogger(LOGGER_NAMESPACE)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.addFilter(_CorrelationFilter())
+        handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        root.propagate = False
+        _logging_configured = True
+
+
+class StructuredLogger:
+    """Logger taking structured fields as keyword arguments"""
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def _log(self, level: int, message: str, exc_info=None, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, **fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, **fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, **fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, **fields)
+
+    def exception(self, message: str, **fields):
+        """Log an error with the traceback of the exception being handled"""
+        self._log(logging.ERROR, message, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Get an app logger, configuring the handler on first use"""
+    if not _logging_configured:
+        configure_logging()
+    return StructuredLogger(logging.getLogger(f"{LOGGER_NAMESPACE}.{name}"))
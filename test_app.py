@@ -4,9 +4,14 @@ Test script for News & Insights Agent
 """
 
 import os
+import subprocess
 import sys
 from dotenv import load_dotenv
 
+# Cold-start import budget for the modules the Streamlit entry points load
+IMPORT_TIME_BUDGET_SECONDS = 1.5
+HEAVY_MODULES = ['torch', 'transformers', 'google.generativeai', 'pandas', 'plotly']
+
 def test_imports():
     """Test if all required modules can be imported"""
     print("🧪 Testing imports...")
@@ -114,6 +119,1336 @@ def test_news_agent():
         print(f"❌ NewsAgent test failed: {e}")
         return False
 
+def test_decoding_profiles():
+    """Test decoding profiles become summarizer kwargs, with overrides and the unknown-profile fallback"""
+    print("\n🎚️ Testing decoding profiles...")
+    
+    try:
+        from benchmark import STUB_SUMMARIZATION_MODEL, StubSummarizer, create_processor
+        from config import DECODING_PROFILES
+        
+        calls = []
+        
+        class RecordingSummarizer(StubSummarizer):
+            def __call__(self, inputs, **kwargs):
+                calls.append(kwargs)
+                return super().__call__(inputs, **kwargs)
+        
+        processor = create_processor('stub')
+        processor.pipelines[('summarization', STUB_SUMMARIZATION_MODEL)] = RecordingSummarizer()
+        text = "Officials said the new policy would take effect next month across all regions of the country."
+        processor.summarize_text(text, decoding_profile='fast')
+        processor.summarize_text(text, decoding_profile='quality', max_length=30)
+        processor.summarize_text(text, decoding_profile='no-such-profile')
+        
+        expected = [DECODING_PROFILES['fast'], dict(DECODING_PROFILES['quality'], max_length=30),
+                    DECODING_PROFILES['balanced']]
+        if calls != expected:
+            print(f"❌ Summarizer got {calls}, expected {expected}")
+            return False
+        
+        profiles = processor.get_decoding_profiles()
+        if set(profiles) != set(DECODING_PROFILES) or profiles['fast']['generation'] != DECODING_PROFILES['fast']:
+            print(f"❌ Unexpected decoding profiles: {profiles}")
+            return False
+        
+        print(f"✅ Profiles {', '.join(profiles)} map to generation kwargs; unknown profiles use 'balanced'")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Decoding profile test failed: {e}")
+        return False
+
+def test_model_selector():
+    """Test load-based switching to small models with hysteresis, and that fallbacks aren't credited to a model"""
+    print("\n⚖️ Testing load-based model selection...")
+    
+    try:
+        import time
+        from benchmark import STUB_SUMMARIZATION_MODEL, STUB_SENTIMENT_MODEL, create_processor
+        from model_selector import LoadBasedModelSelector
+        
+        selector = LoadBasedModelSelector(switch_queue_depth=5, switch_p95_ms=1000, recover_queue_depth=1,
+                                          recover_p95_ms=500, window=4, min_dwell_seconds=0.2)
+        if selector.use_small_model():
+            print("❌ Small models selected without load")
+            return False
+        
+        selector.queued(5)
+        switched = selector.use_small_model()
+        selector.dequeued(5)
+        held = selector.use_small_model()
+        time.sleep(0.25)
+        selector.record_latency(800)
+        still_slow = selector.use_small_model()
+        for _ in range(4):
+            selector.record_latency(100)
+        recovered = not selector.use_small_model()
+        if not (switched and held and still_slow and recovered):
+            print(f"❌ Switching was wrong: switched={switched}, held during dwell={held}, "
+                  f"held while slow={still_slow}, recovered={recovered}")
+            return False
+        
+        class FailingSummarizer:
+            def __call__(self, *args, **kwargs):
+                raise RuntimeError("out of memory")
+        
+        processor = create_processor('stub')
+        processor.pipelines[('summarization', STUB_SUMMARIZATION_MODEL)] = FailingSummarizer()
+        processed = processor.process_article({
+            'title': "Central bank holds interest rates steady",
+            'description': "Officials left the benchmark rate unchanged, citing signs that price growth is slowing."
+        })
+        if processed.summary_model is not None or processed.sentiment_model != STUB_SENTIMENT_MODEL:
+            print(f"❌ Models recorded as {processed.summary_model}/{processed.sentiment_model} after a fallback summary")
+            return False
+        
+        print("✅ Switched to small models under load, held for the dwell time, recovered once load fell")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Model selection test failed: {e}")
+        return False
+
+def test_long_content():
+    """Test token windowing and that map-reduce summarization stops after a bounded number of rounds"""
+    print("\n📜 Testing long-content summarization...")
+    
+    try:
+        from benchmark import STUB_SUMMARIZATION_MODEL, StubSummarizer, StubTokenizer, create_processor
+        from config import SUMMARY_MAX_REDUCE_ROUNDS
+        
+        processor = create_processor('stub')
+        words = [f"word{i}" for i in range(2500)]
+        windows = processor._token_windows(' '.join(words), StubTokenizer(), 1000, 32)
+        if [len(window.split()) for window in windows] != [1000, 1000, 564] or \
+                windows[1].split()[0] != words[968]:
+            print(f"❌ Unexpected windows: {[len(window.split()) for window in windows]}")
+            return False
+        
+        batches = []
+        
+        class RecordingSummarizer(StubSummarizer):
+            def __call__(self, inputs, **kwargs):
+                if not isinstance(inputs, str):
+                    batches.append(len(inputs))
+                return super().__call__(inputs, **kwargs)
+        
+        class EchoSummarizer(RecordingSummarizer):
+            def __call__(self, inputs, **kwargs):
+                # Never shorter than the input, so the reduce step cannot converge
+                return super().__call__(inputs, max_length=10 ** 6)
+        
+        processor.pipelines[('summarization', STUB_SUMMARIZATION_MODEL)] = RecordingSummarizer()
+        summary = processor.summarize_long_text(' '.join(words * 2), decoding_profile='fast')
+        if batches != [6] or len(summary.split()) > 40:
+            print(f"❌ Map-reduce ran batches {batches} and returned {len(summary.split())} words")
+            return False
+        
+        batches.clear()
+        processor.pipelines[('summarization', STUB_SUMMARIZATION_MODEL)] = EchoSummarizer()
+        summary = processor.summarize_long_text(' '.join(words * 2))
+        if len(batches) != SUMMARY_MAX_REDUCE_ROUNDS or len(summary.split()) > 1000:
+            print(f"❌ Non-converging map-reduce ran {len(batches)} rounds, returned {len(summary.split())} words")
+            return False
+        
+        print(f"✅ Windows overlap by 32 tokens; map-reduce capped at {SUMMARY_MAX_REDUCE_ROUNDS} rounds")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Long-content test failed: {e}")
+        return False
+
+def test_inference_pool():
+    """Test the worker pool round trip, that a dying worker fails its article, and that the backlog is reported"""
+    print("\n🏭 Testing inference worker pool...")
+    
+    try:
+        import time
+        from benchmark import STUB_SUMMARIZATION_MODEL, StubSummarizer, create_processor
+        from inference_pool import InferencePool
+        from model_selector import LoadBasedModelSelector
+        from news_agent import NewsAgent
+        
+        class CrashingSummarizer(StubSummarizer):
+            def __call__(self, inputs, **kwargs):
+                if 'CRASH' in str(inputs):
+                    # Like an OOM kill: the worker exits without reporting
+                    os._exit(1)
+                return super().__call__(inputs, **kwargs)
+        
+        processor = create_processor('stub')
+        processor.pipelines[('summarization', STUB_SUMMARIZATION_MODEL)] = CrashingSummarizer()
+        processor.model_selector = selector = LoadBasedModelSelector()
+        # Forked, so the workers inherit the stand-in models
+        pool = InferencePool(workers=2, start_method='fork', processor=processor, model_selector=selector)
+        try:
+            agent = NewsAgent(inference_workers=0, text_processor=processor)
+            agent.inference_pool = pool
+            articles = [{'url': f"https://example.com/{i}", 'title': f"Story {i} headline",
+                         'description': "Officials said the new policy would take effect next month."}
+                        for i in range(4)]
+            articles[1]['title'] = "CRASH"
+            start = time.perf_counter()
+            processed = agent.process_articles(articles)
+            elapsed = time.perf_counter() - start
+            after_crash = pool.map_articles(articles[2:], timeout=30)
+        finally:
+            pool.close()
+        
+        if [article.url for article in processed] != [articles[i]['url'] for i in (0, 2, 3)] or elapsed > 15:
+            print(f"❌ Expected 3 articles despite the crashed worker, got {len(processed)} in {elapsed:.1f}s")
+            return False
+        if len(after_crash) != 2 or selector.queue_depth != 0 or not selector.p95_latency():
+            print(f"❌ Pool did not recover, or the selector saw queue depth {selector.queue_depth} "
+                  f"and no worker latencies")
+            return False
+        
+        print(f"✅ Pool processed {len(processed)} articles in {elapsed:.1f}s; the crashed worker's article failed")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Inference pool test failed: {e}")
+        return False
+
+def test_micro_batching():
+    """Test micro-batches fill up to the max size, group by settings, and flush after max_wait"""
+    print("\n📦 Testing micro-batching...")
+    
+    try:
+        import time
+        from inference_server import MicroBatcher
+        
+        batches = []
+        
+        def run_batch(key, items):
+            batches.append((key, list(items)))
+            return [f"{key}:{item}" for item in items]
+        
+        batcher = MicroBatcher('test', run_batch, max_batch_size=4, max_wait_ms=50)
+        futures = [batcher.submit('a', i) for i in range(6)] + [batcher.submit('b', 6)]
+        results = [future.result(timeout=5) for future in futures]
+        if results != [f"a:{i}" for i in range(6)] + ["b:6"]:
+            print(f"❌ Results were not fanned back out in order: {results}")
+            return False
+        # 'b' has different settings, so it never shares a model call with 'a'
+        if max(len(items) for _, items in batches) != 4 or ('b', [6]) not in batches \
+                or sum(len(items) for _, items in batches) != 7:
+            print(f"❌ Unexpected batches: {batches}")
+            return False
+        
+        # A lone request waits max_wait_ms for company, then runs by itself
+        start = time.perf_counter()
+        batcher.submit('a', 7).result(timeout=5)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not 45 <= elapsed_ms < 1000 or batches[-1] != ('a', [7]):
+            print(f"❌ Lone request took {elapsed_ms:.0f} ms (max wait 50 ms) in batch {batches[-1]}")
+            return False
+        
+        stats = batcher.stats()
+        if stats['requests'] != 8 or stats['queue_depth'] != 0:
+            print(f"❌ Unexpected stats: {stats}")
+            return False
+        
+        print(f"✅ Batch sizes {stats['batch_size_histogram']}; a lone request ran after {elapsed_ms:.0f} ms")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Micro-batching test failed: {e}")
+        return False
+
+def test_model_warmup():
+    """Test background warm-up reports per-model status and progress, and a failing model doesn't block readiness"""
+    print("\n🔥 Testing model warm-up...")
+    
+    try:
+        import time
+        from benchmark import STUB_SENTIMENT_MODEL, STUB_SUMMARIZATION_MODEL, StubSentiment, StubSummarizer
+        from model_warmup import ModelWarmup
+        from text_processor import register_pipeline
+        
+        class BrokenSummarizer(StubSummarizer):
+            def __call__(self, inputs, **kwargs):
+                raise RuntimeError("CUDA out of memory")
+        
+        register_pipeline('summarization', STUB_SUMMARIZATION_MODEL, StubSummarizer())
+        register_pipeline('sentiment-analysis', STUB_SENTIMENT_MODEL, StubSentiment())
+        register_pipeline('summarization', 'stub/broken-summarizer', BrokenSummarizer())
+        
+        class StubWarmup(ModelWarmup):
+            def _configured_models(self):
+                return [('summarization', STUB_SUMMARIZATION_MODEL), ('sentiment-analysis', STUB_SENTIMENT_MODEL),
+                        ('summarization', 'stub/broken-summarizer')]
+        
+        warmup = StubWarmup()
+        if warmup.is_ready() or warmup.progress() != 0:
+            print("❌ Warm-up reported progress before it started")
+            return False
+        
+        warmup.start()
+        deadline = time.time() + 10
+        while not warmup.is_ready() and time.time() < deadline:
+            time.sleep(0.05)
+        
+        statuses = [entry['status'] for entry in warmup.status().values()]
+        if statuses != ['ready', 'ready', 'failed'] or warmup.progress() != 1.0:
+            print(f"❌ Unexpected warm-up status: {warmup.status()}")
+            return False
+        
+        print(f"✅ Warm-up finished: {statuses}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Model warm-up test failed: {e}")
+        return False
+
+def test_import_time():
+    """Test cold-start import time of the app entry points and modules they load stays within budget"""
+    print("\n⏱️  Testing cold-start import time...")
+    
+    # Streamlit's own import cost and dependencies aren't ours; count what the app adds on top
+    script = (
+        "import importlib.util, sys, time\n"
+        "apps = importlib.util.find_spec('streamlit') is not None\n"
+        "if apps:\n"
+        "    import streamlit\n"
+        "preloaded = set(sys.modules)\n"
+        "start = time.perf_counter()\n"
+        "import news_agent, news_agent_gemini, news_fetcher, text_processor, text_processor_gemini\n"
+        "if apps:\n"
+        "    import app, app_gemini, app_simple, streamlit_app\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules and m not in preloaded]\n"
+        "print(int(apps))\n"
+        "print(elapsed)\n"
+        "print(','.join(heavy))\n"
+    )
+    
+    try:
+        # Importing an app starts its background work; keep the measurement to the imports
+        env = dict(os.environ, MODEL_WARMUP='false', DIGEST_REFRESH='false',
+                   GEMINI_DIGEST_REFRESH='false', METRICS_PORT='0')
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True, text=True, timeout=120, env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if result.returncode != 0:
+            print(f"❌ Import failed: {result.stderr.strip()}")
+            return False
+        
+        # The last line (heavy modules) is empty when none were imported
+        lines = result.stdout.splitlines()
+        apps = lines[-3] == '1'
+        elapsed = float(lines[-2])
+        heavy = [m for m in lines[-1].split(',') if m]
+        
+        if not apps:
+            print("⚠️  Streamlit not installed; checking the agent and processor modules only")
+        
+        if heavy:
+            print(f"❌ Heavy modules imported at startup: {heavy}")
+            return False
+        
+        if elapsed > IMPORT_TIME_BUDGET_SECONDS:
+            print(f"❌ Import took {elapsed:.2f}s (budget {IMPORT_TIME_BUDGET_SECONDS}s)")
+            return False
+        
+        checked = "app entry points" if apps else "agent modules"
+        print(f"✅ Imports of the {checked} took {elapsed:.2f}s (budget {IMPORT_TIME_BUDGET_SECONDS}s), "
+              f"no heavy modules loaded")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Import time test failed: {e}")
+        return False
+
+def test_batch_cli():
+    """Test an interrupted batch run resumes from its checkpoint, and existing output isn't overwritten"""
+    print("\n📦 Testing batch CLI checkpoint/resume...")
+    
+    try:
+        import contextlib
+        import io
+        import json
+        import tempfile
+        import batch_cli
+        from benchmark import create_processor
+        from news_agent import NewsAgent
+        
+        class InterruptedAgent(NewsAgent):
+            """Stops the run (like Ctrl-C) on its second batch"""
+            calls = 0
+            
+            def process_articles(self, articles, **kwargs):
+                InterruptedAgent.calls += 1
+                if InterruptedAgent.calls == 2:
+                    raise KeyboardInterrupt
+                return super().process_articles(articles, **kwargs)
+        
+        directory = tempfile.mkdtemp()
+        input_path = os.path.join(directory, 'articles.jsonl')
+        output_path = os.path.join(directory, 'insights.jsonl')
+        with open(input_path, 'w') as f:
+            for i in range(5):
+                f.write(json.dumps({'title': f"Story {i}", 'description': f"Details of story {i}",
+                                    'url': f"https://example.com/{i}", 'source': {'name': 'Example'}}) + '\n')
+        argv = ['--input', input_path, '--output', output_path, '--batch-size', '2']
+        
+        create_agent = batch_cli.create_agent
+        batch_cli.create_agent = lambda backend: InterruptedAgent(inference_workers=0,
+                                                                  text_processor=create_processor('stub'))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = batch_cli.main(argv)
+                resumed = batch_cli.main(argv)
+        finally:
+            batch_cli.create_agent = create_agent
+        
+        with open(output_path) as f:
+            urls = [json.loads(line)['url'] for line in f]
+        if first != 130 or resumed != 0 or sorted(urls) != [f"https://example.com/{i}" for i in range(5)]:
+            print(f"❌ Resume wrote {urls} (exit codes {first}, {resumed})")
+            return False
+        
+        # Same output, no checkpoint: refuse rather than truncate the earlier results
+        os.remove(f"{output_path}.checkpoint")
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                batch_cli.main(argv)
+            print("❌ Existing output was overwritten without --restart")
+            return False
+        except SystemExit:
+            pass
+        with open(output_path) as f:
+            if len(f.readlines()) != 5:
+                print("❌ Existing output was modified")
+                return False
+        
+        print(f"✅ Interrupted run resumed to {len(urls)} articles; existing output kept without --restart")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Batch CLI test failed: {e}")
+        return False
+
+def test_insights_service():
+    """Test the insights service endpoints through InsightsClient, and the bounded result cache"""
+    print("\n🛰️  Testing insights service...")
+    
+    try:
+        import threading
+        from concurrent.futures import Future
+        from benchmark import create_processor
+        from insights_client import InsightsClient
+        from insights_service import InsightsCache, InsightsService, create_server
+        from news_agent import NewsAgent
+        from news_fetcher import NewsFetcher
+        from standin_servers import start_newsapi_standin
+        
+        newsapi = start_newsapi_standin()
+        agent = NewsAgent(inference_workers=0, text_processor=create_processor('stub'),
+                          news_fetcher=NewsFetcher(base_url=newsapi.url))
+        service = InsightsService(workers=2, max_queue=2, agent=agent)
+        server = create_server(service, host='127.0.0.1', port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = InsightsClient(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+            
+            if 'general' not in client.get_available_categories():
+                print("❌ /categories is missing 'general'")
+                return False
+            if client.get_default_decoding_profile() not in client.get_decoding_profiles():
+                print("❌ /decoding-profiles default is not one of its profiles")
+                return False
+            if '/decoding-profiles' not in client._lookups:
+                print("❌ Client did not cache the decoding profiles")
+                return False
+            
+            articles = client.get_news_insights(max_articles=3)
+            again = client.get_news_insights(max_articles=3)
+            if len(articles) != 3 or [a.url for a in again] != [a.url for a in articles] or service.cache.hits != 1:
+                print(f"❌ Repeated /insights request was not served from the cache (hits {service.cache.hits})")
+                return False
+            
+            stats = client.get_sentiment_stats(articles)
+            if sum(stats.values()) != 3:
+                print(f"❌ /stats counted {stats}")
+                return False
+            label = articles[0].sentiment
+            if not all(a['sentiment'] == label
+                       for a in client.filter_articles_by_sentiment(articles, label)):
+                print("❌ /filter returned articles with another sentiment")
+                return False
+        finally:
+            server.shutdown()
+            newsapi.shutdown()
+        
+        # Least recently used results are dropped past max_size
+        cache = InsightsCache(ttl_seconds=60, max_size=2)
+        def done(value):
+            future = Future()
+            future.set_result(value)
+            return lambda: future
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_submit(key, done([key]))
+        if (len(cache) != 2 or cache.get_or_submit('a', done(['new'])) != ['a']
+                or isinstance(cache.get_or_submit('b', done(['new'])), list)):
+            print("❌ Insights cache did not evict its least recently used result")
+            return False
+        
+        print("✅ Service endpoints answered, repeated requests hit the cache, and the cache stays bounded")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Insights service test failed: {e}")
+        return False
+
+def test_job_queue():
+    """Test identical active jobs are shared, and cancelling stops queued and running jobs"""
+    print("\n🧵 Testing background job queue...")
+    
+    try:
+        import threading
+        import time
+        from job_queue import JobQueue
+        
+        gate = threading.Event()
+        
+        def work(job):
+            articles = []
+            for i in range(3):
+                gate.wait(5)
+                if job.cancel_event.is_set():
+                    break
+                article = {'title': f"{job.key[0]} {i}", 'url': f"https://example.com/{job.key[0]}/{i}",
+                           'summary': "Summary", 'sentiment': 'NEUTRAL'}
+                job.report_progress(article, i, 3)
+                articles.append(article)
+            return articles
+        
+        def wait_for(job):
+            deadline = time.time() + 5
+            while job.active and time.time() < deadline:
+                time.sleep(0.01)
+        
+        jobs = JobQueue(workers=1)
+        running = jobs.submit(('tech',), work)
+        if jobs.submit(('tech',), work) is not running:
+            print("❌ An identical active job was not shared")
+            return False
+        
+        queued = jobs.submit(('sports',), work)
+        jobs.cancel(queued.id)
+        retried = jobs.submit(('sports',), work)
+        if queued.status != 'cancelled' or retried is queued:
+            print(f"❌ Cancelled queued job was reused or not cancelled ({queued.status})")
+            return False
+        
+        gate.set()
+        wait_for(running)
+        wait_for(retried)
+        if running.status != 'done' or len(running.results) != 3 or running.progress() != 1.0:
+            print(f"❌ Job finished as {running.status} with {len(running.results)} results")
+            return False
+        
+        gate.clear()
+        stopped = jobs.submit(('business',), work)
+        while stopped.status == 'queued':
+            time.sleep(0.01)
+        jobs.cancel(stopped.id)
+        gate.set()
+        wait_for(stopped)
+        if stopped.status != 'cancelled' or stopped.results:
+            print(f"❌ Cancelled running job finished as {stopped.status}")
+            return False
+        if jobs.cancel('missing'):
+            print("❌ Cancelling an unknown job reported success")
+            return False
+        
+        print("✅ Identical jobs shared; queued and running jobs cancelled")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Job queue test failed: {e}")
+        return False
+
+def test_pagination():
+    """Test the page widget state starts at page 1 and is clamped when the result count shrinks"""
+    print("\n📄 Testing pagination...")
+    
+    try:
+        try:
+            from ui_components import seed_page
+        except ImportError as e:
+            print(f"⚠️  Skipped: {e}")
+            return True
+        
+        state = {}
+        seed_page(state, 'articles_page', 5)
+        first = state['articles_page']
+        state['articles_page'] = 4
+        seed_page(state, 'articles_page', 5)
+        kept = state['articles_page']
+        seed_page(state, 'articles_page', 2)
+        
+        if (first, kept, state['articles_page']) != (1, 4, 2):
+            print(f"❌ Page state went {first}, {kept}, {state['articles_page']} instead of 1, 4, 2")
+            return False
+        
+        print("✅ Page state seeded at 1, kept while valid and clamped to the last page")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Pagination test failed: {e}")
+        return False
+
+def test_article_pool():
+    """Test pool records are isolated per processing settings and evicted least recently used first"""
+    print("\n🗃️  Testing shared article pool...")
+    
+    try:
+        from article_pool import ArticlePool
+        from articles import Article, ProcessedArticle
+        
+        article = Article(title="Rates", description="x" * 500, url="https://example.com/rates",
+                          content="Full body", source_name="Example")
+        pool = ArticlePool(max_articles=3)
+        
+        # Same URL, different decoding profile or model: separate records
+        precise = pool.add(article.processed("Short summary", 'NEUTRAL', 0.9, 'model-a', 'sent-a'),
+                           (('decoding_profile', 'precise'),))
+        creative = pool.add(article.processed("Creative summary", 'POSITIVE', 0.8, 'model-a', 'sent-a'),
+                            (('decoding_profile', 'creative'),))
+        other_model = pool.add(article.processed("Other summary", 'NEUTRAL', 0.7, 'model-b', 'sent-a'),
+                               (('decoding_profile', 'precise'),))
+        if len({precise, creative, other_model}) != 3 or pool.get(precise).summary != "Short summary":
+            print("❌ Results for other settings replaced a session's record")
+            return False
+        
+        record = pool.get(precise)
+        if (not isinstance(record, ProcessedArticle) or record.content is not None
+                or len(record.description) != 200 or record['source']['name'] != "Example"):
+            print(f"❌ Pool record was not a compact ProcessedArticle: {record!r}")
+            return False
+        
+        # `precise` was read last, so `creative` is the least recently used
+        pool.add(Article(title="Other", url="https://example.com/other").processed("S", 'NEGATIVE', 0.6))
+        if pool.get(creative) is not None or pool.get(precise) is None or pool.stats()['evictions'] != 1:
+            print(f"❌ Unexpected eviction: {pool.stats()}")
+            return False
+        
+        if pool.filter_ids([precise, other_model], 'NEUTRAL') != [precise, other_model]:
+            print("❌ Sentiment filter over pool IDs failed")
+            return False
+        
+        # A Gemini result and a fallback (budget spent) for the same URL and settings stay apart
+        from types import SimpleNamespace
+        from text_processor_gemini import GEMINI_MODEL, TextProcessorGemini
+        from token_ledger import TokenLedger
+        model = SimpleNamespace(generate_content=lambda prompt, **kwargs: SimpleNamespace(
+            text="POSITIVE" if "sentiment" in prompt.lower() else "Rates held steady.", usage_metadata=None))
+        gemini, spent = TextProcessorGemini(model=model), TextProcessorGemini(model=model)
+        gemini.ledger = TokenLedger(path=None, daily_budget=0)
+        spent.ledger = TokenLedger(path=None, daily_budget=1)
+        story = Article(title="Rates held", url="https://example.com/held",
+                        description="The central bank held rates steady for a third straight meeting.")
+        settings = (('backend', 'gemini'),)
+        real = pool.add(gemini.process_article(story), settings)
+        fallback = pool.add(spent.process_article(story), settings)
+        if real == fallback or pool.get(real).summary_model != GEMINI_MODEL or pool.get(fallback).summary_model:
+            print("❌ A Gemini fallback result replaced the real Gemini record")
+            return False
+        
+        print("✅ Records isolated per settings, compacted, and evicted least recently used first")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Article pool test failed: {e}")
+        return False
+
+def test_article_model():
+    """Test Article/ProcessedArticle dict round trips, processed() sharing and equality"""
+    print("\n📰 Testing article model...")
+    
+    try:
+        import json
+        from articles import Article, ProcessedArticle, json_default
+        
+        data = {'source': {'id': 'example', 'name': 'Example'}, 'author': 'A. Writer', 'title': 'Title',
+                'description': 'Description', 'url': 'https://example.com/a', 'urlToImage': None,
+                'publishedAt': '2024-05-01T10:00:00Z', 'content': 'Body'}
+        article = Article.from_dict(dict(data, unknown='dropped'))
+        if article.to_dict() != data or article['publishedAt'] != data['publishedAt']:
+            print(f"❌ Article round trip changed the data: {article.to_dict()}")
+            return False
+        
+        processed = article.processed("Summary", 'POSITIVE', 0.9, 'summarizer', 'classifier')
+        if processed.content is not article.content or processed['summary_model'] != 'summarizer':
+            print("❌ processed() did not share the article's fields")
+            return False
+        
+        restored = ProcessedArticle.from_dict(json.loads(json.dumps(processed, default=json_default)))
+        if restored != processed or restored == article or restored.get('urlToImage', 'none') != 'none':
+            print("❌ ProcessedArticle did not survive a JSON round trip")
+            return False
+        
+        try:
+            hash(processed)
+            print("❌ Articles should be unhashable")
+            return False
+        except TypeError:
+            pass
+        
+        print("✅ Articles round-trip through NewsAPI dicts and JSON; processed() shares fields")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Article model test failed: {e}")
+        return False
+
+def test_gemini_streaming():
+    """Test streamed Gemini summaries are assembled in order, reported as they grow, and timed"""
+    print("\n🌊 Testing Gemini summary streaming...")
+    
+    try:
+        import time
+        from types import SimpleNamespace
+        from text_processor_gemini import TextProcessorGemini
+        
+        chunks = ["Markets rallied ", "", "after the rate decision. ", "Tech stocks led the gains."]
+        
+        class StreamingModel:
+            """generate_content stand-in that yields its chunks 20 ms apart"""
+            def generate_content(self, prompt, stream=False):
+                if not stream:
+                    return SimpleNamespace(text=''.join(chunks), usage_metadata=None)
+                def response():
+                    for chunk in chunks:
+                        time.sleep(0.02)
+                        yield SimpleNamespace(text=chunk)
+                return response()
+        
+        processor = TextProcessorGemini(model=StreamingModel())
+        text = "The central bank held rates steady, and equity markets responded with broad gains. " * 3
+        
+        partials = []
+        summary = processor.summarize_text(text, on_chunk=partials.append)
+        expected = ''.join(chunks)
+        if summary != expected or partials != ["Markets rallied ", "Markets rallied after the rate decision. ", expected]:
+            print(f"❌ Streamed summary assembled as {summary!r} via {partials}")
+            return False
+        
+        if list(processor.summarize_text_stream(text)) != [chunk for chunk in chunks if chunk]:
+            print("❌ summarize_text_stream did not yield the raw chunks")
+            return False
+        
+        stats = processor.get_latency_stats()
+        if stats['calls'] != 2 or not stats['first_token_ms_p50'] < stats['total_ms_p50']:
+            print(f"❌ Streaming latency not recorded: {stats}")
+            return False
+        
+        print(f"✅ {len(partials)} partial summaries; first token after {stats['first_token_ms_p50']} ms "
+              f"of {stats['total_ms_p50']} ms")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Gemini streaming test failed: {e}")
+        return False
+
+def test_token_ledger():
+    """Test the Gemini token ledger enforces its daily budget and persists usage"""
+    print("\n🪙 Testing Gemini token ledger...")
+    
+    try:
+        import tempfile
+        import time
+        from types import SimpleNamespace
+        from text_processor_gemini import TextProcessorGemini
+        from token_ledger import TokenBudgetExceeded, TokenLedger
+        
+        path = os.path.join(tempfile.mkdtemp(), 'ledger.json')
+        ledger = TokenLedger(path=path, daily_budget=100)
+        ledger.record('summary', 60, 20)
+        ledger.record_article()
+        ledger.check(20)
+        try:
+            ledger.check(21)
+            print("❌ A call past the budget was allowed")
+            return False
+        except TokenBudgetExceeded:
+            pass
+        
+        usage = TokenLedger(path=path, daily_budget=100).usage()
+        if (usage['input_tokens'], usage['budget_remaining'], usage['tokens_per_article']) != (60, 20, 80.0):
+            print(f"❌ Reloaded ledger reported {usage}")
+            return False
+        
+        # Processes sharing the file add to each other's counts instead of overwriting them
+        # Each process loads the ledger, then all record at once, interleaved
+        script = ("import sys, time; from token_ledger import TokenLedger\n"
+                  "ledger = TokenLedger(path=sys.argv[1], daily_budget=0)\n"
+                  "time.sleep(max(0, float(sys.argv[2]) - time.time()))\n"
+                  "for _ in range(50): ledger.record('summary', 1, 0); time.sleep(0.002)")
+        start_at = str(time.time() + 3)
+        workers = [subprocess.Popen([sys.executable, "-c", script, path, start_at]) for _ in range(3)]
+        if any(worker.wait(timeout=60) for worker in workers):
+            print("❌ Ledger writer process failed")
+            return False
+        ledger.record('sentiment', 1, 0)
+        shared = TokenLedger(path=path, daily_budget=100).usage()
+        if shared['input_tokens'] != 60 + 3 * 50 + 1 or ledger.usage()['input_tokens'] != shared['input_tokens']:
+            print(f"❌ Concurrent processes lost ledger counts: {shared['input_tokens']} input tokens")
+            return False
+        
+        # Out of budget, the processor falls back without calling Gemini
+        calls = []
+        model = SimpleNamespace(generate_content=lambda prompt, **kwargs: calls.append(prompt))
+        processor = TextProcessorGemini(model=model)
+        processor.ledger = TokenLedger(path=None, daily_budget=10)
+        text = "The central bank held rates steady, and equity markets responded with broad gains. " * 3
+        summary = processor.summarize_text(text)
+        if calls or summary != text[:100] + "...":
+            print(f"❌ Processor called Gemini past the budget ({len(calls)} calls)")
+            return False
+        
+        print(f"✅ Budget enforced at {usage['budget']} tokens; usage persisted; processor fell back")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Token ledger test failed: {e}")
+        return False
+
+def test_offline_benchmark():
+    """Test the offline benchmark runs end to end with stand-in models"""
+    print("\n📈 Testing offline benchmark...")
+    
+    try:
+        from benchmark import run_benchmarks, synthetic_payload
+        results = run_benchmarks(synthetic_payload(3), models='stub', repeats=1, e2e_runs=1)
+        
+        empty = [name for name, result in results.items() if not result['runs']]
+        if empty:
+            print(f"❌ Benchmarks without timed runs: {empty}")
+            return False
+        
+        print(f"✅ Offline benchmark ran: {', '.join(results)}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Offline benchmark test failed: {e}")
+        return False
+
+def test_standin_servers():
+    """Test NewsFetcher against the NewsAPI stand-in, including 429 throttling"""
+    print("\n🎭 Testing stand-in servers...")
+    
+    try:
+        from news_fetcher import NewsFetcher
+        from standin_servers import FaultProfile, start_newsapi_standin
+        
+        server = start_newsapi_standin()
+        throttled = start_newsapi_standin(faults=FaultProfile(throttle_rate=1.0))
+        try:
+            articles = NewsFetcher(base_url=server.url).fetch_news(page_size=5)
+            if len(articles) != 5:
+                print(f"❌ Expected 5 articles from the stand-in, got {len(articles)}")
+                return False
+            
+            if NewsFetcher(base_url=throttled.url).fetch_news(page_size=5) != []:
+                print("❌ A throttled fetch should return no articles")
+                return False
+        finally:
+            server.shutdown()
+            throttled.shutdown()
+        
+        print("✅ Stand-in NewsAPI served articles and throttling was handled")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Stand-in server test failed: {e}")
+        return False
+
+def test_gemini_standin():
+    """Test the Gemini SDK against the Gemini stand-in: summary, sentiment, streaming and injected errors"""
+    print("\n🎭 Testing Gemini stand-in...")
+    
+    try:
+        from config import CIRCUIT_FAILURE_THRESHOLD
+        from resilience import CircuitBreaker
+        from standin_servers import FaultProfile, start_gemini_standin
+        from text_processor_gemini import TextProcessorGemini
+        from token_ledger import TokenLedger
+        
+        text = ("The central bank approves a new growth plan as markets rise to a record. "
+                "Analysts expect gains to continue through the quarter.")
+        
+        server = start_gemini_standin()
+        try:
+            processor = TextProcessorGemini(api_endpoint=server.url)
+            processor.ledger = TokenLedger(path=None, daily_budget=0)
+            
+            summary = processor.summarize_text(text)
+            sentiment = processor.analyze_sentiment(text)
+            partials = []
+            streamed = processor.summarize_text(text, on_chunk=partials.append)
+            if not summary.startswith("The central bank") or sentiment['label'] != 'POSITIVE':
+                print(f"❌ Unexpected stand-in results: {summary!r}, {sentiment}")
+                return False
+            if streamed != summary or len(partials) < 2 or partials[-1] != summary:
+                print(f"❌ Streamed summary {streamed!r} arrived as {partials}")
+                return False
+            if server.stats()['status_counts'] != {'200': 3}:
+                print(f"❌ Stand-in saw {server.stats()}")
+                return False
+        finally:
+            server.shutdown()
+        
+        # Every call fails: fallbacks are used and the circuit opens after the threshold
+        failing = start_gemini_standin(faults=FaultProfile(error_rate=1.0))
+        try:
+            processor = TextProcessorGemini(api_endpoint=failing.url)
+            processor.ledger = TokenLedger(path=None, daily_budget=0)
+            # A private breaker, so the process-wide Gemini circuit stays closed for other tests
+            processor.breaker = CircuitBreaker('gemini:standin-test')
+            
+            summaries = [processor.summarize_text(text) for _ in range(CIRCUIT_FAILURE_THRESHOLD + 2)]
+            if any(summary != text[:100] + "..." for summary in summaries):
+                print(f"❌ Failed calls did not fall back: {summaries}")
+                return False
+            if not processor.circuit_open() or failing.stats()['requests'] != CIRCUIT_FAILURE_THRESHOLD:
+                print(f"❌ Circuit {processor.breaker.state} after {failing.stats()['requests']} failed requests")
+                return False
+        finally:
+            failing.shutdown()
+        
+        print(f"✅ Summary, sentiment and {len(partials)} streamed chunks served; "
+              f"circuit opened after {CIRCUIT_FAILURE_THRESHOLD} injected errors")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Gemini stand-in test failed: {e}")
+        return False
+
+def test_load_test():
+    """Test a one-user load-test step with stand-in models, the SLO summary and report comparison"""
+    print("\n🏋️  Testing load test harness...")
+    
+    try:
+        import contextlib
+        import io
+        import json
+        import tempfile
+        import load_test
+        
+        args = load_test.parse_args(['--models', 'stub', '--users', '1', '--duration', '1', '--think-time', '0',
+                                     '--articles', '3', '--latency-ms', '0', '--latency-jitter-ms', '0',
+                                     '--sample-interval', '0.25', '--label', 'smoke'])
+        factory = load_test.AgentFactory(args)
+        try:
+            step = load_test.run_step(factory, 1, args)
+        finally:
+            factory.close()
+        
+        insights = step['latency']['insights']
+        if (step['users'] != 1 or step['errors'] or not insights['count']
+                or set(step['latency']) != set(load_test.OPERATIONS) or not step['timeline']):
+            print(f"❌ Unexpected step report: {json.dumps(step, default=str)[:300]}")
+            return False
+        
+        if (load_test.sustained_users([step], slo_p95_ms=60000) != 1
+                or load_test.sustained_users([step], slo_p95_ms=0) != 0):
+            print("❌ sustained_users did not apply the SLO")
+            return False
+        
+        path = os.path.join(tempfile.mkdtemp(), 'smoke.json')
+        with open(path, 'w') as f:
+            json.dump({'label': 'smoke', 'slo_p95_ms': 60000, 'sustained_users': 1,
+                       'config': {'models': 'stub'}, 'steps': [step]}, f)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            load_test.compare_reports([path])
+        if 'smoke' not in output.getvalue() or '"models": "stub"' not in output.getvalue():
+            print(f"❌ compare_reports printed {output.getvalue()!r}")
+            return False
+        
+        print(f"✅ {insights['count']} insight requests in {step['elapsed_s']}s "
+              f"(p95 {insights['p95_ms']} ms); report saved and compared")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Load test harness test failed: {e}")
+        return False
+
+def test_telemetry():
+    """Test fetch metrics on the Prometheus endpoint and correlated JSON logs"""
+    print("\n📈 Testing telemetry...")
+    
+    try:
+        import io
+        import json
+        import requests
+        from news_fetcher import NewsFetcher
+        from standin_servers import start_newsapi_standin
+        from telemetry import FETCH_SECONDS, configure_logging, correlation_scope, start_metrics_server
+        
+        logs = io.StringIO()
+        configure_logging(log_format='json', stream=logs)
+        server = start_newsapi_standin()
+        metrics_server = start_metrics_server(port=0) or start_metrics_server(port=8799, host='127.0.0.1')
+        try:
+            fetches = FETCH_SECONDS.count(endpoint='top-headlines')
+            with correlation_scope('test-run') as correlation_id:
+                NewsFetcher(base_url=server.url).fetch_news(page_size=3)
+            
+            if FETCH_SECONDS.count(endpoint='top-headlines') != fetches + 1:
+                print("❌ Fetch latency was not recorded")
+                return False
+            
+            host, port = metrics_server.server_address[:2]
+            metrics = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=5).text
+            if 'news_fetch_seconds_bucket{endpoint="top-headlines",le="+Inf"}' not in metrics:
+                print("❌ /metrics is missing the fetch latency histogram")
+                return False
+            
+            entries = [json.loads(line) for line in logs.getvalue().splitlines()]
+            if not any(entry['correlation_id'] == correlation_id and entry.get('count') == 3
+                       for entry in entries):
+                print("❌ Fetch log line is missing the correlation ID or article count")
+                return False
+        finally:
+            server.shutdown()
+            configure_logging()
+        
+        print("✅ Metrics exposed on /metrics and logs carry the correlation ID")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Telemetry test failed: {e}")
+        return False
+
+def test_profiling():
+    """Test profiling mode: per-article span tree and Chrome trace export"""
+    print("\n🔍 Testing profiling mode...")
+    
+    try:
+        from benchmark import create_processor
+        from news_agent import NewsAgent
+        from news_fetcher import NewsFetcher
+        from profiling import get_profile_store
+        from standin_servers import start_newsapi_standin
+        from telemetry import correlation_scope
+        
+        server = start_newsapi_standin()
+        try:
+            agent = NewsAgent(inference_workers=0, text_processor=create_processor('stub'),
+                              news_fetcher=NewsFetcher(base_url=server.url), profiling=True)
+            with correlation_scope() as run_id:
+                agent.get_news_insights(max_articles=2)
+        finally:
+            server.shutdown()
+        
+        profile = get_profile_store().get(run_id)
+        if profile is None:
+            print("❌ No profile recorded for the run")
+            return False
+        
+        missing = {'fetch', 'article', 'clean', 'summarize', 'sentiment', 'inference', 'wait'} - set(profile.breakdown())
+        if missing or len(profile.articles()) != 2:
+            print(f"❌ Profile is missing steps {missing} or per-article spans")
+            return False
+        
+        events = profile.to_chrome_trace()['traceEvents']
+        if not all(event['ph'] == 'X' and event['dur'] >= 0 for event in events):
+            print("❌ Chrome trace events are malformed")
+            return False
+        
+        print(f"✅ Profile recorded {len(events)} spans: {', '.join(profile.breakdown())}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Profiling test failed: {e}")
+        return False
+
+def test_resilience():
+    """Test the NewsAPI circuit breaker serving cached articles, and hedging of a slow call"""
+    print("\n🛡️ Testing hedging and circuit breakers...")
+    
+    try:
+        import itertools
+        import time
+        from config import CIRCUIT_FAILURE_THRESHOLD
+        from news_fetcher import NewsFetcher
+        from resilience import CircuitBreaker, Hedger, get_circuit_breaker
+        from standin_servers import start_newsapi_standin
+        
+        server = start_newsapi_standin()
+        try:
+            fetcher = NewsFetcher(base_url=server.url)
+            fetched = fetcher.fetch_news(page_size=3)
+            
+            # Every request now fails with a 500; the last good response is served instead
+            server.faults.error_rate = 1.0
+            served = [fetcher.fetch_news(page_size=3) for _ in range(CIRCUIT_FAILURE_THRESHOLD + 1)]
+        finally:
+            server.shutdown()
+        
+        breaker = get_circuit_breaker(f"newsapi:{server.url.rstrip('/')}/top-headlines")
+        if breaker.state != CircuitBreaker.OPEN:
+            print(f"❌ Circuit is {breaker.state} after {CIRCUIT_FAILURE_THRESHOLD} failures")
+            return False
+        if not fetched or any(articles != fetched for articles in served):
+            print("❌ Cached articles were not served while NewsAPI was failing")
+            return False
+        
+        # The first attempt stalls; the hedge, sent after the learned p95, answers
+        hedger = Hedger('test', max_ratio=1.0, min_delay_ms=10, min_samples=3)
+        for _ in range(3):
+            hedger.call(lambda: time.sleep(0.01))
+        calls = itertools.count()
+        start = time.perf_counter()
+        hedger.call(lambda: time.sleep(2 if next(calls) == 0 else 0.01))
+        if time.perf_counter() - start > 1:
+            print("❌ Slow call was not hedged")
+            return False
+        
+        # Only outages count against the circuit: not a blocked response or a bad request
+        import requests
+        from types import SimpleNamespace
+        from resilience import upstream_failure
+        not_found = requests.HTTPError(response=SimpleNamespace(status_code=404))
+        throttled = requests.HTTPError(response=SimpleNamespace(status_code=429))
+        verdicts = [upstream_failure(error) for error in (
+            requests.ConnectionError(), requests.Timeout(), throttled,
+            ValueError("response was blocked"), not_found)]
+        if verdicts != [True, True, True, False, False]:
+            print(f"❌ upstream_failure classified errors as {verdicts}")
+            return False
+        
+        def blocked_response():
+            raise ValueError("response was blocked")
+        
+        blocked = CircuitBreaker('test:blocked')
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD + 1):
+            try:
+                blocked.call(blocked_response, is_failure=upstream_failure)
+            except ValueError:
+                pass
+        if blocked.state != CircuitBreaker.CLOSED:
+            print("❌ Blocked responses opened the circuit")
+            return False
+        
+        print("✅ Circuit opened and served cached articles; slow call was hedged; blocked responses ignored")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Resilience test failed: {e}")
+        return False
+
+def test_newsapi_quota():
+    """Test that the NewsAPI budget serves stale cached articles and stops fetching once spent"""
+    print("\n🧮 Testing NewsAPI quota...")
+    
+    try:
+        from news_fetcher import NewsFetcher
+        from newsapi_quota import NewsApiQuota
+        from standin_servers import start_newsapi_standin
+        
+        # One request a day, and cached responses are stale immediately
+        quota = NewsApiQuota(path=None, daily_budget=1, reserve=0, freshness_seconds={'general': 0})
+        server = start_newsapi_standin()
+        try:
+            fetcher = NewsFetcher(base_url=server.url, quota=quota)
+            fetched = fetcher.fetch_news(page_size=3)
+            stale = fetcher.fetch_news(page_size=3)
+            exhausted = fetcher.fetch_news(keyword='markets', page_size=3)
+        finally:
+            server.shutdown()
+        
+        status = quota.status()
+        if not fetched or stale != fetched or exhausted != []:
+            print("❌ Stale articles were not served, or a request was sent past the budget")
+            return False
+        if status['used'] != 1 or status['remaining'] != 0 or not status['projected_exhaustion']:
+            print(f"❌ Quota status is wrong: {status}")
+            return False
+        
+        # Processes sharing the ledger file spend one budget between them
+        import tempfile
+        import time
+        from newsapi_quota import EXHAUSTED
+        path = os.path.join(tempfile.mkdtemp(), 'quota.json')
+        shared = NewsApiQuota(path=path, daily_budget=60, reserve=0)
+        # Each process loads the ledger, then all record at once, interleaved
+        script = ("import sys, time; from newsapi_quota import NewsApiQuota\n"
+                  "quota = NewsApiQuota(path=sys.argv[1], daily_budget=60)\n"
+                  "time.sleep(max(0, float(sys.argv[2]) - time.time()))\n"
+                  "for _ in range(20): quota.record_request('category:general'); time.sleep(0.005)")
+        start_at = str(time.time() + 3)
+        workers = [subprocess.Popen([sys.executable, "-c", script, path, start_at]) for _ in range(3)]
+        if any(worker.wait(timeout=60) for worker in workers):
+            print("❌ Quota writer process failed")
+            return False
+        if shared.status()['used'] != 60 or shared.decide('category:business') != EXHAUSTED:
+            print(f"❌ Other processes' requests were lost: {shared.status()['used']} of 60 counted")
+            return False
+        
+        print(f"✅ Budget spent after {status['used']} request; stale articles served, demand {status['keys']}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ NewsAPI quota test failed: {e}")
+        return False
+
+def test_digests():
+    """Test that a digest refresh only processes headlines new since the last digest"""
+    print("\n🗞️ Testing category digests...")
+    
+    try:
+        from benchmark import create_processor
+        from digest_refresher import DigestRefresher
+        from news_agent import NewsAgent
+        from news_fetcher import NewsFetcher
+        from standin_servers import start_newsapi_standin
+        
+        server = start_newsapi_standin()
+        try:
+            refresher = DigestRefresher('test', lambda: NewsAgent(
+                inference_workers=0, text_processor=create_processor('stub'),
+                news_fetcher=NewsFetcher(base_url=server.url)), categories=['general'], max_articles=3)
+            first = refresher.refresh('general')
+            second = refresher.refresh('general')
+        finally:
+            server.shutdown()
+        
+        if first is None or not first.articles or first.new_articles != len(first.articles):
+            print("❌ First refresh did not process the fetched headlines")
+            return False
+        if second.new_articles != 0 or [a['url'] for a in second.articles] != [a['url'] for a in first.articles]:
+            print("❌ Unchanged headlines were processed again")
+            return False
+        if sum(second.sentiment_stats.values()) != len(second.articles):
+            print("❌ Digest sentiment stats don't match its articles")
+            return False
+        
+        print(f"✅ Digest of {len(second.articles)} articles; refresh reprocessed {second.new_articles}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Digest test failed: {e}")
+        return False
+
+def test_article_enrichment():
+    """Test concurrent page download, main-text extraction and the URL cache"""
+    print("\n📄 Testing article enrichment...")
+    
+    try:
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from article_enricher import ArticleEnricher
+        
+        paragraph = "Officials said the new policy would take effect next month across all regions."
+        page = (f"<html><body><nav><p>Home | World | Business | Sports | Weather | Contact us today</p></nav>"
+                f"<article><h1>Headline</h1>{f'<p>{paragraph}</p>' * 5}<p>Share</p></article>"
+                f"<footer><p>Copyright 2024 Example News Group, all rights reserved worldwide.</p></footer>"
+                f"</body></html>").encode()
+        requests_served = []
+        
+        class PageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests_served.append(self.path)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            articles = [{'title': f"Story {i}", 'url': f"{base}/story/{i}", 'content': "Officials said… [+2400 chars]"}
+                        for i in range(4)]
+            enricher = ArticleEnricher(workers=4, per_domain_concurrency=2, domain_interval_ms=10)
+            enriched = enricher.enrich(articles)
+            enricher.enrich(articles)
+        finally:
+            server.shutdown()
+        
+        body = enriched[0]['content']
+        if body.count(paragraph) != 5 or 'Home' in body or 'Copyright' in body:
+            print(f"❌ Extracted text is wrong: {body[:120]!r}")
+            return False
+        if len(requests_served) != len(articles):
+            print(f"❌ Pages were downloaded {len(requests_served)} times for {len(articles)} URLs")
+            return False
+        
+        print(f"✅ Enriched {len(enriched)} articles to {len(body)} chars each; second pass served from cache")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Article enrichment test failed: {e}")
+        return False
+
+def test_entity_index():
+    """Test gazetteer extraction, entity filtering and per-entity sentiment"""
+    print("\n🏷️ Testing entity index...")
+    
+    try:
+        from entity_index import EntityIndex, GazetteerExtractor
+        
+        articles = [
+            {'url': 'https://example.com/1', 'title': "Apple and Microsoft report record earnings",
+             'sentiment': 'POSITIVE'},
+            {'url': 'https://example.com/2', 'title': "Apple Inc shares fall in Europe", 'sentiment': 'NEGATIVE'},
+            {'url': 'https://example.com/3', 'title': "Farmers expect a good apple harvest", 'sentiment': 'NEUTRAL'}
+        ]
+        index = EntityIndex(GazetteerExtractor(), max_articles=10)
+        ids = index.index_articles(articles)
+        
+        apple = index.filter_ids(ids, 'Apple')
+        if apple != ids[:2]:
+            print(f"❌ Filtering by Apple returned {apple}")
+            return False
+        facets = index.facets(ids)
+        if not facets or facets[0][:3] != ('Apple', 'ORG', 2):
+            print(f"❌ Unexpected facets: {facets}")
+            return False
+        rows = {row['entity']: row for row in index.sentiment_by_entity(ids)}
+        if rows['Apple']['POSITIVE'] != 1 or rows['Apple']['NEGATIVE'] != 1 or rows['Apple']['net_sentiment'] != 0:
+            print(f"❌ Unexpected Apple sentiment: {rows['Apple']}")
+            return False
+
+        # Re-processing an article with another sentiment updates the aggregates
+        index.index_articles([dict(articles[1], sentiment='POSITIVE')])
+        rows = {row['entity']: row for row in index.sentiment_by_entity(ids)}
+        if rows['Apple']['POSITIVE'] != 2 or rows['Apple']['NEGATIVE'] != 0:
+            print(f"❌ Apple sentiment not updated after re-processing: {rows['Apple']}")
+            return False
+
+        # Ambiguous names are not taken for the entities they can stand for
+        extractor = GazetteerExtractor()
+        for text in ("Bank of America raises its outlook", "WHO WILL WIN THE US OPEN?",
+                     "Fed up commuters protest", "Harris Teeter opens in Washington state"):
+            names = [name for name, _ in extractor.extract([text])[0]]
+            if names:
+                print(f"❌ Found {names} in {text!r}")
+                return False
+        names = [name for name, _ in extractor.extract(["U.S. stocks rise as the Fed holds rates"])[0]]
+        if names != ['United States', 'Federal Reserve']:
+            print(f"❌ Unexpected entities: {names}")
+            return False
+
+        print(f"✅ Indexed {index.stats()['entities']} entities; facets: {[name for name, _, _ in facets]}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Entity index test failed: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🚀 Testing News & Insights Agent")
@@ -127,7 +1462,33 @@ def main():
         test_config,
         test_news_fetcher,
         test_text_processor,
-        test_news_agent
+        test_news_agent,
+        test_decoding_profiles,
+        test_model_selector,
+        test_long_content,
+        test_inference_pool,
+        test_micro_batching,
+        test_model_warmup,
+        test_import_time,
+        test_batch_cli,
+        test_insights_service,
+        test_job_queue,
+        test_pagination,
+        test_article_pool,
+        test_article_model,
+        test_gemini_streaming,
+        test_token_ledger,
+        test_offline_benchmark,
+        test_standin_servers,
+        test_gemini_standin,
+        test_load_test,
+        test_telemetry,
+        test_profiling,
+        test_resilience,
+        test_newsapi_quota,
+        test_digests,
+        test_article_enrichment,
+        test_entity_index
     ]
     
     passed = 0
@@ -149,6 +1510,7 @@ def main():
         print("⚠️  Some tests failed. Please check the errors above.")
         print("Make sure all dependencies are installed:")
         print("  pip install -r requirements.txt")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,138 +1,471 @@
-from transformers import pipeline
-import torch
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import json
+import os
 import re
+import threading
+import time
+from config import (DECODING_PROFILES, DEFAULT_DECODING_PROFILE,
+                    DECODING_PROFILE_RESULTS, SUMMARIZATION_MODEL,
+                    SUMMARIZATION_MODEL_SMALL, SENTIMENT_MODEL,
+                    SENTIMENT_MODEL_SMALL, SUPPORTED_SUMMARIZATION_MODELS,
+                    SUPPORTED_SENTIMENT_MODELS, AUTO_MODEL_SELECTION,
+                    LONG_CONTENT_MODE, SUMMARY_WINDOW_TOKENS,
+                    SENTIMENT_WINDOW_TOKENS, WINDOW_OVERLAP_TOKENS, SUMMARY_MAX_REDUCE_ROUNDS,
+                    INFERENCE_BATCH_SIZE, MICRO_BATCHING)
+from model_selector import shared_selector
+from articles import Article, ProcessedArticle, analysis_text, as_article
+from profiling import span
+from telemetry import BATCH_SIZE, INFERENCE_ERRORS, INFERENCE_SECONDS, get_logger
+
+logger = get_logger(__name__)
+
+# Pipelines are shared by every TextProcessor in the process, keyed by (task, model id)
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+def load_pipeline(task: str, model_id: str):
+    """Load a Hugging Face pipeline once per process and reuse it"""
+    key = (task, model_id)
+    with _pipelines_lock:
+        if key not in _pipelines:
+            # torch and transformers are imported on first model load, not at import time
+            import torch
+            from transformers import pipeline
+            
+            logger.info("Loading model", task=task, model=model_id)
+            start = time.perf_counter()
+            _pipelines[key] = pipeline(
+                task,
+                model=model_id,
+                device=0 if torch.cuda.is_available() else -1
+            )
+            logger.info("Loaded model", task=task, model=model_id,
+                        duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        return _pipelines[key]
+
+def register_pipeline(task: str, model_id: str, model_pipeline):
+    """Make load_pipeline return an already-built pipeline, e.g. a stand-in model for load tests"""
+    with _pipelines_lock:
+        _pipelines[(task, model_id)] = model_pipeline
 
 class TextProcessor:
     """Handles text summarization and sentiment analysis using Hugging Face models"""
     
-    def __init__(self):
-        # Initialize summarization pipeline
-        self.summarizer = pipeline(
-            "summarization",
-            model="facebook/bart-large-cnn",
-            device=0 if torch.cuda.is_available() else -1
-        )
+    def __init__(self, decoding_profile: str = None,
+                 summarization_model: str = None, sentiment_model: str = None,
+                 summarization_model_small: str = None, sentiment_model_small: str = None,
+                 auto_model_selection: bool = AUTO_MODEL_SELECTION,
+                 use_batching: bool = MICRO_BATCHING, pipelines: Dict = None,
+                 preload: bool = True):
+        # Pre-built pipelines keyed by (task, model id) take precedence over loading
+        # (benchmark.py passes stand-in models this way)
+        self.pipelines = pipelines or {}
         
-        # Initialize sentiment analysis pipeline
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-            device=0 if torch.cuda.is_available() else -1
-        )
+        # Deployment-wide decoding profile, overridable per request
+        self.decoding_profile = self._resolve_profile(decoding_profile or DEFAULT_DECODING_PROFILE)
+        
+        # Model IDs for normal operation and for high load
+        self.summarization_model = summarization_model or SUMMARIZATION_MODEL
+        self.sentiment_model = sentiment_model or SENTIMENT_MODEL
+        self.summarization_model_small = summarization_model_small or SUMMARIZATION_MODEL_SMALL
+        self.sentiment_model_small = sentiment_model_small or SENTIMENT_MODEL_SMALL
+        for model_id in (self.summarization_model, self.summarization_model_small):
+            self._check_supported("summarization", model_id, SUPPORTED_SUMMARIZATION_MODELS)
+        for model_id in (self.sentiment_model, self.sentiment_model_small):
+            self._check_supported("sentiment-analysis", model_id, SUPPORTED_SENTIMENT_MODELS)
+        
+        # Load the default pipelines now, unless inference happens elsewhere (worker pool)
+        if preload:
+            # Initialize summarization pipeline
+            self.summarizer = self._get_pipeline("summarization", self.summarization_model)
+            
+            # Initialize sentiment analysis pipeline
+            self.sentiment_analyzer = self._get_pipeline("sentiment-analysis", self.sentiment_model)
+        
+        # Switches to the small models when queue depth or p95 latency is too high
+        self.model_selector = shared_selector if auto_model_selection else None
+        
+        # Single-text model calls go through the shared micro-batching server when enabled
+        self.inference_client = None
+        if use_batching:
+            from inference_server import InferenceClient
+            self.inference_client = InferenceClient()
+    
+    def _check_supported(self, task: str, model_id: str, supported: Dict[str, str]):
+        """Warn about a configured model whose labels and input limits haven't been checked"""
+        if model_id not in supported and (task, model_id) not in self.pipelines:
+            logger.warning("Model is not in the supported list; its output may be mapped incorrectly",
+                           task=task, model=model_id, supported=list(supported))
+    
+    def _get_pipeline(self, task: str, model_id: str):
+        """Get a loaded pipeline (small models load on first use)"""
+        if (task, model_id) in self.pipelines:
+            return self.pipelines[(task, model_id)]
+        return load_pipeline(task, model_id)
+    
+    def get_inference_stats(self) -> Optional[Dict[str, Dict]]:
+        """Micro-batching server stats (queue depth, batch sizes, latency), if batching is enabled"""
+        return self.inference_client.stats() if self.inference_client else None
+    
+    def select_models(self) -> Dict[str, str]:
+        """
+        Pick the models for the next request based on current load
+        
+        Returns:
+            Dictionary with 'summarization' and 'sentiment' model IDs
+        """
+        if self.model_selector and self.model_selector.use_small_model():
+            return {
+                'summarization': self.summarization_model_small,
+                'sentiment': self.sentiment_model_small
+            }
+        return {
+            'summarization': self.summarization_model,
+            'sentiment': self.sentiment_model
+        }
+    
+    def _resolve_profile(self, name: str) -> str:
+        """Return a known decoding profile name, falling back to 'balanced'"""
+        if name in DECODING_PROFILES:
+            return name
+        logger.warning("Unknown decoding profile, using 'balanced'", profile=name)
+        return 'balanced'
     
-    def summarize_text(self, text: str, max_length: int = 50, min_length: int = 10) -> str:
+    def get_decoding_profiles(self) -> Dict[str, Dict]:
+        """
+        Get available decoding profiles
+        
+        Returns:
+            Dictionary mapping profile name to its generation settings and its
+            latency/ROUGE numbers, or None for 'evaluation' until evaluate_profiles.py
+            has been run
+        """
+        results = {}
+        if os.path.exists(DECODING_PROFILE_RESULTS):
+            try:
+                with open(DECODING_PROFILE_RESULTS) as f:
+                    results = json.load(f).get('profiles', {})
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read decoding profile results",
+                               path=DECODING_PROFILE_RESULTS, error=str(e))
+        
+        return {
+            name: {'generation': dict(settings), 'evaluation': results.get(name)}
+            for name, settings in DECODING_PROFILES.items()
+        }
+    
+    def summarize_text(self, text: str, max_length: Optional[int] = None,
+                       min_length: Optional[int] = None, decoding_profile: str = None,
+                       model_id: str = None) -> str:
         """
         Summarize text using BART model
         
         Args:
             text: Input text to summarize
-            max_length: Maximum length of summary
-            min_length: Minimum length of summary
+            max_length: Maximum length of summary (overrides the profile)
+            min_length: Minimum length of summary (overrides the profile)
+            decoding_profile: Decoding profile name (fast, balanced, quality);
+                defaults to the processor's deployment profile
+            model_id: Summarization model to use (defaults to the configured model)
             
         Returns:
             Summarized text
         """
-        try:
-            # Clean and truncate text if too long
-            cleaned_text = self._clean_text(text)
-            if len(cleaned_text) > 1000:
-                cleaned_text = cleaned_text[:1000]
-            
-            if len(cleaned_text) < 50:
-                return cleaned_text
-            
-            # Generate summary
-            result = self.summarizer(
-                cleaned_text,
-                max_length=max_length,
-                min_length=min_length,
-                do_sample=False
-            )
-            
-            return result[0]['summary_text']
+        summary, _ = self._summary(text, model_id or self.summarization_model, decoding_profile,
+                                   max_length=max_length, min_length=min_length)
+        return summary
+    
+    def summarize_long_text(self, text: str, decoding_profile: str = None,
+                            model_id: str = None) -> str:
+        """
+        Summarize text of any length with map-reduce over token windows
+        
+        The text is split into overlapping token windows that are summarized in
+        batches; the window summaries are then summarized again until the result
+        fits in a single window (or SUMMARY_MAX_REDUCE_ROUNDS rounds have run).
+        
+        Args:
+            text: Input text to summarize
+            decoding_profile: Decoding profile name (optional)
+            model_id: Summarization model to use (optional)
             
+        Returns:
+            Summarized text
+        """
+        summary, _ = self._summary(text, model_id or self.summarization_model, decoding_profile,
+                                   long_content=True)
+        return summary
+    
+    def _summary(self, text: str, model_id: str, decoding_profile: str = None,
+                 long_content: bool = False, max_length: Optional[int] = None,
+                 min_length: Optional[int] = None) -> Tuple[str, bool]:
+        """Summary of text, and whether the model produced it (False: the leading text is used)"""
+        try:
+            if long_content:
+                return self._summarize_long(text, model_id, decoding_profile), True
+            return self._summarize(text, model_id, decoding_profile, max_length, min_length), True
+        except Exception as e:
+            INFERENCE_ERRORS.inc(task='summarization', model=model_id)
+            logger.exception("Summarization error", model=model_id, error=str(e))
+            return (text[:100] + "..." if len(text) > 100 else text), False
+    
+    def _summarize(self, text: str, model_id: str, decoding_profile: str = None,
+                   max_length: Optional[int] = None, min_length: Optional[int] = None) -> str:
+        summarizer = self._get_pipeline("summarization", model_id)
+        
+        # Clean and truncate text to the model's input limit in tokens
+        cleaned_text = self._clean_text(text)
+        cleaned_text = self._truncate_to_tokens(
+            cleaned_text, summarizer.tokenizer, self._max_input_tokens(summarizer, SUMMARY_WINDOW_TOKENS)
+        )
+        
+        if len(cleaned_text) < 50:
+            return cleaned_text
+        
+        # Generate summary
+        generation_kwargs = self._generation_kwargs(decoding_profile, max_length, min_length)
+        with span('inference', task='summarization', model=model_id), \
+                INFERENCE_SECONDS.time(task='summarization', model=model_id):
+            if self.inference_client:
+                return self.inference_client.summarize(cleaned_text, model_id, generation_kwargs)
+            result = summarizer(cleaned_text, **generation_kwargs)
+        
+        return result[0]['summary_text']
+    
+    def _summarize_long(self, text: str, model_id: str, decoding_profile: str = None) -> str:
+        try:
+            return self._map_reduce(text, model_id, decoding_profile)
         except Exception as e:
-            print(f"Summarization error: {e}")
-            return text[:100] + "..." if len(text) > 100 else text
+            INFERENCE_ERRORS.inc(task='summarization_windows', model=model_id)
+            logger.exception("Long-content summarization error", model=model_id, error=str(e))
+            return self._summarize(text, model_id, decoding_profile)
+    
+    def _map_reduce(self, text: str, model_id: str, decoding_profile: str = None, rounds: int = 0) -> str:
+        summarizer = self._get_pipeline("summarization", model_id)
+        window = self._max_input_tokens(summarizer, SUMMARY_WINDOW_TOKENS)
+        cleaned_text = self._clean_text(text)
+        
+        windows = self._token_windows(cleaned_text, summarizer.tokenizer, window, WINDOW_OVERLAP_TOKENS)
+        if len(windows) <= 1:
+            return self._summarize(cleaned_text, model_id, decoding_profile)
+        if rounds >= SUMMARY_MAX_REDUCE_ROUNDS:
+            # Summaries aren't shrinking (window too small for the profile's max_length);
+            # summarize what fits in one window
+            logger.warning("Map-reduce did not converge; truncating", model=model_id,
+                           rounds=rounds, windows=len(windows))
+            return self._summarize(cleaned_text, model_id, decoding_profile)
+        
+        # Map: summarize every window, batched through the pipeline
+        generation_kwargs = self._generation_kwargs(decoding_profile)
+        BATCH_SIZE.observe(len(windows), batcher='long_content_summarization')
+        with span('inference', task='summarization_windows', model=model_id, windows=len(windows)), \
+                INFERENCE_SECONDS.time(task='summarization_windows', model=model_id):
+            results = summarizer(windows, batch_size=INFERENCE_BATCH_SIZE, **generation_kwargs)
+        partial_summaries = [result['summary_text'] for result in results]
+        
+        # Reduce: summarize the joined window summaries (recursing if still too long)
+        return self._map_reduce(' '.join(partial_summaries), model_id, decoding_profile, rounds + 1)
     
-    def analyze_sentiment(self, text: str) -> Dict[str, str]:
+    def analyze_sentiment(self, text: str, model_id: str = None) -> Dict[str, str]:
         """
         Analyze sentiment of text
         
         Args:
             text: Input text to analyze
+            model_id: Sentiment model to use (defaults to the configured model)
             
         Returns:
             Dictionary with sentiment label and confidence
         """
+        sentiment, _ = self._sentiment(text, model_id or self.sentiment_model)
+        return sentiment
+    
+    def _sentiment(self, text: str, model_id: str) -> Tuple[Dict[str, str], bool]:
+        """Sentiment of text, and whether the model produced it (False: the NEUTRAL default)"""
         try:
             # Clean text
             cleaned_text = self._clean_text(text)
             
             if len(cleaned_text) < 10:
-                return {"label": "NEUTRAL", "confidence": 0.5}
-            
-            # Analyze sentiment
-            result = self.sentiment_analyzer(cleaned_text)
+                return {"label": "NEUTRAL", "confidence": 0.5}, False
             
-            # Map sentiment labels
-            sentiment_mapping = {
-                'LABEL_0': 'NEGATIVE',
-                'LABEL_1': 'NEUTRAL', 
-                'LABEL_2': 'POSITIVE'
-            }
+            # Split into windows that fit the model instead of overflowing its input limit
+            analyzer = self._get_pipeline("sentiment-analysis", model_id)
+            windows = self._token_windows(
+                cleaned_text, analyzer.tokenizer,
+                self._max_input_tokens(analyzer, SENTIMENT_WINDOW_TOKENS), WINDOW_OVERLAP_TOKENS
+            )
             
-            label = sentiment_mapping.get(result[0]['label'], 'NEUTRAL')
-            confidence = result[0]['score']
+            # Analyze sentiment
+            with span('inference', task='sentiment', model=model_id, windows=len(windows)), \
+                    INFERENCE_SECONDS.time(task='sentiment', model=model_id):
+                if len(windows) == 1:
+                    if self.inference_client:
+                        result = [self.inference_client.classify(windows[0], model_id)]
+                    else:
+                        result = analyzer(windows[0])
+                    label = self._normalize_label(result[0]['label'])
+                    confidence = result[0]['score']
+                else:
+                    BATCH_SIZE.observe(len(windows), batcher='long_content_sentiment')
+                    label, confidence = self._aggregate_window_sentiment(analyzer, windows)
             
             return {
                 "label": label,
                 "confidence": round(confidence, 2)
-            }
+            }, True
             
         except Exception as e:
-            print(f"Sentiment analysis error: {e}")
-            return {"label": "NEUTRAL", "confidence": 0.5}
+            INFERENCE_ERRORS.inc(task='sentiment', model=model_id)
+            logger.exception("Sentiment analysis error", model=model_id, error=str(e))
+            return {"label": "NEUTRAL", "confidence": 0.5}, False
+    
+    def _aggregate_window_sentiment(self, analyzer, windows: List[str]):
+        """Average per-class scores across windows, weighted by window length"""
+        results = analyzer(windows, batch_size=INFERENCE_BATCH_SIZE, top_k=None)
+        
+        totals = {}
+        total_weight = 0
+        for window, scores in zip(windows, results):
+            weight = len(window)
+            total_weight += weight
+            for score in scores:
+                label = self._normalize_label(score['label'])
+                totals[label] = totals.get(label, 0.0) + score['score'] * weight
+        
+        label = max(totals, key=totals.get)
+        return label, totals[label] / total_weight
+    
+    def _generation_kwargs(self, decoding_profile: str = None, max_length: Optional[int] = None,
+                           min_length: Optional[int] = None) -> Dict:
+        """Build summarizer generation settings from a decoding profile"""
+        profile = self._resolve_profile(decoding_profile) if decoding_profile else self.decoding_profile
+        generation_kwargs = dict(DECODING_PROFILES[profile])
+        if max_length is not None:
+            generation_kwargs['max_length'] = max_length
+        if min_length is not None:
+            generation_kwargs['min_length'] = min_length
+        return generation_kwargs
+    
+    def _max_input_tokens(self, model_pipeline, limit: int) -> int:
+        """Input budget in tokens: the configured limit capped by the model's own limit"""
+        model_max = getattr(model_pipeline.tokenizer, 'model_max_length', limit) or limit
+        # Leave room for the special tokens added around the input
+        return min(limit, model_max - 2)
+    
+    def _truncate_to_tokens(self, text: str, tokenizer, max_tokens: int) -> str:
+        """Truncate text to at most max_tokens model tokens without cutting a token in half"""
+        windows = self._token_windows(text, tokenizer, max_tokens, 0)
+        return windows[0] if windows else text
+    
+    def _token_windows(self, text: str, tokenizer, window: int, overlap: int) -> List[str]:
+        """
+        Split text into windows of at most `window` tokens
+        
+        Windows are cut on token boundaries using the tokenizer's character offsets,
+        so the original text is preserved exactly inside each window.
+        """
+        if not text:
+            return []
+        
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoding['offset_mapping']
+        if len(offsets) <= window:
+            return [text]
+        
+        windows = []
+        step = max(1, window - overlap)
+        for start in range(0, len(offsets), step):
+            chunk = offsets[start:start + window]
+            windows.append(text[chunk[0][0]:chunk[-1][1]].strip())
+            if start + window >= len(offsets):
+                break
+        return windows
+    
+    def _normalize_label(self, label: str) -> str:
+        """Map model-specific sentiment labels to POSITIVE/NEGATIVE/NEUTRAL"""
+        # Older checkpoints emit LABEL_n, newer ones emit the label names
+        sentiment_mapping = {
+            'LABEL_0': 'NEGATIVE',
+            'LABEL_1': 'NEUTRAL', 
+            'LABEL_2': 'POSITIVE'
+        }
+        if label in sentiment_mapping:
+            return sentiment_mapping[label]
+        
+        label = label.upper()
+        return label if label in ('POSITIVE', 'NEGATIVE', 'NEUTRAL') else 'NEUTRAL'
     
     def _clean_text(self, text: str) -> str:
         """Clean and preprocess text"""
         if not text:
             return ""
         
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:-]', '', text)
+        with span('clean'):
+            # Remove HTML tags
+            text = re.sub(r'<[^>]+>', '', text)
+            
+            # Remove extra whitespace
+            text = re.sub(r'\s+', ' ', text)
+            
+            # Remove special characters but keep basic punctuation
+            text = re.sub(r'[^\w\s.,!?;:-]', '', text)
+            
+            return text.strip()
+    
+    def article_text(self, article: Article, long_content: bool = False) -> str:
+        """
+        Build the text to analyze for an article
         
-        return text.strip()
+        Args:
+            article: Article (or NewsAPI dictionary) with title, description, content
+            long_content: Include the article body from `content`
+            
+        Returns:
+            Title and description, followed by the body in long-content mode
+        """
+        return analysis_text(article, long_content)
     
-    def process_article(self, article: Dict) -> Dict:
+    def process_article(self, article: Article, decoding_profile: str = None,
+                        long_content: bool = None, models: Dict[str, str] = None) -> ProcessedArticle:
         """
         Process a single article with summarization and sentiment analysis
         
         Args:
-            article: Article dictionary with title, description, content
+            article: Article (or NewsAPI dictionary) with title, description, content
+            decoding_profile: Summarization decoding profile (optional)
+            long_content: Summarize the full `content` with map-reduce
+                (defaults to LONG_CONTENT_MODE)
+            models: 'summarization' and 'sentiment' model IDs to use (default: picked
+                by current load, see select_models)
             
         Returns:
-            Enhanced article dictionary with summary and sentiment
+            The article with summary, sentiment and the models used
         """
-        # Combine title and description for analysis
-        full_text = f"{article.get('title', '')} {article.get('description', '')}"
+        if long_content is None:
+            long_content = LONG_CONTENT_MODE
+        article = as_article(article)
+        
+        # Combine title and description (and the body in long-content mode) for analysis
+        full_text = self.article_text(article, long_content)
+        
+        # Pick full-size or small models depending on load
+        models = models or self.select_models()
+        start = time.perf_counter()
         
         # Generate summary
-        summary = self.summarize_text(full_text)
+        with span('summarize', model=models['summarization'], long_content=long_content):
+            summary, summarized = self._summary(full_text, models['summarization'], decoding_profile,
+                                                long_content=long_content)
         
         # Analyze sentiment
-        sentiment = self.analyze_sentiment(full_text)
+        with span('sentiment', model=models['sentiment']):
+            sentiment, classified = self._sentiment(full_text, models['sentiment'])
         
-        # Add processed data to article
-        article['summary'] = summary
-        article['sentiment'] = sentiment['label']
-        article['sentiment_confidence'] = sentiment['confidence']
+        if self.model_selector:
+            self.model_selector.record_latency((time.perf_counter() - start) * 1000)
         
-        return article
+        # A model is only credited with results it produced, not with the fallbacks
+        return article.processed(summary, sentiment['label'], sentiment['confidence'],
+                                 summary_model=models['summarization'] if summarized else None,
+                                 sentiment_model=models['sentiment'] if classified else None)
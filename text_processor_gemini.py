@@ -1,73 +1,230 @@
-import google.generativeai as genai
-from typing import Dict
+from typing import Callable, Dict, Iterator, Tuple
+from collections import deque
 import re
-from config import GEMINI_API_KEY
+import threading
+import time
+from articles import Article, ProcessedArticle, analysis_text, as_article
+from prompts import SUMMARY_PROMPT, SENTIMENT_PROMPT, render
+from token_ledger import get_token_ledger
+from profiling import span
+from resilience import CircuitBreaker, get_circuit_breaker, get_hedger, upstream_failure
+from telemetry import GEMINI_TOKENS, INFERENCE_ERRORS, INFERENCE_SECONDS, get_logger
+from config import (GEMINI_API_KEY, GEMINI_API_ENDPOINT, GEMINI_MAX_INPUT_TOKENS,
+                    GEMINI_CHARS_PER_TOKEN, LONG_CONTENT_MODE, GEMINI_HEDGING)
+
+logger = get_logger(__name__)
+
+GEMINI_MODEL = 'gemini-1.5-flash'
 
 class TextProcessorGemini:
     """Handles text summarization and sentiment analysis using Gemini API"""
     
-    def __init__(self):
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
+    def __init__(self, model=None, api_endpoint: str = None):
+        """
+        Args:
+            model: Object with a GenerativeModel-compatible generate_content (optional)
+            api_endpoint: Gemini REST endpoint to use instead of Google's, such as a
+                stand-in server (defaults to GEMINI_API_ENDPOINT)
+        """
+        api_endpoint = api_endpoint or GEMINI_API_ENDPOINT
+        if model is not None:
+            self.model = model
+        else:
+            if not GEMINI_API_KEY and not api_endpoint:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            
+            # Configure Gemini (the SDK is imported here to keep module import cheap)
+            import google.generativeai as genai
+            if api_endpoint:
+                # Stand-in servers speak the REST protocol; the endpoint applies process-wide
+                genai.configure(api_key=GEMINI_API_KEY or 'stand-in', transport='rest',
+                                client_options={'api_endpoint': api_endpoint})
+            else:
+                genai.configure(api_key=GEMINI_API_KEY)
+            self.model = genai.GenerativeModel(GEMINI_MODEL)
+        
+        # Token usage and the daily budget are shared by every processor in the process
+        self.ledger = get_token_ledger()
         
-        # Configure Gemini
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Recent summary call latencies: time to first token and to completion
+        self._latency_lock = threading.Lock()
+        self._first_token_ms = deque(maxlen=1000)
+        self._total_ms = deque(maxlen=1000)
+        
+        # Shared per endpoint, so every processor stops calling Gemini while it is down
+        self.breaker = get_circuit_breaker('gemini:generateContent')
+        self.stream_breaker = get_circuit_breaker('gemini:streamGenerateContent')
+        self.hedger = get_hedger('gemini:generateContent', enabled=GEMINI_HEDGING)
     
-    def summarize_text(self, text: str, max_length: int = 200) -> str:
+    def summarize_text(self, text: str, max_length: int = 200,
+                       on_chunk: Callable[[str], None] = None) -> str:
         """
         Summarize text using Gemini API
         
         Args:
             text: Input text to summarize
             max_length: Maximum length of summary
+            on_chunk: If given, the summary is streamed and this is called with the
+                text generated so far after every chunk
             
         Returns:
             Summarized text
         """
+        return self._summary(text, max_length, on_chunk)[0]
+    
+    def _summary(self, text: str, max_length: int = 200,
+                 on_chunk: Callable[[str], None] = None) -> Tuple[str, bool]:
+        """Summary of text, and whether Gemini produced it (False: the leading text is used)"""
         try:
-            # Clean and truncate text if too long
-            cleaned_text = self._clean_text(text)
-            if len(cleaned_text) > 2000:  # Gemini has token limits
-                cleaned_text = cleaned_text[:2000]
+            # Clean and truncate text to the input token budget
+            cleaned_text = self._truncate_to_tokens(self._clean_text(text), GEMINI_MAX_INPUT_TOKENS)
             
             if len(cleaned_text) < 50:
-                return cleaned_text
-            
-            prompt = f"""
-            Please provide a concise summary of the following news article in 2-3 sentences. Make sure the summary is complete and not cut off:
-            
-            {cleaned_text}
-            
-            Summary:
-            """
-            
-            response = self.model.generate_content(prompt)
-            summary = response.text.strip()
-            
-            # Ensure summary is complete and not cut off
-            if len(summary) > max_length:
-                # Find the last complete sentence
-                sentences = summary.split('. ')
-                if len(sentences) > 1:
-                    # Keep all complete sentences
-                    complete_sentences = []
-                    current_length = 0
-                    for sentence in sentences:
-                        if current_length + len(sentence) + 2 <= max_length:  # +2 for '. '
-                            complete_sentences.append(sentence)
-                            current_length += len(sentence) + 2
-                        else:
-                            break
-                    summary = '. '.join(complete_sentences) + '.'
-                else:
-                    summary = summary[:max_length-3] + "..."
+                return cleaned_text, True
             
-            return summary
+            if on_chunk:
+                summary = ''
+                for chunk in self._stream_summary(cleaned_text):
+                    summary += chunk
+                    on_chunk(summary)
+            else:
+                start = time.perf_counter()
+                summary = self._generate('summary', render(SUMMARY_PROMPT, article=cleaned_text))
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                # Without streaming the first token arrives with the last
+                self._record_latency(elapsed_ms, elapsed_ms)
+            
+            return self._complete_sentences(summary.strip(), max_length), True
             
         except Exception as e:
-            print(f"Summarization error: {e}")
-            return text[:100] + "..." if len(text) > 100 else text
+            INFERENCE_ERRORS.inc(task='summarization', model=GEMINI_MODEL)
+            logger.exception("Summarization error", model=GEMINI_MODEL, error=str(e))
+            return (text[:100] + "..." if len(text) > 100 else text), False
+    
+    def summarize_text_stream(self, text: str) -> Iterator[str]:
+        """
+        Summarize text using Gemini API, yielding the summary as it is generated
+        
+        Args:
+            text: Input text to summarize
+            
+        Yields:
+            Summary text chunks (unlike summarize_text, not cut to a maximum length)
+        """
+        cleaned_text = self._truncate_to_tokens(self._clean_text(text), GEMINI_MAX_INPUT_TOKENS)
+        if len(cleaned_text) < 50:
+            yield cleaned_text
+            return
+        yield from self._stream_summary(cleaned_text)
+    
+    def _generate(self, kind: str, prompt: str) -> str:
+        """One Gemini call within the daily token budget, with its token usage recorded"""
+        self.ledger.check(self._estimate_tokens(prompt))
+        task = 'summarization' if kind == 'summary' else kind
+        
+        def attempt():
+            # A hedged duplicate is a real call, so each attempt records its own usage
+            with span('inference', task=task, model=GEMINI_MODEL), \
+                    INFERENCE_SECONDS.time(task=task, model=GEMINI_MODEL):
+                response = self.model.generate_content(prompt)
+                text = response.text
+            self._record_usage(kind, prompt, response, text)
+            return text
+        
+        return self.breaker.call(lambda: self.hedger.call(attempt), is_failure=upstream_failure)
+    
+    def _stream_summary(self, cleaned_text: str) -> Iterator[str]:
+        """Stream a summary, recording latency to the first chunk and to the last"""
+        prompt = render(SUMMARY_PROMPT, article=cleaned_text)
+        self.ledger.check(self._estimate_tokens(prompt))
+        start = time.perf_counter()
+        first_token_ms = None
+        summary = ''
+        
+        with self.stream_breaker.attempt(upstream_failure), \
+                span('inference', task='summarization', model=GEMINI_MODEL, stream=True) as inference_span:
+            response = self.model.generate_content(prompt, stream=True)
+            for chunk in response:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                    if inference_span:
+                        inference_span.attributes['first_token_ms'] = round(first_token_ms, 1)
+                if chunk.text:
+                    summary += chunk.text
+                    yield chunk.text
+        
+        total_ms = (time.perf_counter() - start) * 1000
+        INFERENCE_SECONDS.observe(total_ms / 1000, task='summarization', model=GEMINI_MODEL)
+        self._record_latency(first_token_ms if first_token_ms is not None else total_ms, total_ms)
+        self._record_usage('summary', prompt, response, summary)
+    
+    def circuit_open(self) -> bool:
+        """Whether Gemini calls are currently being rejected after repeated failures"""
+        return self.breaker.state == CircuitBreaker.OPEN
+    
+    def _estimate_tokens(self, text: str) -> int:
+        return len(text) // GEMINI_CHARS_PER_TOKEN + 1
+    
+    def _record_usage(self, kind: str, prompt: str, response, output_text: str):
+        """Record a call's tokens, as counted by Gemini when the SDK reports usage_metadata"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage and getattr(usage, 'prompt_token_count', None):
+            input_tokens = usage.prompt_token_count
+            output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        else:
+            input_tokens = self._estimate_tokens(prompt)
+            output_tokens = self._estimate_tokens(output_text)
+        self.ledger.record(kind, input_tokens, output_tokens)
+        GEMINI_TOKENS.inc(input_tokens, call=kind, direction='input')
+        GEMINI_TOKENS.inc(output_tokens, call=kind, direction='output')
+    
+    def get_token_usage(self) -> Dict:
+        """Today's Gemini token usage, per call type and per article, and budget left"""
+        return self.ledger.usage()
+    
+    def _complete_sentences(self, summary: str, max_length: int) -> str:
+        """Ensure summary fits max_length without being cut off mid-sentence"""
+        if len(summary) <= max_length:
+            return summary
+        
+        # Find the last complete sentence
+        sentences = summary.split('. ')
+        if len(sentences) > 1:
+            # Keep all complete sentences
+            complete_sentences = []
+            current_length = 0
+            for sentence in sentences:
+                if current_length + len(sentence) + 2 <= max_length:  # +2 for '. '
+                    complete_sentences.append(sentence)
+                    current_length += len(sentence) + 2
+                else:
+                    break
+            return '. '.join(complete_sentences) + '.'
+        return summary[:max_length-3] + "..."
+    
+    def _record_latency(self, first_token_ms: float, total_ms: float):
+        with self._latency_lock:
+            self._first_token_ms.append(first_token_ms)
+            self._total_ms.append(total_ms)
+    
+    def get_latency_stats(self) -> Dict:
+        """Percentiles of recent summary latency to the first token and to completion"""
+        with self._latency_lock:
+            first_token = sorted(self._first_token_ms)
+            total = sorted(self._total_ms)
+        
+        def pct(latencies, p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 1)
+        
+        return {
+            'calls': len(total),
+            'first_token_ms_p50': pct(first_token, 50),
+            'first_token_ms_p95': pct(first_token, 95),
+            'total_ms_p50': pct(total, 50),
+            'total_ms_p95': pct(total, 95)
+        }
     
     def analyze_sentiment(self, text: str) -> Dict[str, str]:
         """
@@ -79,26 +236,19 @@ class TextProcessorGemini:
         Returns:
             Dictionary with sentiment label and confidence
         """
+        return self._sentiment(text)[0]
+    
+    def _sentiment(self, text: str) -> Tuple[Dict[str, str], bool]:
+        """Sentiment of text, and whether Gemini produced it (False: the NEUTRAL default)"""
         try:
-            # Clean text
-            cleaned_text = self._clean_text(text)
+            # Clean text and keep it within the input token budget
+            cleaned_text = self._truncate_to_tokens(self._clean_text(text), GEMINI_MAX_INPUT_TOKENS)
             
             if len(cleaned_text) < 10:
-                return {"label": "NEUTRAL", "confidence": 0.5}
-            
-            prompt = f"""
-            Analyze the sentiment of this news article. Consider the overall tone, implications, and impact.
-            - POSITIVE: Good news, achievements, progress, success, benefits
-            - NEGATIVE: Bad news, problems, failures, crises, losses, conflicts
-            - NEUTRAL: Factual reporting, announcements, updates without clear positive/negative tone
-            
-            Article: {cleaned_text}
-            
-            Respond with only one word: POSITIVE, NEGATIVE, or NEUTRAL
-            """
+                return {"label": "NEUTRAL", "confidence": 0.5}, False
             
-            response = self.model.generate_content(prompt)
-            sentiment = response.text.strip().upper()
+            response = self._generate('sentiment', render(SENTIMENT_PROMPT, article=cleaned_text))
+            sentiment = response.strip().upper().rstrip('.')
             
             # Validate response
             if sentiment not in ["POSITIVE", "NEGATIVE", "NEUTRAL"]:
@@ -110,50 +260,75 @@ class TextProcessorGemini:
             return {
                 "label": sentiment,
                 "confidence": confidence
-            }
+            }, True
             
         except Exception as e:
-            print(f"Sentiment analysis error: {e}")
-            return {"label": "NEUTRAL", "confidence": 0.5}
+            INFERENCE_ERRORS.inc(task='sentiment', model=GEMINI_MODEL)
+            logger.exception("Sentiment analysis error", model=GEMINI_MODEL, error=str(e))
+            return {"label": "NEUTRAL", "confidence": 0.5}, False
+    
+    def _truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """
+        Truncate text to an estimated token budget on a word boundary
+        
+        Gemini tokenizes server-side, so the budget is estimated from characters
+        and the cut is moved back to the last whitespace to avoid splitting a word.
+        """
+        max_chars = max_tokens * GEMINI_CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        
+        cut = text.rfind(' ', 0, max_chars)
+        return text[:cut if cut > 0 else max_chars].rstrip()
     
     def _clean_text(self, text: str) -> str:
         """Clean and preprocess text"""
         if not text:
             return ""
         
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?;:-]', '', text)
-        
-        return text.strip()
+        with span('clean'):
+            # Remove HTML tags
+            text = re.sub(r'<[^>]+>', '', text)
+            
+            # Remove extra whitespace
+            text = re.sub(r'\s+', ' ', text)
+            
+            # Remove special characters but keep basic punctuation
+            text = re.sub(r'[^\w\s.,!?;:-]', '', text)
+            
+            return text.strip()
     
-    def process_article(self, article: Dict) -> Dict:
+    def process_article(self, article: Article, long_content: bool = None,
+                        on_summary_chunk: Callable[[str], None] = None) -> ProcessedArticle:
         """
         Process a single article with summarization and sentiment analysis
         
         Args:
-            article: Article dictionary with title, description, content
+            article: Article (or NewsAPI dictionary) with title, description, content
+            long_content: Include the article body from `content` (defaults to LONG_CONTENT_MODE)
+            on_summary_chunk: Stream the summary, calling this with the text so far
             
         Returns:
-            Enhanced article dictionary with summary and sentiment
+            The article with summary and sentiment
         """
-        # Combine title and description for analysis
-        full_text = f"{article.get('title', '')} {article.get('description', '')}"
+        if long_content is None:
+            long_content = LONG_CONTENT_MODE
+        article = as_article(article)
+        
+        # Combine title and description (and the body in long-content mode) for analysis
+        full_text = analysis_text(article, long_content)
         
         # Generate summary
-        summary = self.summarize_text(full_text)
+        with span('summarize', model=GEMINI_MODEL, stream=on_summary_chunk is not None):
+            summary, summarized = self._summary(full_text, on_chunk=on_summary_chunk)
         
         # Analyze sentiment
-        sentiment = self.analyze_sentiment(full_text)
-        
-        # Add processed data to article
-        article['summary'] = summary
-        article['sentiment'] = sentiment['label']
-        article['sentiment_confidence'] = sentiment['confidence']
+        with span('sentiment', model=GEMINI_MODEL):
+            sentiment, classified = self._sentiment(full_text)
+        self.ledger.record_article()
         
-        return article
+        # Gemini is only credited with results it produced, not with the fallbacks,
+        # so pooled fallback records never replace real ones (see article_pool.pool_key)
+        return article.processed(summary, sentiment['label'], sentiment['confidence'],
+                                 summary_model=GEMINI_MODEL if summarized else None,
+                                 sentiment_model=GEMINI_MODEL if classified else None)
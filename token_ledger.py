@@ -0,0 +1,132 @@
+import copy
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from config import GEMINI_DAILY_TOKEN_BUDGET, GEMINI_TOKEN_LEDGER
+from ledger_file import LedgerFile
+
+# Days of usage kept in the ledger file
+HISTORY_DAYS = 30
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """Raised instead of making a call once today's token budget is spent"""
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class TokenLedger:
+    """
+    Per-day record of Gemini input/output tokens by call type, with a daily budget
+
+    Usage is persisted to a JSON file so the budget holds across restarts, and is
+    shared by every process using the same file (see ledger_file.py).
+    """
+
+    def __init__(self, path: Optional[str] = GEMINI_TOKEN_LEDGER,
+                 daily_budget: int = GEMINI_DAILY_TOKEN_BUDGET):
+        self.path = path
+        self.daily_budget = daily_budget
+        self._lock = threading.Lock()
+        self._file = LedgerFile(path, 'gemini_tokens') if path else None
+        self._days = (self._file.read() if self._file else None) or {}
+
+    def _refresh(self, force: bool = False):
+        """Pick up other processes' usage from the file (lock held)"""
+        if self._file and (force or self._file.changed()):
+            days = self._file.read()
+            if days is not None:
+                self._days = days
+
+    @contextmanager
+    def _updating(self):
+        """Apply a change to the latest usage on disk and save it, under both locks"""
+        with self._lock, (self._file.locked() if self._file else nullcontext()):
+            self._refresh(force=True)
+            yield
+            self._save()
+
+    def _day(self, day: str) -> Dict:
+        return self._days.setdefault(day, {'input_tokens': 0, 'output_tokens': 0,
+                                           'calls': {}, 'articles': 0})
+
+    def check(self, estimated_tokens: int = 0):
+        """
+        Make sure a call fits in today's budget
+
+        Args:
+            estimated_tokens: Expected tokens for the call about to be made
+
+        Raises:
+            TokenBudgetExceeded: If the call would take today's usage past the budget
+        """
+        if not self.daily_budget:
+            return
+        with self._lock:
+            self._refresh()
+            day = self._days.get(_today(), {})
+            used = day.get('input_tokens', 0) + day.get('output_tokens', 0)
+        if used + estimated_tokens > self.daily_budget:
+            raise TokenBudgetExceeded(
+                f"Daily Gemini token budget of {self.daily_budget} reached ({used} used today)"
+            )
+
+    def record(self, kind: str, input_tokens: int, output_tokens: int):
+        """Add one call's token usage to today's totals"""
+        with self._updating():
+            day = self._day(_today())
+            day['input_tokens'] += input_tokens
+            day['output_tokens'] += output_tokens
+            calls = day['calls'].setdefault(kind, {'count': 0, 'input_tokens': 0, 'output_tokens': 0})
+            calls['count'] += 1
+            calls['input_tokens'] += input_tokens
+            calls['output_tokens'] += output_tokens
+
+    def record_article(self):
+        """Count one processed article, for tokens-per-article figures"""
+        with self._updating():
+            self._day(_today())['articles'] += 1
+
+    def _save(self):
+        for day in sorted(self._days)[:-HISTORY_DAYS]:
+            del self._days[day]
+        if self._file:
+            self._file.write(self._days)
+
+    def usage(self, day: str = None) -> Dict:
+        """
+        Token usage for one day (default: today)
+
+        Returns:
+            Input/output totals, per-call-type breakdown, tokens per article and budget left
+        """
+        with self._lock:
+            self._refresh()
+            usage = copy.deepcopy(self._days.get(day or _today(), {}))
+        usage.setdefault('input_tokens', 0)
+        usage.setdefault('output_tokens', 0)
+        usage.setdefault('calls', {})
+        usage.setdefault('articles', 0)
+
+        total = usage['input_tokens'] + usage['output_tokens']
+        usage['day'] = day or _today()
+        usage['tokens_per_article'] = round(total / usage['articles'], 1) if usage['articles'] else None
+        usage['budget'] = self.daily_budget or None
+        usage['budget_remaining'] = max(0, self.daily_budget - total) if self.daily_budget else None
+        return usage
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_token_ledger() -> TokenLedger:
+    """Get the process-wide token ledger"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TokenLedger()
+        return _ledger
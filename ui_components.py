@@ -0,0 +1,364 @@
+import html
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import streamlit as st
+from job_queue import get_job_queue
+from article_pool import get_article_pool
+from entity_index import ENTITY_TYPES, get_entity_index
+from newsapi_quota import get_newsapi_quota
+from profiling import get_profile_store
+from config import SENTIMENT_LABELS, ARTICLES_PER_PAGE
+
+# get_news_insights options that change the summaries and sentiments themselves
+PROCESSING_OPTIONS = ('decoding_profile', 'long_content')
+
+SENTIMENT_COLORS = {
+    'POSITIVE': '#28a745',
+    'NEGATIVE': '#dc3545',
+    'NEUTRAL': '#6c757d'
+}
+
+PAGE_CSS = """
+<style>
+    .news-card {
+        border: 1px solid #ddd;
+        border-radius: 10px;
+        padding: 15px;
+        margin: 10px 0;
+        background-color: #f9f9f9;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .sentiment-positive {
+        color: #28a745;
+        font-weight: bold;
+    }
+    .sentiment-negative {
+        color: #dc3545;
+        font-weight: bold;
+    }
+    .sentiment-neutral {
+        color: #6c757d;
+        font-weight: bold;
+    }
+    .metric-card {
+        background-color: #f8f9fa;
+        padding: 15px;
+        border-radius: 8px;
+        text-align: center;
+        border-left: 4px solid #007bff;
+    }
+</style>
+"""
+
+# One card template shared by app.py, app_gemini.py and app_simple.py
+ARTICLE_CARD_TEMPLATE = """<div class="news-card">
+<h3>{title}</h3>
+<p><strong>Source:</strong> {source} | <strong>Published:</strong> {published}</p>
+<p><strong>Summary:</strong> {summary}</p>
+<p><strong>Sentiment:</strong> <span class="sentiment-{sentiment_class}">{emoji} {sentiment} ({confidence:.2f})</span></p>
+<p><strong>Original Description:</strong> {description}...</p>
+<p><a href="{url}" target="_blank">Read Full Article →</a></p>
+</div>"""
+
+
+def setup_page():
+    """Page configuration and styling shared by all the apps (call before any other st.* call)"""
+    st.set_page_config(
+        page_title="News & Insights Agent",
+        page_icon="📰",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+
+def session_articles(sentiment: str = None, entity: str = None) -> List[Dict]:
+    """
+    This session's articles from the shared pool, optionally filtered by sentiment and entity
+
+    Sessions only keep article IDs; the records live once in the process-wide pool.
+    """
+    pool = get_article_pool()
+    article_ids = st.session_state.get('article_ids', [])
+    if entity:
+        article_ids = get_entity_index().filter_ids(article_ids, entity)
+    if sentiment:
+        article_ids = pool.filter_ids(article_ids, sentiment)
+    return pool.get_many(article_ids)
+
+
+def entity_filter() -> Optional[str]:
+    """
+    Select box of the companies, people and places in this session's articles
+
+    New articles are indexed in one batch; on reruns the facets are index lookups.
+
+    Returns:
+        The selected entity, or None for all articles
+    """
+    article_ids = st.session_state.get('article_ids', [])
+    index = get_entity_index()
+    index.ensure_indexed(article_ids)
+    facets = {entity: (entity_type, count) for entity, entity_type, count in index.facets(article_ids)}
+    if not facets:
+        return None
+
+    def label(entity):
+        if entity == "All":
+            return entity
+        entity_type, count = facets[entity]
+        return f"{entity} · {ENTITY_TYPES.get(entity_type, entity_type)} ({count})"
+
+    selected = st.selectbox("Filter by Company, Person or Place", ["All"] + list(facets), format_func=label)
+    return None if selected == "All" else selected
+
+
+def show_entity_sentiment(limit: int = 15):
+    """Sentiment per company, person and place across this session's articles"""
+    rows = get_entity_index().sentiment_by_entity(st.session_state.get('article_ids', []))
+    if not rows:
+        return
+    st.subheader("🏷️ Sentiment by Entity")
+    st.dataframe(rows[:limit], hide_index=True, use_container_width=True)
+
+
+def count_sentiments(articles: List[Dict]) -> Dict[str, int]:
+    """Sentiment counts in one pass over the articles"""
+    stats = {'POSITIVE': 0, 'NEGATIVE': 0, 'NEUTRAL': 0}
+    for article in articles:
+        sentiment = article.get('sentiment', 'NEUTRAL')
+        if sentiment in stats:
+            stats[sentiment] += 1
+    return stats
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def sentiment_pie_chart(stats: Tuple[Tuple[str, int], ...]):
+    """Pie chart of sentiment counts, memoized by the counts it plots"""
+    # Plotly is only imported once there is something to plot
+    import plotly.express as px
+
+    return px.pie(
+        values=[count for _, count in stats],
+        names=[name for name, _ in stats],
+        title="Sentiment Distribution",
+        color=[name for name, _ in stats],
+        color_discrete_map=SENTIMENT_COLORS
+    )
+
+
+def show_statistics(total: int, sentiment_stats: Dict[str, int]):
+    """Metrics row and sentiment distribution chart"""
+    st.header("📊 News Statistics")
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Articles", total)
+    col2.metric("Positive", sentiment_stats.get('POSITIVE', 0))
+    col3.metric("Negative", sentiment_stats.get('NEGATIVE', 0))
+    col4.metric("Neutral", sentiment_stats.get('NEUTRAL', 0))
+
+    if total > 0:
+        st.plotly_chart(sentiment_pie_chart(tuple(sentiment_stats.items())), use_container_width=True)
+
+
+def article_card_html(article: Dict) -> str:
+    """Render one article with the shared card template"""
+    sentiment = article.get('sentiment') or 'NEUTRAL'
+    return ARTICLE_CARD_TEMPLATE.format(
+        title=html.escape(article.get('title') or 'No title'),
+        source=html.escape((article.get('source') or {}).get('name') or 'Unknown'),
+        published=html.escape((article.get('publishedAt') or 'Unknown date')[:10]),
+        summary=html.escape(article.get('summary') or 'No summary available'),
+        sentiment_class=sentiment.lower(),
+        emoji=SENTIMENT_LABELS.get(sentiment, '😐'),
+        sentiment=sentiment,
+        confidence=article.get('sentiment_confidence') or 0,
+        description=html.escape((article.get('description') or 'No description')[:200]),
+        url=html.escape(article.get('url') or '#', quote=True)
+    )
+
+
+def seed_page(state, key: str, pages: int):
+    """Start a page widget's state at page 1, or clamp it when a narrower filter left it past the end"""
+    if key not in state:
+        state[key] = 1
+    elif state[key] > pages:
+        state[key] = pages
+
+
+def show_articles(articles: List[Dict], page_size: int = ARTICLES_PER_PAGE, key: str = 'articles'):
+    """
+    Article cards, one page at a time
+
+    Only the current page is rendered, as a single markdown element, so reruns
+    cost the same whatever the number of results.
+    """
+    st.header(f"📰 News Articles ({len(articles)} articles)")
+
+    if not articles:
+        st.warning("No articles match the selected filters.")
+        return
+
+    pages = (len(articles) + page_size - 1) // page_size
+    page = 1
+    if pages > 1:
+        # The widget takes its value from session state only, so it is never given two
+        seed_page(st.session_state, f"{key}_page", pages)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages,
+                               step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    cards = [article_card_html(article) for article in articles[start:start + page_size]]
+    st.markdown("\n<hr>\n".join(cards), unsafe_allow_html=True)
+
+
+def start_fetch_job(agent, backend: str, stream_summaries: bool = False, **kwargs):
+    """
+    Submit a background fetch/process job for this session
+
+    Identical jobs already running for any session are joined instead of repeated.
+
+    Args:
+        agent: NewsAgent, NewsAgentGemini or InsightsClient
+        backend: Backend name, part of the deduplication key
+        stream_summaries: Show each summary while it streams (agents taking a summary_callback)
+        **kwargs: Arguments for agent.get_news_insights
+    """
+    key = (backend,) + tuple(sorted(kwargs.items()))
+    # Results are pooled per processing settings, so other sessions' choices don't replace them
+    settings = (('backend', backend),) + tuple((name, kwargs.get(name)) for name in PROCESSING_OPTIONS)
+
+    def work(job):
+        if stream_summaries:
+            return agent.get_news_insights(progress_callback=job.report_progress,
+                                           cancel_event=job.cancel_event,
+                                           summary_callback=job.report_summary_chunk, **kwargs)
+        return agent.get_news_insights(progress_callback=job.report_progress,
+                                       cancel_event=job.cancel_event, **kwargs)
+
+    job = get_job_queue().submit(key, work, settings)
+    st.session_state.fetch_job_id = job.id
+    # The job ID is also the run's correlation and profile ID
+    st.session_state.last_job_id = job.id
+    st.session_state.fetch_job_message = None
+
+
+def load_digest(refresher, category: str, max_articles: int) -> bool:
+    """
+    Show the category's background digest instead of fetching and processing on demand
+
+    Args:
+        refresher: The app's DigestRefresher (None when digests are off)
+        category: Selected category
+        max_articles: Number of articles asked for
+
+    Returns:
+        True if the digest was loaded; False if there is none ready or it has too few articles
+    """
+    digest = refresher.get(category) if refresher else None
+    if digest is None or max_articles > refresher.max_articles:
+        return False
+
+    st.session_state.article_ids = get_article_pool().add_many(
+        digest.articles[:max_articles], (('backend', refresher.backend), ('source', 'digest')))
+    minutes = int(digest.age_seconds // 60)
+    st.session_state.fetch_job_message = (
+        'success', f"⚡ Latest {category} digest, refreshed {minutes} min ago"
+        f" ({min(max_articles, len(digest.articles))} articles)")
+    return True
+
+
+def poll_fetch_job() -> bool:
+    """
+    Point the session's article IDs at its job's results (partial while running)
+
+    Returns:
+        True while the job is still queued or running
+    """
+    job_id = st.session_state.get('fetch_job_id')
+    if not job_id:
+        return False
+
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.session_state.fetch_job_id = None
+        return False
+
+    st.session_state.article_ids = job.article_ids
+    if job.active:
+        return True
+
+    # Finished: keep the outcome to show once, then forget the job
+    if job.status == 'done':
+        st.session_state.fetch_job_message = ('success', f"✅ Successfully processed {len(job.article_ids)} articles!")
+    elif job.status == 'cancelled':
+        st.session_state.fetch_job_message = ('warning', f"Cancelled after {len(job.article_ids)} articles.")
+    else:
+        st.session_state.fetch_job_message = ('error', f"Error fetching news: {job.error}")
+    st.session_state.fetch_job_id = None
+    return False
+
+
+def show_fetch_job_status():
+    """Show progress and a cancel button for the running job, or the last job's outcome"""
+    job_id = st.session_state.get('fetch_job_id')
+    job = get_job_queue().get(job_id) if job_id else None
+
+    if job and job.active:
+        label = "Queued..." if job.status == 'queued' else f"Processing {job.completed}/{job.total or '?'} articles..."
+        st.progress(job.progress(), text=label)
+        if job.streaming_summary:
+            title, text = job.streaming_summary
+            st.caption(f"✍️ {title}: {text}")
+        if st.button("✖ Cancel", key="cancel_fetch_job"):
+            job.cancel()
+        return
+
+    message = st.session_state.get('fetch_job_message')
+    if message:
+        level, text = message
+        getattr(st, level)(text)
+
+
+def show_newsapi_quota():
+    """NewsAPI requests left today and when they run out at the current rate"""
+    status = get_newsapi_quota().status()
+    if status['budget'] is None:
+        return
+
+    st.progress(status['remaining'] / status['budget'],
+                text=f"NewsAPI: {status['remaining']}/{status['budget']} requests left today")
+    if status['projected_exhaustion']:
+        runs_out = datetime.fromisoformat(status['projected_exhaustion']).strftime('%H:%M')
+        st.caption(f"At {status['requests_per_hour']} requests/hour the budget runs out at {runs_out} UTC; "
+                   f"cached news is served after that")
+
+
+def show_profile_panel():
+    """Debug panel with the step breakdown of the session's last profiled run (profiling mode only)"""
+    job_id = st.session_state.get('last_job_id')
+    profile = get_profile_store().get(job_id) if job_id else None
+    if profile is None:
+        return
+
+    with st.expander("🔍 Profile"):
+        st.caption(f"Run {profile.id}: {profile.root.duration_ms:,.0f} ms")
+        st.dataframe([{'step': name, **step} for name, step in profile.breakdown().items()],
+                     hide_index=True, use_container_width=True)
+        st.caption("Per article (ms)")
+        st.dataframe(profile.articles(), hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Chrome trace", json.dumps(profile.to_chrome_trace(), default=str),
+                           file_name=f"trace-{profile.id}.json", mime='application/json',
+                           help="Open in Perfetto (ui.perfetto.dev), chrome://tracing or speedscope")
+        if profile.profiler_report:
+            st.caption(f"{profile.profiler} report")
+            st.code(profile.profiler_report, language=None)
+
+
+def rerun_while_job_active(active: bool, interval: float = 1.0):
+    """Poll the running job by rerunning the script after a short wait"""
+    if active:
+        time.sleep(interval)
+        st.rerun()